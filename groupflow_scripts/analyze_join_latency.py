@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+import sys
+
+# Produces join-to-first-packet latency distributions by correlating the join traces logged by receiver applications
+# (multicast_receiver_VLC.py) with the trace events logged by the controller's GroupFlowEventTracer.
+#
+# Usage: python analyze_join_latency.py <event trace file> <receiver log file> [<receiver log file> ...]
+#
+# Receivers log a trace ID of the form "<multicast group>-<host IP>", the wall clock time at which the group was joined,
+# and the wall clock time at which the first packet was received. The controller logs the same trace IDs with the wall
+# clock time at which each IGMP report was received, and the wall clock time at which barrier replies confirmed that the
+# resulting OpenFlow rules were applied. All times are comparable as Mininet hosts share the controller's clock.
+
+class ControllerJoinTrace(object):
+    def __init__(self, trace_id, multicast_group, report_time, barrier_time, phase_times):
+        self.trace_id = trace_id
+        self.multicast_group = multicast_group
+        self.report_time = report_time
+        self.barrier_time = barrier_time
+        self.phase_times = phase_times  # Controller processing times (ms), keyed by phase name
+
+class ReceiverJoinTrace(object):
+    def __init__(self, filename, trace_id, join_time, first_packet_time):
+        self.filename = filename
+        self.trace_id = trace_id
+        self.join_time = join_time
+        self.first_packet_time = first_packet_time
+
+PHASE_NAMES = ['IGMP processing time', 'Tree calc time', 'Route processing time', 'Flow installation time', 'Flow barrier time']
+
+def read_controller_join_traces(event_trace_filepath):
+    join_traces = {}    # Lists of ControllerJoinTrace objects, keyed by trace ID
+
+    def process_trace_event(event_lines):
+        multicast_group = None
+        barrier_time = None
+        trace_ids = []
+        phase_times = {}
+        for line in event_lines:
+            if line.startswith('Mcast Group: '):
+                multicast_group = line.split(' ')[2]
+            elif line.startswith('Flow barrier wall time: '):
+                barrier_time = float(line[len('Flow barrier wall time: '):])
+            elif line.startswith('Trace IDs: '):
+                trace_ids.extend(line[len('Trace IDs: '):].split(' '))
+            else:
+                for phase_name in PHASE_NAMES:
+                    if line.startswith(phase_name + ': '):
+                        phase_times[phase_name] = float(line[len(phase_name + ': '):].split(' ')[0])
+
+        if multicast_group is None or barrier_time is None:
+            return
+        for trace_id_str in trace_ids:
+            trace_id, report_time = trace_id_str.split('@')
+            if not trace_id.startswith(multicast_group + '-'):
+                continue
+            join_traces.setdefault(trace_id, []).append(ControllerJoinTrace(trace_id, multicast_group, float(report_time),
+                    barrier_time, phase_times))
+
+    event_trace_file = open(event_trace_filepath, 'r')
+    event_lines = []
+    for line in event_trace_file:
+        line = line.strip()
+        if line:
+            event_lines.append(line)
+        elif event_lines:
+            process_trace_event(event_lines)
+            event_lines = []
+    if event_lines:
+        process_trace_event(event_lines)
+    event_trace_file.close()
+
+    for trace_id in join_traces:
+        join_traces[trace_id].sort(key = lambda join_trace: join_trace.report_time)
+    print 'Processed event trace: ' + str(event_trace_filepath) + ' (' + str(len(join_traces)) + ' trace IDs)'
+    return join_traces
+
+def read_receiver_join_traces(receiver_log_filepaths):
+    receiver_traces = []
+    for filepath in receiver_log_filepaths:
+        log_file = open(filepath, 'r')
+        for line in log_file:
+            if 'TraceId:' in line:
+                line_split = line.split(' ')
+                trace_id = line_split[0][len('TraceId:'):]
+                join_time = float(line_split[1][len('JoinTime:'):])
+                first_packet_time = float(line_split[2][len('FirstPacketTime:'):])
+                receiver_traces.append(ReceiverJoinTrace(filepath, trace_id, join_time, first_packet_time))
+                break
+        log_file.close()
+    return receiver_traces
+
+def get_percentile(sorted_values, percentile):
+    if not sorted_values:
+        return 0
+    index = int(round((len(sorted_values) - 1) * percentile / 100.0))
+    return sorted_values[index]
+
+def print_distribution(name, values):
+    values = sorted(values)
+    if not values:
+        print name + ':\tNo samples'
+        return
+    print name + ':\tSamples:' + str(len(values)) + ' Mean:' + '{:.3f}'.format(sum(values) / len(values)) \
+            + ' P50:' + '{:.3f}'.format(get_percentile(values, 50)) + ' P90:' + '{:.3f}'.format(get_percentile(values, 90)) \
+            + ' P99:' + '{:.3f}'.format(get_percentile(values, 99)) + ' Max:' + '{:.3f}'.format(values[-1])
+
+def print_join_latency_statistics(controller_traces, receiver_traces):
+    join_latencies = []     # All times in ms
+    report_delays = []
+    barrier_delays = []
+    delivery_delays = []
+    phase_times = dict([(phase_name, []) for phase_name in PHASE_NAMES])
+    num_no_packets = 0
+    num_unmatched = 0
+
+    for receiver_trace in receiver_traces:
+        if receiver_trace.first_packet_time == 0:
+            num_no_packets += 1
+            continue
+        join_latencies.append((receiver_trace.first_packet_time - receiver_trace.join_time) * 1000)
+
+        # Match the first report received by the controller after the receiver joined the group
+        controller_trace = None
+        for join_trace in controller_traces.get(receiver_trace.trace_id, []):
+            if join_trace.report_time >= receiver_trace.join_time:
+                controller_trace = join_trace
+                break
+        if controller_trace is None:
+            num_unmatched += 1
+            continue
+        report_delays.append((controller_trace.report_time - receiver_trace.join_time) * 1000)
+        barrier_delays.append((controller_trace.barrier_time - controller_trace.report_time) * 1000)
+        delivery_delays.append((receiver_trace.first_packet_time - controller_trace.barrier_time) * 1000)
+        for phase_name in controller_trace.phase_times:
+            phase_times[phase_name].append(controller_trace.phase_times[phase_name])
+
+    print 'Receivers:' + str(len(receiver_traces)) + ' NoPacketsReceived:' + str(num_no_packets) + ' NoControllerTrace:' \
+            + str(num_unmatched)
+    print 'All times in ms'
+    print_distribution('JoinToFirstPacket', join_latencies)
+    print_distribution('JoinToReport', report_delays)
+    print_distribution('ReportToBarrier', barrier_delays)
+    print_distribution('BarrierToFirstPacket', delivery_delays)
+    for phase_name in PHASE_NAMES:
+        print_distribution(''.join([word[0].upper() + word[1:] for word in phase_name.split(' ')]), phase_times[phase_name])
+
+if __name__ == '__main__':
+    if len(sys.argv) >= 3:
+        controller_traces = read_controller_join_traces(sys.argv[1])
+        receiver_traces = read_receiver_join_traces(sys.argv[2:])
+        print_join_latency_statistics(controller_traces, receiver_traces)
+    else:
+        print 'Usage: python analyze_join_latency.py <event trace file> <receiver log file> [<receiver log file> ...]'
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+import sys
+import os
+import json
+import gzip
+import struct
+
+# Compares the results of two replays of the same OpenFlow recording (produced by pox/pox/misc/openflow_replayer.py),
+# typically run against two different controller versions. Controller CPU time, per-event handler latencies and trace
+# latencies are compared, and the flow mods sent to each switch in the two replays are compared for decision equivalence
+# (if both replay output recordings are available, otherwise both replays must match the recorded run).
+#
+# Usage: python compare_openflow_replays.py <baseline replay results> <new replay results>
+#
+# The exit status is 1 if the two replays sent different flow mods.
+
+# Recording file format (see pox/pox/misc/openflow_recorder.py)
+RECORDING_MAGIC = 'GFOFREC1'
+RECORDING_HEADER_FORMAT = '!8sd'
+RECORD_HEADER_FORMAT = '!dBQI'
+RECORD_OPENFLOW_OUT = 1
+OFPT_FLOW_MOD = 14
+
+def read_sent_flow_mods(recording_filepath):
+    flow_mods = {}  # Lists of flow mods (with transaction IDs zeroed), keyed by dpid
+    if recording_filepath.endswith('.gz'):
+        recording_file = gzip.open(recording_filepath, 'rb')
+    else:
+        recording_file = open(recording_filepath, 'rb')
+    magic, start_time = struct.unpack(RECORDING_HEADER_FORMAT, recording_file.read(struct.calcsize(RECORDING_HEADER_FORMAT)))
+    if magic != RECORDING_MAGIC:
+        print 'Not an OpenFlow recording file: ' + str(recording_filepath)
+        recording_file.close()
+        return None
+    header_len = struct.calcsize(RECORD_HEADER_FORMAT)
+    while True:
+        header = recording_file.read(header_len)
+        if len(header) < header_len:
+            break
+        record_time, record_type, dpid, data_len = struct.unpack(RECORD_HEADER_FORMAT, header)
+        data = recording_file.read(data_len)
+        if len(data) < data_len:
+            break
+        if record_type == RECORD_OPENFLOW_OUT and ord(data[1]) == OFPT_FLOW_MOD:
+            flow_mods.setdefault(dpid, []).append(data[:4] + '\x00\x00\x00\x00' + data[8:])
+    recording_file.close()
+    return flow_mods
+
+def get_change_str(baseline_value, new_value):
+    if baseline_value == 0:
+        return ''
+    return ' (' + '{:+.1f}'.format((new_value - baseline_value) * 100.0 / baseline_value) + '%)'
+
+def print_latency_comparison(name, baseline, new):
+    if baseline.get('count', 0) == 0 or new.get('count', 0) == 0:
+        print name + ':\tBaselineCount:' + str(baseline.get('count', 0)) + ' NewCount:' + str(new.get('count', 0))
+        return
+    print name + ':\tCount:' + str(baseline['count']) + '/' + str(new['count']) \
+            + ' Mean:' + '{:.3f}'.format(baseline['mean_ms']) + '/' + '{:.3f}'.format(new['mean_ms']) \
+            + get_change_str(baseline['mean_ms'], new['mean_ms']) \
+            + ' P99:' + '{:.3f}'.format(baseline['p99_ms']) + '/' + '{:.3f}'.format(new['p99_ms']) \
+            + get_change_str(baseline['p99_ms'], new['p99_ms'])
+
+def compare_flow_mods(baseline_flow_mods, new_flow_mods):
+    num_equivalent = 0
+    first_mismatch = None
+    dpids = sorted(set(baseline_flow_mods.keys()) | set(new_flow_mods.keys()))
+    for dpid in dpids:
+        baseline_switch_flow_mods = baseline_flow_mods.get(dpid, [])
+        new_switch_flow_mods = new_flow_mods.get(dpid, [])
+        if baseline_switch_flow_mods == new_switch_flow_mods:
+            num_equivalent += 1
+        elif first_mismatch is None:
+            for index in xrange(max(len(baseline_switch_flow_mods), len(new_switch_flow_mods))):
+                if index >= len(baseline_switch_flow_mods) or index >= len(new_switch_flow_mods) \
+                        or baseline_switch_flow_mods[index] != new_switch_flow_mods[index]:
+                    first_mismatch = (dpid, index)
+                    break
+    print 'EquivalentSwitches:' + str(num_equivalent) + '/' + str(len(dpids))
+    if first_mismatch is not None:
+        print 'First mismatch: Switch:' + str(first_mismatch[0]) + ' FlowModIndex:' + str(first_mismatch[1])
+    return first_mismatch is None
+
+def compare_replay_results(baseline, new):
+    print 'Baseline recording: ' + str(baseline['recording_file']) + ' Speed:' + str(baseline['replay_speed'])
+    print 'New recording: ' + str(new['recording_file']) + ' Speed:' + str(new['replay_speed'])
+    if baseline['recording_file'] != new['recording_file']:
+        print 'WARNING: Replays used different recording files'
+    print 'CPUTime:' + '{:.3f}'.format(baseline['cpu_time']) + '/' + '{:.3f}'.format(new['cpu_time']) \
+            + get_change_str(baseline['cpu_time'], new['cpu_time']) + ' Duration:' + '{:.3f}'.format(baseline['duration']) \
+            + '/' + '{:.3f}'.format(new['duration'])
+    print 'All times in ms (baseline/new)'
+    for event_name in sorted(set(baseline['events'].keys()) | set(new['events'].keys())):
+        print_latency_comparison(event_name, baseline['events'].get(event_name, {}), new['events'].get(event_name, {}))
+    for name in sorted(set(baseline['trace_histograms'].keys()) | set(new['trace_histograms'].keys())):
+        print_latency_comparison('trace_' + name, baseline['trace_histograms'].get(name, {}),
+                new['trace_histograms'].get(name, {}))
+
+    for label, results in [('Baseline', baseline), ('New', new)]:
+        decisions = results['decisions']
+        print label + ' vs recorded run: RecordedFlowMods:' + str(decisions['recorded_flow_mods']) + ' ReplayedFlowMods:' \
+                + str(decisions['replayed_flow_mods']) + ' EquivalentSwitches:' \
+                + str(decisions['ordered_equivalent_switches']) + '/' + str(decisions['switches'])
+
+    if baseline['output_file'] is None or new['output_file'] is None or not os.path.exists(baseline['output_file']) \
+            or not os.path.exists(new['output_file']):
+        # Both replays only match each other if both match the recorded run
+        print 'Replay output recordings not available, comparing against recorded run only'
+        return baseline['decisions']['equivalent'] and new['decisions']['equivalent']
+    baseline_flow_mods = read_sent_flow_mods(baseline['output_file'])
+    new_flow_mods = read_sent_flow_mods(new['output_file'])
+    if baseline_flow_mods is None or new_flow_mods is None:
+        return False
+    print 'Baseline vs new replay:'
+    return compare_flow_mods(baseline_flow_mods, new_flow_mods)
+
+if __name__ == '__main__':
+    if len(sys.argv) >= 3:
+        with open(sys.argv[1], 'r') as baseline_file:
+            baseline_results = json.load(baseline_file)
+        with open(sys.argv[2], 'r') as new_file:
+            new_results = json.load(new_file)
+        if not compare_replay_results(baseline_results, new_results):
+            print 'Controller decisions differ between replays'
+            sys.exit(1)
+    else:
+        print 'Usage: python compare_openflow_replays.py <baseline replay results> <new replay results>'
@@ -2,16 +2,53 @@ from mininet.topo import *
 from scipy.stats import truncnorm, tstd, poisson, expon
 from numpy.random import randint, uniform
 from datetime import datetime
-from time import time
+from time import time, sleep
 import os
 import sys
 import signal
+import socket
 
 LATENCY_METRIC_MIN_AVERAGE_DELAY = 1
 LATENCY_METRIC_MIN_MAXIMUM_DELAY = 2
 
+# Port of the POX BenchmarkTerminator control socket (passed to POX as misc.benchmark_terminator --control_port)
+POX_CONTROL_PORT = 7790
+
 # MEDIA_DURATION_SECONDS = 70
 
+def shutdown_controller(pox_process, control_port = POX_CONTROL_PORT, timeout = 15):
+    """Requests a controlled shutdown of POX through the BenchmarkTerminator control socket, and waits for POX to exit.
+    
+    Falls back to signalling POX (SIGINT, then SIGKILL) if the control socket is unavailable or flushing does not
+    complete within the timeout. Returns the time (in seconds) POX reported for flushing its log files, or None if the
+    fallback was used.
+    """
+    flush_time = None
+    try:
+        control_socket = socket.create_connection(('127.0.0.1', control_port), timeout)
+        control_socket.sendall('shutdown\n')
+        response = control_socket.makefile().readline().strip()
+        control_socket.close()
+        if response.startswith('OK FlushTime:'):
+            flush_time = float(response[len('OK FlushTime:'):])
+            print 'Controller flushed final statistics in ' + '{:.3f}'.format(flush_time) + ' seconds'
+        else:
+            print 'WARNING: Controller shutdown request failed: ' + response
+    except (socket.error, socket.timeout) as e:
+        print 'WARNING: Could not reach controller control socket: ' + str(e)
+    
+    if flush_time is None:
+        pox_process.send_signal(signal.SIGINT)
+    
+    # Allow POX to exit after flushing, and kill it if it does not
+    wait_start_time = time()
+    while pox_process.poll() is None and time() - wait_start_time < timeout:
+        sleep(0.1)
+    if pox_process.poll() is None:
+        pox_process.send_signal(signal.SIGKILL)
+    pox_process.wait()
+    return flush_time
+
 class ReceiverLogStats(object):
     def __init__(self, filename, recv_bytes, recv_packets, lost_packets):
         self.filename = filename
@@ -44,7 +81,7 @@ class MulticastReceiverApplication(object):
     def launch_receiver_application(self):
         if self.app_state == MulticastReceiverApplication.APP_STATE_PRELAUNCH and self.app_process is None:
             with open(os.devnull, "w") as fnull:
-                vlc_rcv_command = ['python', './multicast_receiver_VLC.py', self.group_ip, str(self.mcast_port), str(self.echo_port), str(self.log_filename)]
+                vlc_rcv_command = ['python', './multicast_receiver_VLC.py', self.group_ip, str(self.mcast_port), str(self.echo_port), str(self.log_filename), str(self.host.IP())]
                 # print 'Running: ' + ' '.join(vlc_rcv_command)
                 self.app_process = self.host.popen(vlc_rcv_command, stdout=fnull, stderr=fnull, close_fds=True, shell=False)
             
@@ -435,7 +472,7 @@ class StaticMulticastGroupDefinition(object):
             recv_log_filename = 'mcastlog_' + str(self.group_ip.replace('.', '_')) + '_' + str(dst) + '.log'
             with open(os.devnull, "w") as fnull:
                 # self.dst_processes.append(net.get(dst).popen(['python', './multicast_receiver.py', self.group_ip, str(self.mcast_port), str(self.echo_port)], stdout=fnull, stderr=fnull, close_fds=True))
-                vlc_rcv_command = ['python', './multicast_receiver_VLC.py', self.group_ip, str(self.mcast_port), str(self.echo_port), str(recv_log_filename)]
+                vlc_rcv_command = ['python', './multicast_receiver_VLC.py', self.group_ip, str(self.mcast_port), str(self.echo_port), str(recv_log_filename), str(net.get(dst).IP())]
                 # print 'Running: ' + ' '.join(vlc_rcv_command)
                 self.dst_processes.append(net.get(dst).popen(vlc_rcv_command, stdout=fnull, stderr=fnull, close_fds=True, shell=False))
                 self.receiver_log_files.append(recv_log_filename)
@@ -66,14 +66,14 @@ def mcastTestDynamic(topo, hosts = [], log_file_name = 'test_log.log', replaceme
     if 'periodic' in replacement_mode:
         pox_arguments = ['pox.py', 'log', '--file=pox.log,w', 'openflow.discovery', '--link_timeout=30', 'openflow.keepalive',
                 'openflow.flow_tracker', '--query_interval=1', '--link_max_bw=19', '--link_cong_threshold=13', '--avg_smooth_factor=0.5', '--log_peak_usage=True',
-                'misc.benchmark_terminator', 'openflow.igmp_manager', 'misc.groupflow_event_tracer',
+                'misc.benchmark_terminator', '--control_port=' + str(POX_CONTROL_PORT), 'openflow.igmp_manager', 'misc.groupflow_event_tracer',
                 'openflow.groupflow', '--static_link_weight=' + str(static_link_weight), '--util_link_weight=' + str(util_link_weight), '--link_weight_type=' + link_weight_type, '--flow_replacement_mode=' + replacement_mode,
                 '--flow_replacement_interval=10',
                 'log.level', '--WARNING', '--openflow.flow_tracker=INFO']
     else:
         pox_arguments = ['pox.py', 'log', '--file=pox.log,w', 'openflow.discovery', '--link_timeout=30', 'openflow.keepalive',
                 'openflow.flow_tracker', '--query_interval=1', '--link_max_bw=19', '--link_cong_threshold=13', '--avg_smooth_factor=0.5', '--log_peak_usage=True',
-                'misc.benchmark_terminator', 'openflow.igmp_manager', 'misc.groupflow_event_tracer',
+                'misc.benchmark_terminator', '--control_port=' + str(POX_CONTROL_PORT), 'openflow.igmp_manager', 'misc.groupflow_event_tracer',
                 'openflow.groupflow', '--static_link_weight=' + str(static_link_weight), '--util_link_weight=' + str(util_link_weight), '--link_weight_type=' + link_weight_type, '--flow_replacement_mode=' + replacement_mode,
                 '--flow_replacement_interval=10',
                 'log.level', '--WARNING', '--openflow.flow_tracker=INFO']
@@ -208,11 +208,7 @@ def mcastTestDynamic(topo, hosts = [], log_file_name = 'test_log.log', replaceme
             group.terminate_group()
         print 'Network applications terminated'
         print 'Terminating controller'
-        pox_process.send_signal(signal.SIGINT)
-        sleep(1)
-        print 'Waiting for controller termination...'
-        pox_process.send_signal(signal.SIGKILL)
-        pox_process.wait()
+        shutdown_controller(pox_process)
         print 'Controller terminated'
         pox_process = None
         net.stop()
@@ -34,14 +34,14 @@ def mcastTest(topo, interactive = False, hosts = [], log_file_name = 'test_log.l
     if 'periodic' in replacement_mode:
         pox_arguments = ['/usr/local/home/cse222a05/pox/pox.py', 'log', '--file=pox.log,w', 'openflow.discovery', '--link_timeout=30', 'openflow.keepalive',
                 'openflow.flow_tracker', '--query_interval=1', '--link_max_bw=19', '--link_cong_threshold=13', '--avg_smooth_factor=0.5', '--log_peak_usage=True',
-                'misc.benchmark_terminator', 'openflow.igmp_manager', 'misc.groupflow_event_tracer',
+                'misc.benchmark_terminator', '--control_port=' + str(POX_CONTROL_PORT), 'openflow.igmp_manager', 'misc.groupflow_event_tracer',
                 'openflow.groupflow', '--util_link_weight=' + str(util_link_weight), '--link_weight_type=' + link_weight_type, '--flow_replacement_mode=' + replacement_mode,
                 '--flow_replacement_interval=15',
                 'log.level', '--WARNING', '--openflow.flow_tracker=INFO']
     else:
         pox_arguments = ['/usr/local/home/cse222a05/pox/pox.py', 'log', '--file=pox.log,w', 'openflow.discovery', '--link_timeout=30', 'openflow.keepalive',
                 'openflow.flow_tracker', '--query_interval=1', '--link_max_bw=19', '--link_cong_threshold=13', '--avg_smooth_factor=0.5', '--log_peak_usage=True',
-                'misc.benchmark_terminator', 'openflow.igmp_manager', 'misc.groupflow_event_tracer',
+                'misc.benchmark_terminator', '--control_port=' + str(POX_CONTROL_PORT), 'openflow.igmp_manager', 'misc.groupflow_event_tracer',
                 'openflow.groupflow', '--util_link_weight=' + str(util_link_weight), '--link_weight_type=' + link_weight_type, '--flow_replacement_mode=' + replacement_mode,
                 '--flow_replacement_interval=15',
                 'log.level', '--WARNING', '--openflow.flow_tracker=INFO']
@@ -197,16 +197,12 @@ def mcastTest(topo, interactive = False, hosts = [], log_file_name = 'test_log.l
         for group in test_groups:
             group.terminate_mcast_applications()
         print 'Terminating controller'
-        pox_process.send_signal(signal.SIGINT)
-        sleep(1)
+        shutdown_controller(pox_process)
+        print 'Controller terminated'
         print 'Waiting for network application termination...'
         for group in test_groups:
             group.wait_for_application_termination()
         print 'Network applications terminated'
-        print 'Waiting for controller termination...'
-        pox_process.send_signal(signal.SIGKILL)
-        pox_process.wait()
-        print 'Controller terminated'
         pox_process = None
         net.stop()
 
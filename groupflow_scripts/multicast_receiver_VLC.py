@@ -27,6 +27,12 @@ recv_packets = 0
 recv_bytes = 0
 lost_packets = 0
 
+# Join latency tracing: the trace ID ("<multicast group>-<host IP>") matches the trace IDs logged by the controller's
+# GroupFlowEventTracer, and all times are wall clock times (time.time())
+host_ip = None
+join_time = 0
+first_packet_time = 0
+
 log_filename = None
 multicast_socket = None
 mreq = None
@@ -46,6 +52,9 @@ def handle_termination(sig = None, frame = None):
         log_file = open(log_filename, 'w')
         log_file.write('RecvPackets:' + str(recv_packets) + ' RecvBytes:' + str(recv_bytes) + ' LostPackets:' 
                 + str(lost_packets) + '\n')
+        if host_ip is not None:
+            log_file.write('TraceId:' + str(multicast_group) + '-' + str(host_ip) + ' JoinTime:' + '{:.6f}'.format(join_time)
+                    + ' FirstPacketTime:' + '{:.6f}'.format(first_packet_time) + '\n')
         log_file.flush()
         log_file.close()
         
@@ -57,6 +66,7 @@ def handle_termination(sig = None, frame = None):
 
 def main():
     global multicast_group, multicast_port, multicast_socket, mreq, packets_to_receive, echo_port, log_filename, recv_packets, recv_bytes, lost_packets
+    global host_ip, join_time, first_packet_time
     signal.signal(signal.SIGINT, handle_termination)
     signal.signal(signal.SIGTERM, handle_termination)
     
@@ -72,11 +82,16 @@ def main():
     if len(sys.argv) > 4:
         log_filename = sys.argv[4]
     
+    if len(sys.argv) > 5:
+        host_ip = sys.argv[5]
+    
     # Setup the socket for receive multicast traffic
     multicast_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
     multicast_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     multicast_socket.bind(('', multicast_port))
     mreq = struct.pack("=4sl", socket.inet_aton(multicast_group), socket.INADDR_ANY)
+    # Joining the group triggers an unsolicited IGMP report from the host kernel
+    join_time = time.time()
     multicast_socket.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
     
     print 'RTP streaming client listening on address: ' + str(multicast_group) + ':' + str(multicast_port)
@@ -98,6 +113,7 @@ def main():
             data, addr = multicast_socket.recvfrom(8192)    # Arbitrary maximum size
             new_packet_arrival_time = time.time()
             if last_packet_arrival_time == 0:
+                first_packet_time = new_packet_arrival_time
                 print 'Received first RTP packet.'
             #else:
             #    print '\nReceived RTP packet with interarrival time: ' + '{:10.8f}'.format((new_packet_arrival_time - last_packet_arrival_time) * 1000) + ' ms'
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+import sys
+import os
+import json
+import subprocess
+from time import time, sleep
+
+# Runs the GroupFlow controller micro-benchmark (pox/pox/misc/groupflow_benchmark.py) against simulated switches, so that
+# controller throughput and latency can be measured without Mininet, Open vSwitch or root privileges.
+#
+# Usage: python run_controller_benchmark.py <BRITE topology file> [<thresholds file>] [<results file>] [<flow_topk>]
+#
+# If a thresholds file is specified, any phases which regressed past its thresholds are reported (no thresholds file is
+# provided, as thresholds should be set from measured runs on the machine used for benchmarking). If flow_topk is
+# specified, the benchmark is run a second time with compact flow tracking enabled (with the specified number of exactly
+# tracked flows per port), and the flow state size and utilization estimate accuracy of compact tracking is compared to
+# exact tracking. The exit status is 1 if POX did not write results, or if the benchmark was aborted.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+POX_DIR = os.path.join(SCRIPT_DIR, '..', 'pox')
+DEFAULT_RESULTS_FILE = 'controller_benchmark_results.json'
+BENCHMARK_TIMEOUT = 600     # Seconds
+
+def run_controller_benchmark(topology_filepath, thresholds_filepath, results_filepath, flow_topk = 0):
+    pox_arguments = ['python', 'pox.py', '--no-openflow', 'log.level', '--WARNING', '--misc.groupflow_benchmark=INFO',
+            'openflow', 'openflow.discovery', '--link_timeout=3600', 'openflow.flow_tracker', '--query_interval=1',
+            '--flow_topk=' + str(flow_topk),
+            'openflow.igmp_manager', 'misc.groupflow_event_tracer', '--trace_export=none', 'openflow.groupflow',
+            'misc.groupflow_benchmark', '--topology=' + os.path.abspath(topology_filepath),
+            '--results_file=' + os.path.abspath(results_filepath)]
+    if thresholds_filepath is not None:
+        pox_arguments.append('--thresholds_file=' + os.path.abspath(thresholds_filepath))
+    print 'Launching POX: ' + ' '.join(pox_arguments)
+
+    if os.path.exists(results_filepath):
+        os.remove(results_filepath)
+    pox_process = subprocess.Popen(pox_arguments, cwd = POX_DIR)
+    start_time = time()
+    while pox_process.poll() is None:
+        if time() - start_time > BENCHMARK_TIMEOUT:
+            print 'Benchmark did not complete within ' + str(BENCHMARK_TIMEOUT) + ' seconds, killing POX'
+            pox_process.kill()
+            pox_process.wait()
+            return None
+        sleep(1)
+
+    if not os.path.exists(results_filepath):
+        print 'POX exited without writing benchmark results'
+        return None
+    with open(results_filepath, 'r') as results_file:
+        return json.load(results_file)
+
+def print_benchmark_results(results):
+    print 'Switches:' + str(results['config']['num_switches']) + ' Links:' + str(results['config']['num_links']) \
+            + ' TorPorts:' + str(results['config']['tor_ports']) + ' Groups:' + str(results['config']['num_groups']) \
+            + ' Receivers:' + str(results['config']['num_receivers']) + ' Duration:' + '{:.1f}'.format(results['duration'])
+    print 'All times in ms'
+    for phase_name, phase in sorted(results['phases'].iteritems(), key = lambda item: (item[1]['subsystem'], item[0])):
+        print str(phase['subsystem']) + '\t' + phase_name + ':\tCount:' + str(phase['count']) + ' Errors:' \
+                + str(phase['errors']) + ' OpsPerSec:' + '{:.1f}'.format(phase['ops_per_sec']) + ' Mean:' \
+                + '{:.3f}'.format(phase['mean_ms']) + ' P50:' + '{:.3f}'.format(phase['p50_ms']) + ' P90:' \
+                + '{:.3f}'.format(phase['p90_ms']) + ' P99:' + '{:.3f}'.format(phase['p99_ms']) + ' Max:' \
+                + '{:.3f}'.format(phase['max_ms'])
+    for name, histogram in sorted(results['trace_histograms'].iteritems()):
+        print 'trace\t' + name + ':\tCount:' + str(histogram['count']) + ' Mean:' + '{:.3f}'.format(histogram['mean_ms']) \
+                + ' P50:' + '{:.3f}'.format(histogram['p50_ms']) + ' P90:' + '{:.3f}'.format(histogram['p90_ms']) \
+                + ' P99:' + '{:.3f}'.format(histogram['p99_ms']) + ' Max:' + '{:.3f}'.format(histogram['max_ms'])
+    igmp_punt = results.get('igmp_punt')
+    if igmp_punt and 'packet_in_reduction' in igmp_punt:
+        print 'IGMP PacketIns (switch wide flow/per-port flows): ' \
+                + str(igmp_punt['igmp_punt_switch_flow']['packet_ins']) + '/' \
+                + str(igmp_punt['igmp_punt_port_flows']['packet_ins']) + ' Reduction:' \
+                + '{:.1f}'.format(igmp_punt['packet_in_reduction'] * 100) + '%'
+    reception_recovery = results.get('reception_recovery')
+    if reception_recovery and 'speedup' in reception_recovery:
+        print 'Time to full reception state (fresh reports/snapshot): ' \
+                + '{:.3f}'.format(reception_recovery['reception_relearn_secs']) + 's/' \
+                + '{:.3f}'.format(reception_recovery['reception_restore_secs']) + 's Speedup:' \
+                + '{:.1f}'.format(reception_recovery['speedup']) + 'x'
+    for regression in results['regressions']:
+        print 'REGRESSION: ' + regression
+
+def print_flow_tracking_comparison(exact_results, compact_results):
+    print 'Flow tracking (exact/compact):'
+    exact = exact_results['flow_tracking']
+    compact = compact_results['flow_tracking']
+    if exact is None or compact is None:
+        print 'Flow tracking results not available'
+        return
+    print 'TopK:' + str(exact['flow_topk']) + '/' + str(compact['flow_topk']) + ' SimulatedFlowEntries:' \
+            + str(exact['simulated_flow_entries']) + '/' + str(compact['simulated_flow_entries']) \
+            + ' PeakTrackedFlowEntries:' + str(exact['peak_tracked_flow_entries']) + '/' \
+            + str(compact['peak_tracked_flow_entries']) + ' SketchCounters:' + str(exact['sketch_counters']) + '/' \
+            + str(compact['sketch_counters'])
+    print 'MeanErrorMbps:' + '{:.4f}'.format(exact['mean_error_mbps']) + '/' + '{:.4f}'.format(compact['mean_error_mbps']) \
+            + ' MaxErrorMbps:' + '{:.4f}'.format(exact['max_error_mbps']) + '/' + '{:.4f}'.format(compact['max_error_mbps'])
+    exact_stats = exact_results['phases'].get('flow_stats')
+    compact_stats = compact_results['phases'].get('flow_stats')
+    if exact_stats is not None and compact_stats is not None:
+        print 'FlowStatsMeanMs:' + '{:.3f}'.format(exact_stats['mean_ms']) + '/' + '{:.3f}'.format(compact_stats['mean_ms'])
+
+if __name__ == '__main__':
+    if len(sys.argv) >= 2:
+        thresholds_filepath = None
+        if len(sys.argv) >= 3:
+            thresholds_filepath = sys.argv[2]
+        results_filepath = DEFAULT_RESULTS_FILE
+        if len(sys.argv) >= 4:
+            results_filepath = sys.argv[3]
+
+        results = run_controller_benchmark(sys.argv[1], thresholds_filepath, results_filepath)
+        if results is None:
+            sys.exit(1)
+        print_benchmark_results(results)
+        aborted = results['aborted'] is not None
+
+        if len(sys.argv) >= 5:
+            compact_results_filepath = os.path.splitext(results_filepath)[0] + '_topk' + sys.argv[4] + '.json'
+            compact_results = run_controller_benchmark(sys.argv[1], thresholds_filepath, compact_results_filepath,
+                    int(sys.argv[4]))
+            if compact_results is None:
+                sys.exit(1)
+            print_benchmark_results(compact_results)
+            print_flow_tracking_comparison(results, compact_results)
+            aborted = aborted or compact_results['aborted'] is not None
+
+        if aborted:
+            sys.exit(1)
+    else:
+        print 'Usage: python run_controller_benchmark.py <BRITE topology file> [<thresholds file>] [<results file>] ' \
+                + '[<flow_topk>]'
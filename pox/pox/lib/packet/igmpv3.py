@@ -153,7 +153,15 @@ IGMP_V3_ALL_SYSTEMS_ADDRESS = IPAddr("224.0.0.1")
 # IGMP IP protocol
 IGMP_PROTOCOL = 2
 
-class igmpv3_group_record:
+def unpack_ip_addresses(raw, offset, count):
+    '''Decodes count consecutive IPv4 addresses from raw, starting at the specified byte offset.
+    
+    All addresses are unpacked directly from the raw buffer in a single call, without copying a slice per address.
+    '''
+    return [IPAddr(addr, networkOrder = False) for addr in struct.unpack_from('!' + str(count) + 'i', raw, offset)]
+
+
+class igmpv3_group_record (object):
     GROUP_RECORD_HEADER_LEN = 8
 
     MODE_IS_INCLUDE         = MODE_IS_INCLUDE
@@ -163,32 +171,53 @@ class igmpv3_group_record:
     ALLOW_NEW_SOURCES       = ALLOW_NEW_SOURCES
     BLOCK_OLD_SOURCES       = BLOCK_OLD_SOURCES
 
-    def __init__(self):
+    def __init__(self, raw = None, offset = 0):
         self.record_type = 0
         self.aux_data_len = 0
         self.num_sources = 0
         self.multicast_address = None
-        self.source_addresses = []
+        self._source_addresses = []
         self.aux_data = None   # Defined but not used in IGMPv3
         
+        # Raw buffer and offset of the (not yet decoded) source address list, if this record was parsed
+        self._raw = None
+        self._sources_offset = 0
+        
         self.len = 0
         
+        if raw is not None:
+            self.parse(raw, offset)
+    
+    @property
+    def source_addresses(self):
+        '''List of source addresses in the record. Addresses of parsed records are only decoded on first access.'''
+        if self._raw is not None:
+            self._source_addresses = unpack_ip_addresses(self._raw, self._sources_offset, self.num_sources)
+            self._raw = None
+        return self._source_addresses
+    
+    @source_addresses.setter
+    def source_addresses(self, source_addresses):
+        self._source_addresses = source_addresses
+        self._raw = None
+        
     def get_addr_set(self):
         return set(self.source_addresses)
     
-    def parse(self, raw):
-        '''Parses a byte array into a single IGMPv3 group record. Returns the number of bytes processed.'''
+    def parse(self, raw, offset = 0):
+        '''Parses a single IGMPv3 group record starting at the specified offset of a byte array. Returns the number of bytes processed.
+        
+        Only the record header is decoded, the source address list is decoded on first access to source_addresses.
+        '''
         assert isinstance(raw, bytes)
-        self.record_type, self.aux_data_len, self.num_sources, ip = \
-            struct.unpack('!BBHi', raw[:self.GROUP_RECORD_HEADER_LEN])
-        self.multicast_address = IPAddr(ip, networkOrder = False)
+        self.record_type, self.aux_data_len, self.num_sources = struct.unpack_from('!BBH', raw, offset)
+        self.multicast_address = IPAddr(raw[offset + 4:offset + self.GROUP_RECORD_HEADER_LEN])
         # print 'Read group record: Type: %d, aux_data_len: %d, num_sources: %d' % (self.record_type, self.aux_data_len, self.num_sources)
         # print 'Read group record multicast address: %s' % (self.multicast_address)
-        for i in range(0, self.num_sources):
-            (source_address,) = struct.unpack("!i", raw[self.GROUP_RECORD_HEADER_LEN + (i * 4):self.GROUP_RECORD_HEADER_LEN + ((i + 1) * 4)])
-            # print 'Read group record source address: %s' % (source_address)
-            self.source_addresses.append(IPAddr(source_address, networkOrder=False))
-        self.len = self.GROUP_RECORD_HEADER_LEN + (self.num_sources * 4)
+        self._raw = raw
+        self._sources_offset = offset + self.GROUP_RECORD_HEADER_LEN
+        # Auxiliary data length is specified in 32 bit words
+        self.len = self.GROUP_RECORD_HEADER_LEN + (self.num_sources * 4) + (self.aux_data_len * 4)
         return self.len
     
     def pack(self):
@@ -249,6 +278,55 @@ class igmpv3 (packet_base):
 
         self._init(kw)
 
+    # Parsed packets decode their variable length sections (group records, source addresses, and any trailing data which
+    # follows them) lazily, on first access to the associated attribute. self.raw holds the parsed message, and the
+    # _raw_group_records and _raw_source_addresses flags are set while the corresponding section remains undecoded (each
+    # flag is cleared once the section is decoded, or when the attribute is assigned directly).
+
+    @property
+    def group_records(self):
+        if self._raw_group_records:
+            self._decode_group_records()
+        return self._group_records
+
+    @group_records.setter
+    def group_records(self, group_records):
+        self._group_records = group_records
+        self._raw_group_records = False
+
+    @property
+    def source_addresses(self):
+        if self._raw_source_addresses:
+            self._source_addresses = unpack_ip_addresses(self.raw, self.V3_QUERY_HDR_LEN, self.num_sources)
+            self._raw_source_addresses = False
+        return self._source_addresses
+
+    @source_addresses.setter
+    def source_addresses(self, source_addresses):
+        self._source_addresses = source_addresses
+        self._raw_source_addresses = False
+
+    @property
+    def extra(self):
+        if self._raw_group_records:
+            self._decode_group_records()
+        return self._extra
+
+    @extra.setter
+    def extra(self, extra):
+        self._extra = extra
+
+    def _decode_group_records(self):
+        '''Decodes the group record headers of a parsed v3 Membership Report, and the trailing data which follows them.'''
+        self._raw_group_records = False
+        self._group_records = []
+        offset = self.V3_REPORT_HDR_LEN
+        for i in xrange(0, self.num_group_records):
+            group_record = igmpv3_group_record(self.raw, offset)
+            offset += group_record.len
+            self._group_records.append(group_record)
+        self._extra = self.raw[offset:]
+
 #    TODO - Needs to account for different message types / IGMP versions. The header functionality is currently
 #    included in the parse function
 #    def hdr (self, payload):
@@ -270,26 +348,17 @@ class igmpv3 (packet_base):
             return None
 
         # Read type field
-        (self.ver_and_type,) = struct.unpack("!B", raw[:self.TYPE_FIELD_LEN])
+        self.ver_and_type = ord(raw[0])
         if self.ver_and_type == self.MEMBERSHIP_REPORT_V3:
-            # Read v3 Membership Report specific fields
+            # Read v3 Membership Report specific fields, group records are decoded on first access
             self.msg_type = self.MEMBERSHIP_REPORT_V3
-            self.csum, self.num_group_records = struct.unpack("!xHxxH", raw[self.TYPE_FIELD_LEN:self.V3_REPORT_HDR_LEN])
-            
-            group_records_processed_bytes = 0
-            for i in range(0, self.num_group_records):
-                group_record = igmpv3_group_record()
-                group_records_processed_bytes += group_record.parse(raw[self.V3_REPORT_HDR_LEN + group_records_processed_bytes:])
-                self.group_records.append(group_record)
-                # print 'Processed %d bytes of group records.' % group_records_processed_bytes
-                
-            self.extra = raw[self.V3_REPORT_HDR_LEN + group_records_processed_bytes:]
+            self.csum, self.num_group_records = struct.unpack_from("!xHxxH", raw, self.TYPE_FIELD_LEN)
+            self._raw_group_records = True
             
         else:
             # Read fields shared between all IGMP message versions other than v3 Membership Reports
-            self.max_response_time, self.csum, ip = \
-                struct.unpack("!BHi", raw[self.TYPE_FIELD_LEN:self.MIN_LEN])
-            self.address = IPAddr(ip, networkOrder = False)
+            self.max_response_time, self.csum = struct.unpack_from("!BH", raw, self.TYPE_FIELD_LEN)
+            self.address = IPAddr(raw[4:self.MIN_LEN])
             if self.max_response_time >= 128 :
                 # TODO - Handle floating point max_response_time
                 self.err('IGMP packet parsed with floating point max_response_time - CURRENTLY UNSUPPORTED')
@@ -305,19 +374,16 @@ class igmpv3 (packet_base):
                 self.extra = raw[self.MIN_LEN:]
                 
             elif self.ver_and_type == MEMBERSHIP_QUERY and self.dlen >= 12:
-                # v3 Membership Query
+                # v3 Membership Query, source addresses are decoded on first access
                 self.msg_type = MEMBERSHIP_QUERY_V3
-                s_flag_qrv_byte = 0
                 s_flag_qrv_byte, self.qqic, self.num_sources, = \
-                    struct.unpack("!BBH", raw[self.MIN_LEN:self.V3_QUERY_HDR_LEN])
+                    struct.unpack_from("!BBH", raw, self.MIN_LEN)
                 if self.qqic >= 128 :
                     #TODO - Handle floating point qqic
                     self.err('IGMP packet parsed with floating point qqic - CURRENTLY UNSUPPORTED')
                 self.suppress_router_processing = True if s_flag_qrv_byte & 0x08 else False
                 self.qrv = s_flag_qrv_byte & 0x07
-                for i in range(0, self.num_sources):
-                    (source_address, ) = struct.unpack("!i", raw[self.V3_QUERY_HDR_LEN + (i * 4):self.V3_QUERY_HDR_LEN + ((i + 1) * 4)])
-                    self.source_addresses.append(source_address.toSigned(networkOrder=False))
+                self._raw_source_addresses = True
                 self.extra = raw[self.V3_QUERY_HDR_LEN + (self.num_sources * 4):]
                     
             else:
@@ -325,8 +391,8 @@ class igmpv3 (packet_base):
                 self.msg_type = self.ver_and_type
                 self.extra = raw[self.MIN_LEN:]
 
-        s = self.pack(False)
-        csum = checksum(s)
+        # Verify the checksum directly over the raw message, skipping the checksum field (word 1)
+        csum = checksum(raw, 0, 1)
         if csum != self.csum:
             self.err("IGMP checksums don't match")
         else:
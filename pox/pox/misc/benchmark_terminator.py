@@ -17,10 +17,26 @@
 
 """
 The purpose of this module is to capture a SIGINT signal, and cleanly terminate the benchmarking functionality
-of the FlowTracker and GroupFlowEventTracer modules, before rethrowing the signal so that POX can catch it and terminate
+of the FlowTracker and GroupFlowEventTracer modules (and report final statistics from the GroupFlow module if it is running), before rethrowing the signal so that POX can catch it and terminate
 entirely.
 
-This module does not support any command line arguments.
+If a control port is configured, the module also listens for a controlled shutdown request on a local TCP socket. A
+client sends the line "shutdown", and the module flushes all benchmarking modules from the POX event loop (in the same
+fashion as a SIGINT), replies with "OK FlushTime:<seconds>" once all log files have been written and closed (or
+"ERROR <module>[,<module>...]" listing the modules whose termination handler raised an exception, or "TIMEOUT" if
+flushing did not complete within shutdown_timeout seconds), and then stops POX. A module which fails to terminate does
+not prevent the remaining modules from being flushed. This allows benchmarking
+scripts to wait for final statistics to be written rather than signalling POX and sleeping for a fixed interval.
+Termination is only performed once, so a SIGINT received after a controlled shutdown will not flush modules again.
+
+The following command line arguments are supported:
+
+* control_port: The TCP port on which shutdown requests are accepted. Set to 0 to disable the control socket.
+  Default: 0
+* control_address: The address on which the control socket listens.
+  Default: 127.0.0.1
+* shutdown_timeout: The maximum time (in seconds) for which a shutdown request waits for modules to be flushed.
+  Default: 10
 
 Depends on misc.groupflow_event_tracer, openflow.flow_tracker
 
@@ -32,43 +48,148 @@ Author: Alexander Craig - alexcraig1@gmail.com
 import time
 import signal
 import os
+import threading
+import SocketServer
 from pox.core import core
 from pox.lib.revent import *
 
+CONTROL_PORT = 0
+# Benchmarking modules flushed on termination, in order, as (component name, required) tuples
+TERMINATED_MODULES = [
+    ('openflow_flow_tracker', True),
+    ('groupflow_event_tracer', True),
+    ('openflow_groupflow', False),
+    ('metrics_server', False),
+    ('handler_profiler', False),
+    ('openflow_recorder', False),
+    ('memory_accountant', False),
+]
+CONTROL_ADDRESS = '127.0.0.1'
+SHUTDOWN_TIMEOUT = 10   # Seconds
+
 log = core.getLogger()
 
+
+class ControlRequestHandler(SocketServer.StreamRequestHandler):
+
+    """Handles a single line command received on the BenchmarkTerminator control socket."""
+
+    def handle(self):
+        command = self.rfile.readline().strip()
+        if command == 'shutdown':
+            self.wfile.write(self.server.benchmark_terminator.request_shutdown() + '\n')
+        else:
+            self.wfile.write('ERROR Unknown command: ' + command + '\n')
+
+
+class ControlServer(SocketServer.TCPServer):
+
+    """TCP server for the BenchmarkTerminator control socket, which allows the port to be reused by consecutive runs."""
+
+    allow_reuse_address = True
+
+
 class BenchmarkTerminator(EventMixin):
     _core_name = "benchmark_terminator"
 
-    def __init__(self):
-        """Configures the terminate_benchmarking() method as a handler for SIGINT signals"""
+    def __init__(self, control_port = CONTROL_PORT, control_address = CONTROL_ADDRESS, shutdown_timeout = SHUTDOWN_TIMEOUT):
+        """Configures the terminate_benchmarking() method as a handler for SIGINT signals, and starts the control socket
+        (if a control port is configured)"""
 
         def startup():
             log.info('Module initialized.')
             self._module_init_time = time.time()
+            if self.control_port != 0:
+                self.start_control_server()
 
         self._module_init_time = 0
+        self.control_port = int(control_port)
+        self.control_address = str(control_address)
+        self.shutdown_timeout = float(shutdown_timeout)
+        self._control_server = None
+        self._control_thread = None
+
+        self._flush_complete = threading.Event()
+        self._flush_started = False
+        self.flush_time = None  # Seconds taken to flush all benchmarking modules
+        self.failed_modules = []    # Component names of modules whose termination handler raised an exception
+
         signal.signal(signal.SIGINT, self.terminate_benchmarking)
         # Setup listeners
         core.call_when_ready(startup, ('openflow', 'openflow_flow_tracker', 'groupflow_event_tracer'))
 
-    def terminate_benchmarking(self, signal, frame):
-        """Terminates the FlowTracker and GroupFlowEventTracer modules, and rethrows the caught signal
-        
-        Terimation is handled by calling the termination_handler() function provided by each module.
+    def start_control_server(self):
+        """Starts the control socket server on a daemon thread."""
+        try:
+            self._control_server = ControlServer((self.control_address, self.control_port), ControlRequestHandler)
+        except Exception as e:
+            log.warn('Unable to start control socket on ' + self.control_address + ':' + str(self.control_port) + ': ' + str(e))
+            return
+        self._control_server.benchmark_terminator = self
+        self._control_thread = threading.Thread(target = self._control_server.serve_forever)
+        self._control_thread.daemon = True
+        self._control_thread.start()
+        log.info('Accepting shutdown requests on ' + self.control_address + ':' + str(self.control_port))
+
+    def request_shutdown(self):
+        """Schedules flushing of all benchmarking modules on the POX event loop, waits for flushing to complete, and then
+        stops POX. Returns the response string sent to the control socket client.
+
+        This method is called from the control socket thread, and blocks for at most shutdown_timeout seconds.
+        """
+        log.info('Shutdown requested through control socket.')
+        core.callLater(self.flush_benchmarking, None, None)
+        if not self._flush_complete.wait(self.shutdown_timeout):
+            log.warn('Flushing did not complete within ' + str(self.shutdown_timeout) + ' seconds.')
+            return 'TIMEOUT'
+        core.callLater(core.quit)
+        if self.failed_modules:
+            return 'ERROR ' + ','.join(self.failed_modules)
+        return 'OK FlushTime:' + '{:.6f}'.format(self.flush_time)
+
+    def flush_benchmarking(self, signal_num, frame):
+        """Terminates the FlowTracker and GroupFlowEventTracer modules (and all other running benchmarking modules),
+        recording the time taken to write and close their log files in flush_time.
+
+        Terimation is handled by calling the termination_handler() function provided by each module in TERMINATED_MODULES.
+        If a handler raises an exception (or a required module is not running), the module is recorded in failed_modules
+        and the remaining modules are still terminated. This method has no effect if modules have already been flushed.
         """
-        log.info('Terminating flow tracker module.')
-        core.openflow_flow_tracker.termination_handler(signal, frame)
-        log.info('Terminated flow tracker module.')
-        log.info('Terminating groupflow event tracer module.')
-        core.groupflow_event_tracer.termination_handler(signal, frame)
-        log.info('Terminated groupflow event tracer module.')
+        if self._flush_started:
+            return
+        self._flush_started = True
+        flush_start_time = time.time()
+        try:
+            for component_name, required in TERMINATED_MODULES:
+                if not core.hasComponent(component_name):
+                    if required:
+                        log.error('Unable to terminate module ' + component_name + ': module is not running.')
+                        self.failed_modules.append(component_name)
+                    continue
+                log.info('Terminating module ' + component_name + '.')
+                try:
+                    getattr(core, component_name).termination_handler(signal_num, frame)
+                except Exception:
+                    log.exception('Termination handler of module ' + component_name + ' failed.')
+                    self.failed_modules.append(component_name)
+                    continue
+                log.info('Terminated module ' + component_name + '.')
+        finally:
+            self.flush_time = time.time() - flush_start_time
+            log.info('Flushed benchmarking modules in ' + '{:.6f}'.format(self.flush_time) + ' seconds.')
+            if self.failed_modules:
+                log.warn('Failed to terminate modules: ' + ', '.join(self.failed_modules))
+            self._flush_complete.set()
+
+    def terminate_benchmarking(self, signal_num, frame):
+        """Terminates all benchmarking modules (see flush_benchmarking()), and rethrows the caught signal"""
+        self.flush_benchmarking(signal_num, frame)
 
         # Remove this signal handler, and throw a new signal that will be caught by POX
-        signal.signal(signal, signal.SIG_DFL)
-        os.kill(os.getpid(), signal)
+        signal.signal(signal_num, signal.SIG_DFL)
+        os.kill(os.getpid(), signal_num)
 
 
-def launch():
+def launch(control_port = CONTROL_PORT, control_address = CONTROL_ADDRESS, shutdown_timeout = SHUTDOWN_TIMEOUT):
     # Method called by the POX core when launching the module
-    core.registerNew(BenchmarkTerminator)
+    core.registerNew(BenchmarkTerminator, int(control_port), control_address, float(shutdown_timeout))
@@ -0,0 +1,1027 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+#  Copyright 2014 Alexander Craig
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+This module benchmarks the throughput and latency of the GroupFlow, IGMPManager, FlowTracker, Discovery and
+GroupFlowEventTracer modules against simulated switch connections, in a similar fashion to cbench. No Mininet network,
+Open vSwitch instance or root privileges are required, so the benchmark can be run in a plain Linux container.
+
+A simulated switch is created for every node of a BRITE topology. Each switch has tor_ports host facing ports (numbered
+from 1), followed by one port for every inter-switch link in the order links appear in the BRITE file. Simulated switches
+maintain a minimal flow table from the flow mods sent to them, answer barrier requests, and answer flow and port stats
+requests with byte counts generated from their installed flows at a fixed rate of flow_rate Mbps per flow (the receive
+counts of inter-switch ports are taken from the transmit counts of the adjacent switch). All replies are delivered from
+the POX event loop.
+
+The benchmark runs the following phases in order, and measures the time taken by all controller event handlers to
+process each operation:
+
+* igmp_parse_<N>: Parsing of IGMPv3 membership reports containing N group records (not including any handlers)
+* igmp_parse_baseline_<N>: Parsing of the same reports with a copy of the original eager IGMPv3 parser, which slices
+  every group record and source address out of the raw message (for comparison with igmp_parse_<N>)
+* connection_up: ConnectionUp events for every simulated switch
+* link_event: LinkEvents (in both directions) for every link in the BRITE topology
+* igmp_punt_switch_flow: PacketIns for one IGMP report received on every port of every switch, as delivered to the
+  controller by the switch wide IGMP punt flow alone (i.e. before per-port IGMP flows were installed)
+* igmp_punt_port_flows: PacketIns for the same IGMP reports, as delivered to the controller by the per-port IGMP punt and
+  drop flows installed by the IGMPManager (reports received on inter-switch ports are dropped by the switch)
+* igmp_join: IGMPv3 joins (CHANGE_TO_EXCLUDE_MODE records with no sources) for the first half of all receivers
+* multicast_packet_in: PacketIns for the first packet of a new multicast source in every group (each of which triggers a
+  tree calculation and flow installation)
+* igmp_join_routed: IGMPv3 joins for the second half of all receivers, which modify installed multicast trees
+* reception_relearn: IGMPv3 current state reports (MODE_IS_EXCLUDE records with no sources) for all receivers, sent
+  after the membership state of every router was cleared, until the desired reception state of all routers matches the
+  state held before clearing (reports are sent immediately, so this is a lower bound on relearning after a restart,
+  which must also wait for hosts to answer a general query)
+* reception_restore: Restoration of the same membership state from a snapshot (taken before clearing) through
+  IGMPv3Router.restore_membership_snapshot(), one operation per router
+* igmp_timer_check: Calls to IGMPManager.process_expired_timers() with the full membership state installed, plus
+  TIMER_BENCHMARK_RECORDS additional group records whose source timers expire at staggered times over
+  TIMER_BENCHMARK_SPREAD seconds, so that each call expires a share of the seeded records
+* igmp_timer_sweep: The same timer load processed by a full sweep of every group record of every router at the same
+  interval (in the manner of the timer processing which preceded the IGMPManager timer heap), for comparison with
+  igmp_timer_check
+* igmp_leave: IGMPv3 leaves (CHANGE_TO_INCLUDE_MODE records with no sources) for all receivers
+
+In addition, the handling of flow stats replies (flow_stats), port stats replies (port_stats) and barrier replies
+(barrier_reply) is measured for all replies delivered during the benchmark. Simulated switches also track the IGMP flows
+sent to them, and the number of IGMP reports and resulting PacketIns in the igmp_punt phases are reported, to measure
+the PacketIn rate reduction provided by per-port IGMP flows. The wall clock time taken by the reception_relearn and
+reception_restore phases to return all routers to their full desired reception state is also reported. Stats queries are launched by the FlowTracker
+module at its configured query interval, and the benchmark waits stats_duration seconds between the routed join and
+timer check phases so that stats processing can be measured with all multicast flows installed.
+
+At the end of the stats measurement period, the FlowTracker's utilization estimate of every simulated flow on every
+tracked link is compared to the simulated flow rate, and the mean and maximum estimation errors are reported along with
+the size of the FlowTracker's flow state (exactly tracked flow entries and Count-Min sketch counters). Running the
+benchmark with and without openflow.flow_tracker --flow_topk compares the memory and accuracy of compact flow tracking
+to exact tracking (see groupflow_scripts/run_controller_benchmark.py).
+
+The number of operations, errors raised by handlers, throughput (operations per second of handler processing time) and
+latency percentiles of every phase, along with the latency histograms of the GroupFlowEventTracer, are written to
+results_file in JSON format. If a thresholds file is provided, the results of each phase are compared to the thresholds
+for that phase, and any regressions are logged and listed in the results file (regressions are reported only, and do
+not change the exit status of groupflow_scripts/run_controller_benchmark.py). No thresholds file is provided, as
+thresholds should be set from measured runs on the machine used for benchmarking. Thresholds are specified in JSON
+format as follows (all keys are optional):
+
+{"igmp_join": {"min_ops_per_sec": 2000, "max_mean_ms": 0.5, "max_p99_ms": 2, "max_errors": 0}, ...}
+
+POX is stopped once the benchmark completes. The benchmark should be launched with OpenFlow listening disabled, and with
+a link timeout longer than the benchmark duration:
+
+./pox.py --no-openflow openflow openflow.discovery --link_timeout=3600 openflow.flow_tracker --query_interval=1
+    openflow.igmp_manager misc.groupflow_event_tracer openflow.groupflow misc.groupflow_benchmark
+    --topology=../topologies/40Node_20Mbps_USA.brite
+
+The groupflow_scripts/run_controller_benchmark.py script runs this command and prints the results.
+
+The following command line arguments are supported:
+
+* topology: Path to the BRITE topology file from which simulated switches are generated.
+  Default: None (required)
+* tor_ports: The number of host facing ports on each simulated switch. The default models a 48 port top-of-rack switch.
+  Default: 48
+* num_groups: The number of multicast groups joined by receivers (each group has a single source).
+  Default: 1000
+* num_receivers: The number of IGMP joins sent by receivers. Receiver hosts are assigned to groups round robin, so
+  hosts may join more than one group.
+  Default: 10000
+* flow_rate: The rate (in Mbps) of every installed multicast flow, used to generate stats replies.
+  Default: 1
+* stats_duration: The time (in seconds) for which stats processing is measured with all multicast flows installed.
+  Default: 10
+* batch_size: The number of operations processed in a single iteration of the POX event loop. The event loop is yielded
+  between batches so that replies and timers are processed while phases are running.
+  Default: 100
+* results_file: The file to which benchmark results are written in JSON format.
+  Default: groupflow_benchmark_results.json
+* thresholds_file: Path to a JSON file of regression thresholds for each phase.
+  Default: None (no regression checks)
+
+Note: POX provides no public API for registering connections which were not accepted by of_01, so simulated
+connections are registered with the OpenFlow nexus through its private _connect() and _disconnect() methods (see
+misc.openflow_harness). The benchmark aborts at startup if the running POX version does not provide them. This
+benchmark (and misc.openflow_replayer, which registers connections in the same way) has not yet been exercised end to
+end against a running POX installation, so the handler error counts in the results file should be checked before its
+measurements are relied on.
+
+Depends on openflow, openflow.discovery, openflow.flow_tracker, openflow.igmp_manager, openflow.groupflow,
+misc.groupflow_event_tracer
+"""
+
+import time
+import json
+import struct
+from pox.core import core
+from pox.lib.revent import *
+from pox.lib.recoco import Timer
+from pox.openflow import *
+from pox.openflow.discovery import Link, LinkEvent
+from pox.misc.groupflow_event_tracer import LatencyHistogram, get_curr_time
+from pox.misc.openflow_harness import check_nexus_connection_support, update_nexus_connection, raise_openflow_event
+from pox.openflow.igmp_manager import IGMPv3Router, MulticastMembershipRecord
+import pox.lib.packet as pkt
+from pox.lib.packet.igmpv3 import *
+from pox.lib.packet.ethernet import ETHER_BROADCAST
+import pox.openflow.libopenflow_01 as of
+from pox.lib.addresses import IPAddr, EthAddr
+
+log = core.getLogger()
+
+TOR_PORTS = 48
+NUM_GROUPS = 1000
+NUM_RECEIVERS = 10000
+FLOW_RATE_MbPS = 1
+STATS_DURATION = 10     # Seconds
+BATCH_SIZE = 100
+RESULTS_FILE = 'groupflow_benchmark_results.json'
+
+IGMP_PARSE_RECORD_COUNTS = [1, 10, 50, 100, 200]  # Group records per report in the igmp_parse phases
+IGMP_PARSE_NUM_SOURCES = 4                          # Source addresses per group record in the igmp_parse phases
+IGMP_PARSE_ITERATIONS = 1000                        # Reports parsed for each record count
+IGMP_PUNT_GROUP = IPAddr('239.255.0.1')    # Group reported in the igmp_punt phases (with an empty INCLUDE record)
+TIMER_BENCHMARK_RECORDS = 10000     # Group records seeded for the igmp_timer_check and igmp_timer_sweep phases
+TIMER_BENCHMARK_SPREAD = 5          # Seconds over which the source timer expiries of seeded records are staggered
+TIMER_CHECK_INTERVAL = 0.05         # Seconds between timer checks in the igmp_timer_check and igmp_timer_sweep phases
+TIMER_BENCHMARK_DPID = 0xffff0000   # DPID of the router holding seeded records (not a simulated switch)
+TIMER_BENCHMARK_SOURCE = IPAddr('10.255.255.1')
+RECEPTION_RECOVERY_TIMEOUT = 30     # Seconds waited for full reception state in the reception_relearn/restore phases
+SETTLE_TIME = 2         # Seconds waited between phases for coalesced IGMP reports and barrier replies to be processed
+LINK_REFRESH_INTERVAL = 1   # Seconds between refreshes of simulated link timestamps in the discovery module
+SIMULATED_PACKET_LEN = 1000     # Bytes, used to derive packet counts from byte counts in stats replies
+MULTICAST_PAYLOAD = '\x00' * 64 # UDP payload of simulated multicast packets
+
+UDP_PROTOCOL = 17
+
+# Subsystem measured by each phase (phases not listed here are matched on their prefix)
+PHASE_SUBSYSTEMS = {
+    'igmp_parse': 'igmp',
+    'igmp_parse_baseline': 'igmp',
+    'connection_up': 'openflow',
+    'link_event': 'discovery',
+    'igmp_punt_switch_flow': 'igmp',
+    'igmp_punt_port_flows': 'igmp',
+    'igmp_join': 'igmp',
+    'multicast_packet_in': 'groupflow',
+    'igmp_join_routed': 'groupflow',
+    'flow_stats': 'flow_tracker',
+    'port_stats': 'flow_tracker',
+    'barrier_reply': 'event_tracer',
+    'reception_relearn': 'igmp',
+    'reception_restore': 'igmp',
+    'igmp_timer_check': 'igmp',
+    'igmp_timer_sweep': 'igmp',
+    'igmp_leave': 'igmp',
+}
+
+
+def parse_igmp_report_baseline(raw):
+    """Parses an IGMPv3 membership report in the same way as the original (eager) IGMPv3 parser, which slices every group
+    record and source address out of the raw message. Used as the baseline of the igmp_parse phases.
+
+    Returns a list of (record_type, multicast_address, source_addresses) tuples.
+    """
+    num_group_records, = struct.unpack('!H', raw[6:8])
+    group_records = []
+    offset = 8
+    for i in range(0, num_group_records):
+        record_raw = raw[offset:]
+        record_type, aux_data_len, num_sources, ip = struct.unpack('!BBHi', record_raw[:8])
+        source_addresses = []
+        for source_index in range(0, num_sources):
+            (source_address,) = struct.unpack('!i', record_raw[8 + (source_index * 4):8 + ((source_index + 1) * 4)])
+            source_addresses.append(IPAddr(source_address, networkOrder = False))
+        group_records.append((record_type, IPAddr(ip, networkOrder = False), source_addresses))
+        offset += 8 + (num_sources * 4) + (aux_data_len * 4)
+    return group_records
+
+
+def build_igmp_report(group_records):
+    """Returns an IGMPv3 membership report containing the specified group records.
+
+    * group_records: List of (record_type, multicast_address, source_addresses) tuples
+    """
+    igmp_pkt = pkt.igmpv3()
+    igmp_pkt.ver_and_type = MEMBERSHIP_REPORT_V3
+    for record_type, multicast_address, source_addresses in group_records:
+        group_record = igmpv3_group_record()
+        group_record.record_type = record_type
+        group_record.multicast_address = IPAddr(multicast_address)
+        group_record.source_addresses = source_addresses
+        group_record.num_sources = len(source_addresses)
+        igmp_pkt.group_records.append(group_record)
+    igmp_pkt.num_group_records = len(igmp_pkt.group_records)
+    return igmp_pkt
+
+
+def build_packet_in(port_no, eth_src, ip_src, ip_dst, ip_protocol, payload):
+    """Returns an ofp_packet_in containing an ethernet frame with the specified IPv4 header fields and payload."""
+    ip_pkt = pkt.ipv4()
+    ip_pkt.ttl = 1
+    ip_pkt.protocol = ip_protocol
+    ip_pkt.srcip = ip_src
+    ip_pkt.dstip = ip_dst
+    ip_pkt.payload = payload
+
+    eth_pkt = pkt.ethernet(type=pkt.ethernet.IP_TYPE)
+    eth_pkt.src = eth_src
+    eth_pkt.dst = ETHER_BROADCAST
+    eth_pkt.payload = ip_pkt
+
+    return of.ofp_packet_in(in_port = port_no, data = eth_pkt.pack(), reason = of.OFPR_NO_MATCH)
+
+
+def get_host_ip(node_id, port_no):
+    """Returns the IP address of the simulated host attached to the specified port of the specified BRITE node."""
+    return IPAddr('10.' + str(port_no) + '.' + str(node_id // 256) + '.' + str(node_id % 256))
+
+
+def get_host_eth_addr(node_id, port_no):
+    """Returns the (locally administered) MAC address of the simulated host attached to the specified port."""
+    return EthAddr(struct.pack('!BBHH', 0x02, 0x01, node_id & 0xffff, port_no))
+
+
+class SimulatedFlow(object):
+
+    """A multicast forwarding rule installed on a SimulatedConnection."""
+
+    __slots__ = ['cookie', 'match', 'actions', 'install_time']
+
+    def __init__(self, cookie, match, actions, install_time):
+        self.cookie = cookie
+        self.match = match
+        self.actions = actions
+        self.install_time = install_time
+
+    def get_byte_count(self, curr_time, flow_rate_bytes):
+        return int((curr_time - self.install_time) * flow_rate_bytes)
+
+
+class TimerBenchmarkRouter(IGMPv3Router):
+
+    """IGMPv3Router holding the group records seeded for the igmp_timer_check and igmp_timer_sweep phases. Reception
+    state changes are discarded, so that timer processing is measured without generating MulticastGroupEvents."""
+
+    def request_reception_update(self, igmp_trace_event = None, from_report = False):
+        self._changed_reception_entries = set()
+
+
+class SimulatedConnection(EventMixin):
+
+    """Stand-in for the OpenFlow connection of a switch.
+
+    Flow mods are applied to a minimal flow table which tracks multicast forwarding rules, and barrier and stats requests
+    are answered through the GroupFlowBenchmark, which raises the reply events from the POX event loop. All other
+    messages (including packed messages such as the LLDP packet outs sent by the discovery module) are only counted.
+    """
+
+    _eventMixin_events = set([ConnectionUp, ConnectionDown, PortStatus, FlowRemoved, PacketIn, ErrorIn, BarrierIn,
+            FlowStatsReceived, PortStatsReceived])
+
+    def __init__(self, benchmark, node_id, port_nums):
+        self.benchmark = benchmark
+        self.node_id = node_id
+        self.dpid = node_id + 1
+        self.ID = self.dpid
+        self.connect_time = time.time()
+
+        self.features = of.ofp_features_reply()
+        self.features.datapath_id = self.dpid
+        for port_no in port_nums:
+            self.features.ports.append(of.ofp_phy_port(port_no = port_no,
+                    hw_addr = EthAddr(struct.pack('!BBHH', 0x02, 0x00, self.dpid & 0xffff, port_no)),
+                    name = 's' + str(node_id) + '-eth' + str(port_no), curr = of.OFPPF_1GB_FD))
+
+        self.flow_table = {}    # SimulatedFlow objects, keyed by (nw_dst, nw_src)
+        # IGMP flows:  [in_port] -> True if IGMP is punted to the controller (in_port is None for the switch wide flow)
+        self.igmp_flows = {}
+        self.num_flow_mods = 0
+        self.num_packet_outs = 0
+        self.num_barrier_requests = 0
+        self.num_stats_requests = 0
+        self.num_other_messages = 0
+
+    def __str__(self):
+        return '[SimulatedConnection ' + str(self.dpid) + ']'
+
+    def send(self, msg):
+        """Processes a message sent to the switch by the controller."""
+        if isinstance(msg, bytes):
+            self.num_packet_outs += 1
+        elif isinstance(msg, of.ofp_flow_mod):
+            self.num_flow_mods += 1
+            self.apply_flow_mod(msg)
+        elif isinstance(msg, of.ofp_barrier_request):
+            self.num_barrier_requests += 1
+            self.benchmark.schedule_reply('barrier_reply', self, BarrierIn, of.ofp_barrier_reply(xid = msg.xid))
+        elif isinstance(msg, of.ofp_stats_request):
+            self.num_stats_requests += 1
+            curr_time = time.time()
+            if isinstance(msg.body, of.ofp_flow_stats_request):
+                stats = self.get_flow_stats(curr_time)
+                self.benchmark.schedule_reply('flow_stats', self, FlowStatsReceived,
+                        [of.ofp_stats_reply(xid = msg.xid, body = stats)], stats)
+            elif isinstance(msg.body, of.ofp_port_stats_request):
+                stats = self.get_port_stats(curr_time)
+                self.benchmark.schedule_reply('port_stats', self, PortStatsReceived,
+                        [of.ofp_stats_reply(xid = msg.xid, body = stats)], stats)
+        elif isinstance(msg, of.ofp_packet_out):
+            self.num_packet_outs += 1
+        else:
+            self.num_other_messages += 1
+
+    def apply_flow_mod(self, msg):
+        """Applies a flow mod to the flow table. Only IPv4 rules with a destination address and a cookie (i.e. multicast
+        forwarding rules installed by GroupFlow) and IGMP rules are tracked."""
+        if msg.match.nw_proto == IGMP_PROTOCOL:
+            self.igmp_flows[msg.match.in_port] = len([action for action in msg.actions
+                    if isinstance(action, of.ofp_action_output) and action.port == of.OFPP_CONTROLLER]) > 0
+            return
+        if msg.match.nw_dst is None or msg.cookie == 0:
+            return
+        flow_key = (msg.match.nw_dst, msg.match.nw_src)
+        if msg.command == of.OFPFC_DELETE or msg.command == of.OFPFC_DELETE_STRICT:
+            self.flow_table.pop(flow_key, None)
+        elif msg.command == of.OFPFC_MODIFY and flow_key in self.flow_table:
+            # Modified flows retain their counters
+            self.flow_table[flow_key].actions = list(msg.actions)
+        else:
+            self.flow_table[flow_key] = SimulatedFlow(msg.cookie, msg.match, list(msg.actions), time.time())
+
+    def punts_igmp(self, port_no, port_flows = True):
+        """Returns True if an IGMP packet received on the specified port would be sent to the controller by the installed
+        IGMP flows. If port_flows is False, per-port IGMP flows are ignored and only the switch wide flow is considered."""
+        if port_flows and port_no in self.igmp_flows:
+            return self.igmp_flows[port_no]
+        return self.igmp_flows.get(None, False)
+
+    def get_port_tx_bytes(self, curr_time):
+        """Returns the number of bytes transmitted by installed flows on each port, keyed by port number."""
+        port_tx_bytes = {}
+        for flow in self.flow_table.itervalues():
+            byte_count = flow.get_byte_count(curr_time, self.benchmark.flow_rate_bytes)
+            for action in flow.actions:
+                if isinstance(action, of.ofp_action_output):
+                    port_tx_bytes[action.port] = port_tx_bytes.get(action.port, 0) + byte_count
+        return port_tx_bytes
+
+    def get_flow_stats(self, curr_time):
+        """Returns a list of ofp_flow_stats for all installed flows."""
+        stats = []
+        for flow in self.flow_table.itervalues():
+            byte_count = flow.get_byte_count(curr_time, self.benchmark.flow_rate_bytes)
+            stats.append(of.ofp_flow_stats(match = flow.match, cookie = flow.cookie, byte_count = byte_count,
+                    packet_count = byte_count // SIMULATED_PACKET_LEN, duration_sec = int(curr_time - flow.install_time),
+                    actions = flow.actions))
+        return stats
+
+    def get_port_stats(self, curr_time):
+        """Returns a list of ofp_port_stats for all ports. The receive counts of inter-switch ports are the transmit
+        counts of the corresponding port on the adjacent switch."""
+        tx_bytes = self.get_port_tx_bytes(curr_time)
+        peer_tx_bytes = {}  # Transmit counts of adjacent switches, keyed by dpid
+        stats = []
+        for port in self.features.ports:
+            rx_bytes = 0
+            peer = self.benchmark.link_peers.get((self.dpid, port.port_no))
+            if peer is not None:
+                if not peer[0] in peer_tx_bytes:
+                    peer_tx_bytes[peer[0]] = self.benchmark.connections[peer[0]].get_port_tx_bytes(curr_time)
+                rx_bytes = peer_tx_bytes[peer[0]].get(peer[1], 0)
+            port_tx_bytes = tx_bytes.get(port.port_no, 0)
+            stats.append(of.ofp_port_stats(port_no = port.port_no, rx_bytes = rx_bytes, tx_bytes = port_tx_bytes,
+                    rx_packets = rx_bytes // SIMULATED_PACKET_LEN, tx_packets = port_tx_bytes // SIMULATED_PACKET_LEN))
+        return stats
+
+
+class GroupFlowBenchmark(EventMixin):
+
+    """Module which runs the controller benchmark phases against SimulatedConnections generated from a BRITE topology."""
+
+    _core_name = "groupflow_benchmark"
+
+    def __init__(self, topology, tor_ports = TOR_PORTS, num_groups = NUM_GROUPS, num_receivers = NUM_RECEIVERS,
+            flow_rate = FLOW_RATE_MbPS, stats_duration = STATS_DURATION, batch_size = BATCH_SIZE,
+            results_file = RESULTS_FILE, thresholds_file = None):
+        """Starts the benchmark once all benchmarked modules have been loaded."""
+
+        def startup():
+            try:
+                check_nexus_connection_support()
+            except RuntimeError as e:
+                log.error('Benchmark aborted: ' + str(e))
+                self._benchmark_start_time = time.time()
+                self.finish_benchmark(str(e))
+                return
+            self.load_brite_topology(self.topology)
+            self.generate_hosts()
+            self._benchmark_steps = self.run_benchmark()
+            self._benchmark_start_time = time.time()
+            core.callLater(self.run_next_step)
+
+        self.topology = topology
+        self.tor_ports = int(tor_ports)
+        self.num_groups = int(num_groups)
+        self.num_receivers = int(num_receivers)
+        self.flow_rate = float(flow_rate)
+        self.flow_rate_bytes = self.flow_rate * 1048576.0 / 8.0
+        self.stats_duration = float(stats_duration)
+        self.batch_size = max(1, int(batch_size))
+        self.results_file = results_file
+        self.thresholds_file = thresholds_file
+        log.info('Set Topology:' + str(self.topology) + ' TorPorts:' + str(self.tor_ports) + ' NumGroups:'
+                + str(self.num_groups) + ' NumReceivers:' + str(self.num_receivers) + ' FlowRate:' + str(self.flow_rate)
+                + ' StatsDuration:' + str(self.stats_duration) + ' BatchSize:' + str(self.batch_size))
+
+        self.node_ids = []
+        self.edges = []             # (node_id_1, node_id_2) tuples, in BRITE file order
+        self.connections = {}       # SimulatedConnections, keyed by dpid
+        self.link_peers = {}        # (dpid, port) tuples of adjacent ports, keyed by (dpid, port)
+        self.links = []             # Discovery Links (in both directions) for every BRITE edge
+        self.groups = []            # Multicast group addresses
+        self.sources = []           # (dpid, port_no, host_ip, eth_addr, group) tuples, one for each group
+        self.receivers = []         # (dpid, port_no, host_ip, eth_addr, group) tuples, one for each join
+
+        self.phase_names = []       # Phase names, in the order they were first recorded
+        self.phase_histograms = {}  # LatencyHistograms of handler processing times, keyed by phase name
+        self.phase_errors = {}      # Number of handler exceptions, keyed by phase name
+        self.flow_tracking_results = None
+        self.igmp_punt_results = {}     # Counts of IGMP reports and resulting PacketIns, keyed by igmp_punt phase name
+        self.reception_recovery_results = {}    # Time to full reception state from fresh reports and from a snapshot
+
+        self._benchmark_steps = None
+        self._benchmark_start_time = None
+        self._link_refresh_timer = None
+
+        core.call_when_ready(startup, ('openflow', 'openflow_discovery', 'openflow_flow_tracker', 'openflow_igmp_manager',
+                'openflow_groupflow', 'groupflow_event_tracer'))
+
+    def load_brite_topology(self, brite_filepath):
+        """Creates a SimulatedConnection for every node in the BRITE topology file, and records the switch ports
+        connected by every edge."""
+        node_ports = {}     # Port numbers of each node, keyed by node ID
+        in_node_section = False
+        in_edge_section = False
+        with open(brite_filepath, 'r') as brite_file:
+            for line in brite_file:
+                line = line.strip()
+                if 'Nodes:' in line:
+                    in_node_section = True
+                    continue
+                if 'Edges:' in line:
+                    in_edge_section = True
+                    continue
+                if not line:
+                    in_node_section = False
+                    in_edge_section = False
+                    continue
+
+                line_split = line.split('\t')
+                if in_node_section:
+                    node_id = int(line_split[0])
+                    self.node_ids.append(node_id)
+                    node_ports[node_id] = range(1, self.tor_ports + 1)
+                elif in_edge_section:
+                    node_id_1 = int(line_split[1])
+                    node_id_2 = int(line_split[2])
+                    port_1 = len(node_ports[node_id_1]) + 1
+                    node_ports[node_id_1].append(port_1)
+                    port_2 = len(node_ports[node_id_2]) + 1
+                    node_ports[node_id_2].append(port_2)
+                    self.edges.append((node_id_1, node_id_2))
+
+                    dpid_1 = node_id_1 + 1
+                    dpid_2 = node_id_2 + 1
+                    self.link_peers[(dpid_1, port_1)] = (dpid_2, port_2)
+                    self.link_peers[(dpid_2, port_2)] = (dpid_1, port_1)
+                    self.links.append(Link(dpid_1, port_1, dpid_2, port_2))
+                    self.links.append(Link(dpid_2, port_2, dpid_1, port_1))
+
+        for node_id in self.node_ids:
+            connection = SimulatedConnection(self, node_id, node_ports[node_id])
+            self.connections[connection.dpid] = connection
+        log.info('Loaded BRITE topology: ' + str(brite_filepath) + ' (' + str(len(self.node_ids)) + ' switches, '
+                + str(len(self.edges)) + ' links)')
+
+    def generate_hosts(self):
+        """Generates the multicast groups, the source of each group, and the receivers of each join."""
+        host_ports = [(node_id, port_no) for port_no in range(1, self.tor_ports + 1) for node_id in self.node_ids]
+        for group_index in xrange(self.num_groups):
+            self.groups.append(IPAddr('225.' + str((group_index // 65536) % 256) + '.' + str((group_index // 256) % 256)
+                    + '.' + str(group_index % 256)))
+
+        for group_index, group in enumerate(self.groups):
+            node_id, port_no = host_ports[(group_index * 7) % len(host_ports)]
+            self.sources.append((node_id + 1, port_no, get_host_ip(node_id, port_no), get_host_eth_addr(node_id, port_no),
+                    group))
+
+        for receiver_index in xrange(self.num_receivers):
+            node_id, port_no = host_ports[receiver_index % len(host_ports)]
+            group = self.groups[(receiver_index + (receiver_index // len(host_ports))) % len(self.groups)]
+            self.receivers.append((node_id + 1, port_no, get_host_ip(node_id, port_no),
+                    get_host_eth_addr(node_id, port_no), group))
+
+    def record_latency(self, phase_name, latency):
+        """Records the processing time (in seconds) of a single operation in the specified phase."""
+        if not phase_name in self.phase_histograms:
+            self.phase_histograms[phase_name] = LatencyHistogram()
+            self.phase_names.append(phase_name)
+        self.phase_histograms[phase_name].record(latency)
+
+    def raise_openflow_event(self, phase_name, connection, event_type, *args):
+        """Raises an OpenFlow event on the OpenFlow nexus and then the connection (in the same fashion as of_01), and
+        records the time taken by all handlers in the specified phase."""
+        handler_time, error = raise_openflow_event(connection, event_type, *args)
+        if error is not None:
+            self.phase_errors[phase_name] = self.phase_errors.get(phase_name, 0) + 1
+            log.warn('Handler error in phase ' + phase_name + ': ' + type(error).__name__ + ': ' + str(error))
+        self.record_latency(phase_name, handler_time)
+
+    def schedule_reply(self, phase_name, connection, event_type, *args):
+        """Schedules a reply event from a simulated switch to be raised on the next iteration of the POX event loop."""
+        core.callLater(self.raise_openflow_event, phase_name, connection, event_type, *args)
+
+    def raise_link_event(self, link):
+        """Records a link with the discovery module, and raises a LinkEvent for it."""
+        start_time = get_curr_time()
+        try:
+            core.openflow_discovery.adjacency[link] = time.time()
+            core.openflow_discovery.raiseEvent(LinkEvent, True, link)
+        except Exception as e:
+            self.phase_errors['link_event'] = self.phase_errors.get('link_event', 0) + 1
+            log.warn('Handler error in phase link_event: ' + type(e).__name__ + ': ' + str(e))
+        self.record_latency('link_event', get_curr_time() - start_time)
+
+    def refresh_links(self):
+        """Refreshes the timestamps of all simulated links in the discovery module, so that they are not expired (no
+        LLDP packets are returned by simulated switches)."""
+        curr_time = time.time()
+        for link in self.links:
+            if link in core.openflow_discovery.adjacency:
+                core.openflow_discovery.adjacency[link] = curr_time
+
+    def send_igmp_report(self, phase_name, host, record_type):
+        """Raises a PacketIn containing an IGMPv3 report with a single group record from the specified host."""
+        dpid, port_no, host_ip, eth_addr, group = host
+        igmp_pkt = build_igmp_report([(record_type, group, [])])
+        packet_in = build_packet_in(port_no, eth_addr, host_ip, IGMP_ADDRESS, IGMP_PROTOCOL, igmp_pkt)
+        self.raise_openflow_event(phase_name, self.connections[dpid], PacketIn, packet_in)
+
+    def run_igmp_parse_benchmark(self, num_records):
+        """Measures the time taken to parse IGMPv3 reports with the specified number of group records, including decoding
+        of all source addresses, with both the IGMPv3 parser and the baseline eager parser."""
+        group_records = []
+        for record_index in xrange(num_records):
+            group = self.groups[record_index % len(self.groups)] if self.groups else IPAddr('225.0.0.1')
+            group_records.append((MODE_IS_INCLUDE, group,
+                    [IPAddr('10.0.' + str(record_index % 256) + '.' + str(source_index + 1))
+                    for source_index in xrange(IGMP_PARSE_NUM_SOURCES)]))
+        raw = build_igmp_report(group_records).pack()
+
+        phase_name = 'igmp_parse_' + str(num_records)
+        for i in xrange(IGMP_PARSE_ITERATIONS):
+            start_time = get_curr_time()
+            igmp_pkt = pkt.igmpv3(raw = raw)
+            for group_record in igmp_pkt.group_records:
+                group_record.source_addresses
+            self.record_latency(phase_name, get_curr_time() - start_time)
+
+        phase_name = 'igmp_parse_baseline_' + str(num_records)
+        for i in xrange(IGMP_PARSE_ITERATIONS):
+            start_time = get_curr_time()
+            parse_igmp_report_baseline(raw)
+            self.record_latency(phase_name, get_curr_time() - start_time)
+
+    def get_flow_tracking_results(self):
+        """Compares the FlowTracker's utilization estimate of every simulated flow on every tracked link to the simulated
+        flow rate, and returns a dictionary of the estimation errors and the size of the FlowTracker's flow state."""
+        flow_tracker = core.openflow_flow_tracker
+        num_flow_entries = 0
+        total_error_mbps = 0
+        max_error_mbps = 0
+        num_sketch_counters = 0
+        for dpid, connection in self.connections.iteritems():
+            switch = flow_tracker.switches.get(dpid)
+            if switch is None:
+                continue
+            for sketch in switch.flow_tail_sketch.itervalues():
+                num_sketch_counters += sketch.width * sketch.depth
+            for flow in connection.flow_table.itervalues():
+                for action in flow.actions:
+                    if isinstance(action, of.ofp_action_output) and action.port in switch.tracked_ports:
+                        error_mbps = abs(flow_tracker.get_flow_utilization_mbps(dpid, action.port, flow.cookie)
+                                - self.flow_rate)
+                        num_flow_entries += 1
+                        total_error_mbps += error_mbps
+                        max_error_mbps = max(max_error_mbps, error_mbps)
+
+        mean_error_mbps = 0
+        if num_flow_entries > 0:
+            mean_error_mbps = total_error_mbps / num_flow_entries
+        return {
+            'flow_topk': flow_tracker.flow_topk,
+            'simulated_flow_entries': num_flow_entries,
+            'tracked_flow_entries': flow_tracker.num_tracked_flow_entries,
+            'peak_tracked_flow_entries': flow_tracker.peak_tracked_flow_entries,
+            'sketch_counters': num_sketch_counters,
+            'mean_error_mbps': mean_error_mbps,
+            'max_error_mbps': max_error_mbps,
+        }
+
+    def run_igmp_punt_benchmark(self):
+        """Generator which runs the igmp_punt_switch_flow and igmp_punt_port_flows phases. In each phase an IGMP report is
+        received on every port of every simulated switch, and a PacketIn is raised for each report which the switch's
+        IGMP flows (either the switch wide flow alone, or including the per-port flows) would send to the controller."""
+        igmp_pkt = build_igmp_report([(MODE_IS_INCLUDE, IGMP_PUNT_GROUP, [])])
+        for phase_name, port_flows in (('igmp_punt_switch_flow', False), ('igmp_punt_port_flows', True)):
+            num_reports = 0
+            num_packet_ins = 0
+            for dpid in sorted(self.connections):
+                connection = self.connections[dpid]
+                for port in connection.features.ports:
+                    num_reports += 1
+                    if not connection.punts_igmp(port.port_no, port_flows):
+                        continue
+                    num_packet_ins += 1
+                    packet_in = build_packet_in(port.port_no, get_host_eth_addr(connection.node_id, port.port_no),
+                            get_host_ip(connection.node_id, port.port_no), IGMP_ADDRESS, IGMP_PROTOCOL, igmp_pkt)
+                    self.raise_openflow_event(phase_name, connection, PacketIn, packet_in)
+                    if num_packet_ins % self.batch_size == 0:
+                        yield None
+            self.igmp_punt_results[phase_name] = {'igmp_reports': num_reports, 'packet_ins': num_packet_ins}
+            yield SETTLE_TIME
+
+        switch_flow_packet_ins = self.igmp_punt_results['igmp_punt_switch_flow']['packet_ins']
+        port_flows_packet_ins = self.igmp_punt_results['igmp_punt_port_flows']['packet_ins']
+        packet_in_reduction = 0
+        if switch_flow_packet_ins > 0:
+            packet_in_reduction = 1 - (float(port_flows_packet_ins) / switch_flow_packet_ins)
+        self.igmp_punt_results['packet_in_reduction'] = packet_in_reduction
+        log.info('IGMP PacketIns SwitchFlow:' + str(switch_flow_packet_ins) + ' PortFlows:' + str(port_flows_packet_ins)
+                + ' Reduction:' + '{:.1f}'.format(packet_in_reduction * 100) + '%')
+
+    def get_reception_state(self):
+        """Returns a copy of the desired reception state of the router of every simulated switch, keyed by dpid."""
+        reception_state = {}
+        for dpid in self.connections:
+            router = core.openflow_igmp_manager.routers.get(dpid)
+            if router is None:
+                continue
+            reception_state[dpid] = dict([(mcast_address, dict([(port_index, set(sources))
+                    for port_index, sources in port_reception.iteritems()]))
+                    for mcast_address, port_reception in router.desired_reception.iteritems()])
+        return reception_state
+
+    def clear_membership_state(self):
+        """Removes all group records from the router of every simulated switch, and updates their desired reception state
+        (so that GroupFlow removes the corresponding multicast trees)."""
+        for dpid in self.connections:
+            router = core.openflow_igmp_manager.routers.get(dpid)
+            if router is None:
+                continue
+            for port_index in router.multicast_records:
+                for mcast_address in router.multicast_records[port_index]:
+                    router.mark_reception_changed(port_index, mcast_address)
+            router.multicast_records.clear()
+            router.reporting_hosts = {}
+            router.update_desired_reception_state()
+
+    def run_reception_recovery_benchmark(self):
+        """Generator which runs the reception_relearn and reception_restore phases. The membership state of every router
+        is snapshotted and cleared, relearned from fresh reports, and then cleared again and restored from the snapshot.
+        Each phase waits until the desired reception state of all routers matches the state held before clearing, and
+        the wall clock time taken to reach it is recorded."""
+        manager = core.openflow_igmp_manager
+        reference_state = self.get_reception_state()
+        snapshot_time = time.time()
+        snapshots = dict([(dpid, manager.routers[dpid].get_membership_snapshot(snapshot_time)) for dpid in reference_state])
+        self.reception_recovery_results['routers'] = len(snapshots)
+        self.reception_recovery_results['group_records'] = sum([len(port_snapshot)
+                for router_snapshot in snapshots.itervalues() for port_snapshot in router_snapshot.itervalues()])
+
+        for phase_name in ('reception_relearn', 'reception_restore'):
+            self.clear_membership_state()
+            yield SETTLE_TIME
+
+            start_time = get_curr_time()
+            if phase_name == 'reception_relearn':
+                for op_index, receiver in enumerate(self.receivers):
+                    self.send_igmp_report(phase_name, receiver, MODE_IS_EXCLUDE)
+                    if (op_index + 1) % self.batch_size == 0:
+                        yield None
+            else:
+                for op_index, dpid in enumerate(sorted(snapshots)):
+                    start_restore_time = get_curr_time()
+                    manager.routers[dpid].restore_membership_snapshot(snapshots[dpid], time.time() - snapshot_time)
+                    self.record_latency(phase_name, get_curr_time() - start_restore_time)
+                    if (op_index + 1) % self.batch_size == 0:
+                        yield None
+
+            while self.get_reception_state() != reference_state:
+                if get_curr_time() - start_time > RECEPTION_RECOVERY_TIMEOUT:
+                    self.phase_errors[phase_name] = self.phase_errors.get(phase_name, 0) + 1
+                    log.warn('Reception state not recovered after ' + str(RECEPTION_RECOVERY_TIMEOUT) + ' seconds in phase '
+                            + phase_name)
+                    break
+                yield None
+            self.reception_recovery_results[phase_name + '_secs'] = get_curr_time() - start_time
+            yield SETTLE_TIME
+
+        relearn_secs = self.reception_recovery_results['reception_relearn_secs']
+        restore_secs = self.reception_recovery_results['reception_restore_secs']
+        speedup = 0
+        if restore_secs > 0:
+            speedup = relearn_secs / restore_secs
+        self.reception_recovery_results['speedup'] = speedup
+        log.info('Reception recovery Relearn:' + '{:.3f}'.format(relearn_secs) + 's Restore:' + '{:.3f}'.format(restore_secs)
+                + 's Speedup:' + '{:.1f}'.format(speedup) + 'x')
+
+    def seed_timer_records(self, router, start_time):
+        """Adds TIMER_BENCHMARK_RECORDS INCLUDE mode group records with a single source to the router, with source timer
+        expiries staggered evenly from start_time over TIMER_BENCHMARK_SPREAD seconds."""
+        for record_index in xrange(TIMER_BENCHMARK_RECORDS):
+            port_no = (record_index % self.tor_ports) + 1
+            group = IPAddr('239.' + str((record_index // 65536) % 256) + '.' + str((record_index // 256) % 256) + '.'
+                    + str(record_index % 256))
+            group_record = MulticastMembershipRecord(group, 0)
+            group_record.x_source_records[TIMER_BENCHMARK_SOURCE] = start_time \
+                    + (record_index * TIMER_BENCHMARK_SPREAD / float(TIMER_BENCHMARK_RECORDS))
+            router.multicast_records[port_no][group] = group_record
+
+    def sweep_expired_timers(self, routers, sweep_router):
+        """Checks the timers of every group record of the specified routers, in the manner of the full timer sweep which
+        preceded the IGMPManager timer heap. Timer expiry is only applied to the records of sweep_router, so that the state
+        of all other routers is left to the IGMPManager."""
+        curr_time = time.time()
+        for router in routers:
+            for port_no in router.multicast_records.keys():
+                port_records = router.multicast_records[port_no]
+                for mcast_address, group_record in port_records.items():
+                    if group_record is None:
+                        continue
+                    next_expiry = group_record.get_next_expiry()
+                    if router is not sweep_router or next_expiry is None or next_expiry > curr_time:
+                        continue
+                    group_record.process_timer_expiry(curr_time)
+                    if group_record.filter_mode == MODE_IS_INCLUDE and not group_record.x_source_records:
+                        del port_records[mcast_address]
+                if router is sweep_router and not port_records:
+                    del router.multicast_records[port_no]
+
+    def run_igmp_timer_benchmark(self):
+        """Generator which runs the igmp_timer_check and igmp_timer_sweep phases. Identical sets of staggered group records
+        are seeded into a router registered with the IGMPManager (whose records are expired through the timer heap) and
+        an unregistered router (whose records are expired by full sweeps), and both are checked at the same interval
+        until all seeded records have expired."""
+        manager = core.openflow_igmp_manager
+        start_time = time.time() + TIMER_CHECK_INTERVAL
+        heap_router = TimerBenchmarkRouter(manager)
+        heap_router.dpid = TIMER_BENCHMARK_DPID
+        sweep_router = TimerBenchmarkRouter(manager)
+        sweep_router.dpid = TIMER_BENCHMARK_DPID + 1
+        self.seed_timer_records(heap_router, start_time)
+        self.seed_timer_records(sweep_router, start_time)
+
+        manager.routers[heap_router.dpid] = heap_router
+        for port_no in heap_router.multicast_records:
+            for group_record in heap_router.multicast_records[port_no].itervalues():
+                manager.schedule_record_expiry(heap_router.dpid, port_no, group_record)
+        swept_routers = [router for router in manager.routers.itervalues() if router is not heap_router]
+        swept_routers.append(sweep_router)
+
+        end_time = start_time + TIMER_BENCHMARK_SPREAD + (2 * TIMER_CHECK_INTERVAL)
+        while time.time() < end_time and (heap_router.multicast_records or sweep_router.multicast_records):
+            start_check_time = get_curr_time()
+            manager.process_expired_timers()
+            self.record_latency('igmp_timer_check', get_curr_time() - start_check_time)
+            start_check_time = get_curr_time()
+            self.sweep_expired_timers(swept_routers, sweep_router)
+            self.record_latency('igmp_timer_sweep', get_curr_time() - start_check_time)
+            yield TIMER_CHECK_INTERVAL
+
+        del manager.routers[heap_router.dpid]
+        num_unexpired = sum([len(port_records) for port_records in heap_router.multicast_records.itervalues()]) \
+                + sum([len(port_records) for port_records in sweep_router.multicast_records.itervalues()])
+        if num_unexpired > 0:
+            self.phase_errors['igmp_timer_check'] = self.phase_errors.get('igmp_timer_check', 0) + 1
+            log.warn('Timer benchmark ended with ' + str(num_unexpired) + ' unexpired seeded records')
+
+    def run_benchmark(self):
+        """Generator which runs all benchmark phases in order. Yields None to continue on the next iteration of the POX
+        event loop, or a delay (in seconds) to wait before continuing."""
+        log.info('Starting benchmark phase: igmp_parse')
+        for num_records in IGMP_PARSE_RECORD_COUNTS:
+            self.run_igmp_parse_benchmark(num_records)
+            yield None
+
+        log.info('Starting benchmark phase: connection_up')
+        for op_index, dpid in enumerate(sorted(self.connections)):
+            connection = self.connections[dpid]
+            update_nexus_connection(connection)
+            self.raise_openflow_event('connection_up', connection, ConnectionUp, connection.features)
+            if (op_index + 1) % self.batch_size == 0:
+                yield None
+        yield SETTLE_TIME
+
+        log.info('Starting benchmark phase: link_event')
+        for op_index, link in enumerate(self.links):
+            self.raise_link_event(link)
+            if (op_index + 1) % self.batch_size == 0:
+                yield None
+        self._link_refresh_timer = Timer(LINK_REFRESH_INTERVAL, self.refresh_links, recurring = True)
+        yield SETTLE_TIME
+
+        log.info('Starting benchmark phases: igmp_punt_switch_flow, igmp_punt_port_flows')
+        for delay in self.run_igmp_punt_benchmark():
+            yield delay
+
+        num_initial_receivers = len(self.receivers) // 2
+        log.info('Starting benchmark phase: igmp_join')
+        for op_index, receiver in enumerate(self.receivers[:num_initial_receivers]):
+            self.send_igmp_report('igmp_join', receiver, CHANGE_TO_EXCLUDE_MODE)
+            if (op_index + 1) % self.batch_size == 0:
+                yield None
+        yield SETTLE_TIME
+
+        log.info('Starting benchmark phase: multicast_packet_in')
+        for op_index, source in enumerate(self.sources):
+            dpid, port_no, host_ip, eth_addr, group = source
+            packet_in = build_packet_in(port_no, eth_addr, host_ip, group, UDP_PROTOCOL, MULTICAST_PAYLOAD)
+            self.raise_openflow_event('multicast_packet_in', self.connections[dpid], PacketIn, packet_in)
+            if (op_index + 1) % self.batch_size == 0:
+                yield None
+        yield SETTLE_TIME
+
+        log.info('Starting benchmark phase: igmp_join_routed')
+        for op_index, receiver in enumerate(self.receivers[num_initial_receivers:]):
+            self.send_igmp_report('igmp_join_routed', receiver, CHANGE_TO_EXCLUDE_MODE)
+            if (op_index + 1) % self.batch_size == 0:
+                yield None
+
+        log.info('Measuring stats processing for ' + str(self.stats_duration) + ' seconds')
+        yield self.stats_duration
+        self.flow_tracking_results = self.get_flow_tracking_results()
+        log.info('FlowTracking TopK:' + str(self.flow_tracking_results['flow_topk']) + ' SimulatedFlowEntries:'
+                + str(self.flow_tracking_results['simulated_flow_entries']) + ' TrackedFlowEntries:'
+                + str(self.flow_tracking_results['tracked_flow_entries']) + ' SketchCounters:'
+                + str(self.flow_tracking_results['sketch_counters']) + ' MeanErrorMbps:'
+                + '{:.4f}'.format(self.flow_tracking_results['mean_error_mbps']))
+
+        log.info('Starting benchmark phases: reception_relearn, reception_restore')
+        for delay in self.run_reception_recovery_benchmark():
+            yield delay
+
+        log.info('Starting benchmark phases: igmp_timer_check, igmp_timer_sweep')
+        for delay in self.run_igmp_timer_benchmark():
+            yield delay
+
+        log.info('Starting benchmark phase: igmp_leave')
+        for op_index, receiver in enumerate(self.receivers):
+            self.send_igmp_report('igmp_leave', receiver, CHANGE_TO_INCLUDE_MODE)
+            if (op_index + 1) % self.batch_size == 0:
+                yield None
+        yield SETTLE_TIME
+
+    def run_next_step(self):
+        """Runs the benchmark until the next yield of run_benchmark(), and schedules the following step."""
+        try:
+            delay = self._benchmark_steps.next()
+        except StopIteration:
+            self.finish_benchmark()
+            return
+        except Exception as e:
+            log.error('Benchmark aborted: ' + type(e).__name__ + ': ' + str(e))
+            self.finish_benchmark(str(e))
+            return
+
+        if delay is None:
+            core.callLater(self.run_next_step)
+        else:
+            Timer(delay, self.run_next_step)
+
+    def get_phase_results(self):
+        """Returns a dictionary of the results of each phase, keyed by phase name. All times are in milliseconds."""
+        phase_results = {}
+        for phase_name in self.phase_names:
+            histogram = self.phase_histograms[phase_name]
+            subsystem = PHASE_SUBSYSTEMS.get(phase_name)
+            if subsystem is None:
+                subsystem = PHASE_SUBSYSTEMS.get(phase_name.rsplit('_', 1)[0])
+            ops_per_sec = 0
+            if histogram.total > 0:
+                ops_per_sec = histogram.count / histogram.total
+            phase_results[phase_name] = histogram.get_summary_dict()
+            phase_results[phase_name]['subsystem'] = subsystem
+            phase_results[phase_name]['errors'] = self.phase_errors.get(phase_name, 0)
+            phase_results[phase_name]['ops_per_sec'] = ops_per_sec
+        return phase_results
+
+    def check_thresholds(self, phase_results):
+        """Compares phase results to the thresholds in thresholds_file, and returns a list of regression descriptions."""
+        with open(self.thresholds_file, 'r') as thresholds_file:
+            thresholds = json.load(thresholds_file)
+
+        regressions = []
+        for phase_name in sorted(thresholds):
+            phase_thresholds = thresholds[phase_name]
+            result = phase_results.get(phase_name)
+            if result is None:
+                regressions.append(phase_name + ': No operations recorded')
+                continue
+            if 'min_ops_per_sec' in phase_thresholds and result['ops_per_sec'] < phase_thresholds['min_ops_per_sec']:
+                regressions.append(phase_name + ': OpsPerSec ' + '{:.1f}'.format(result['ops_per_sec']) + ' < '
+                        + str(phase_thresholds['min_ops_per_sec']))
+            if 'max_mean_ms' in phase_thresholds and result['mean_ms'] > phase_thresholds['max_mean_ms']:
+                regressions.append(phase_name + ': Mean ' + '{:.3f}'.format(result['mean_ms']) + 'ms > '
+                        + str(phase_thresholds['max_mean_ms']) + 'ms')
+            if 'max_p99_ms' in phase_thresholds and result['p99_ms'] > phase_thresholds['max_p99_ms']:
+                regressions.append(phase_name + ': P99 ' + '{:.3f}'.format(result['p99_ms']) + 'ms > '
+                        + str(phase_thresholds['max_p99_ms']) + 'ms')
+            if result['errors'] > phase_thresholds.get('max_errors', 0):
+                regressions.append(phase_name + ': Errors ' + str(result['errors']) + ' > '
+                        + str(phase_thresholds.get('max_errors', 0)))
+        return regressions
+
+    def finish_benchmark(self, abort_reason = None):
+        """Writes benchmark results to results_file, checks regression thresholds, and stops POX."""
+        if self._link_refresh_timer is not None:
+            self._link_refresh_timer.cancel()
+            self._link_refresh_timer = None
+
+        phase_results = self.get_phase_results()
+        results = {
+            'config': {
+                'topology': self.topology,
+                'num_switches': len(self.connections),
+                'num_links': len(self.edges),
+                'tor_ports': self.tor_ports,
+                'num_groups': self.num_groups,
+                'num_receivers': self.num_receivers,
+                'flow_rate_mbps': self.flow_rate,
+                'stats_duration': self.stats_duration,
+                'batch_size': self.batch_size,
+            },
+            'duration': time.time() - self._benchmark_start_time,
+            'phases': phase_results,
+            'trace_histograms': core.groupflow_event_tracer.get_histogram_summaries(),
+            'flow_tracking': self.flow_tracking_results,
+            'igmp_punt': self.igmp_punt_results,
+            'reception_recovery': self.reception_recovery_results,
+            'switch_messages': {
+                'flow_mods': sum([connection.num_flow_mods for connection in self.connections.itervalues()]),
+                'packet_outs': sum([connection.num_packet_outs for connection in self.connections.itervalues()]),
+                'barrier_requests': sum([connection.num_barrier_requests for connection in self.connections.itervalues()]),
+                'stats_requests': sum([connection.num_stats_requests for connection in self.connections.itervalues()]),
+            },
+            'aborted': abort_reason,
+            'regressions': [],
+        }
+        if abort_reason is not None:
+            results['regressions'].append('Benchmark aborted: ' + abort_reason)
+
+        for phase_name in self.phase_names:
+            result = phase_results[phase_name]
+            log.info('Phase:' + phase_name + ' ' + self.phase_histograms[phase_name].get_summary_str()
+                    + ' Errors:' + str(result['errors']) + ' OpsPerSec:' + '{:.1f}'.format(result['ops_per_sec']))
+
+        if self.thresholds_file is not None:
+            try:
+                results['regressions'].extend(self.check_thresholds(phase_results))
+            except (IOError, OSError, ValueError) as e:
+                log.warn('Unable to check thresholds from ' + str(self.thresholds_file) + ': ' + str(e))
+                results['regressions'].append('Unable to check thresholds: ' + str(e))
+            for regression in results['regressions']:
+                log.warn('Regression: ' + regression)
+            if not results['regressions']:
+                log.info('No regressions against thresholds in ' + str(self.thresholds_file))
+
+        with open(self.results_file, 'w') as results_file:
+            json.dump(results, results_file, indent = 4, sort_keys = True)
+        log.info('Wrote benchmark results to file: ' + str(self.results_file))
+        core.callLater(core.quit)
+
+
+def launch(topology = None, tor_ports = TOR_PORTS, num_groups = NUM_GROUPS, num_receivers = NUM_RECEIVERS,
+        flow_rate = FLOW_RATE_MbPS, stats_duration = STATS_DURATION, batch_size = BATCH_SIZE, results_file = RESULTS_FILE,
+        thresholds_file = None):
+    # Method called by the POX core when launching the module
+    if topology is None:
+        log.error('A BRITE topology file must be specified with --topology')
+        return
+    core.registerNew(GroupFlowBenchmark, topology, int(tor_ports), int(num_groups), int(num_receivers), float(flow_rate),
+            float(stats_duration), int(batch_size), results_file, thresholds_file)
@@ -19,7 +19,36 @@
 This module allows event traces to be produced by the IGMP Manager and Groupflow modules, with the goal of
 tracing various event processing times for benchmarking and evaluation purposes.
 
-This module does not support any command line arguments.
+The following command line arguments are supported:
+
+* trace_ring_size: The number of slots in the ring of active (not yet archived) trace events. If a new trace event is
+  initialized while the slot it maps to is still occupied, the older event is discarded.
+  Default: 4096
+* trace_flush_batch: The number of archived trace events which are buffered in memory before being written to the
+  log file in a single write.
+  Default: 256
+* trace_max_age: The maximum age (in seconds) of an active trace event. Trace events which are not archived within this
+  time (such as the IGMPTraceEvent of a report which did not result in a routing event) are discarded.
+  Default: 60
+* trace_export: Determines the columnar export of archived trace events, which is produced alongside the plain-text
+  event trace. Each row describes one trace event, with the fixed schema defined by TRACE_COLUMNS (missing values are
+  empty in CSV output, and NaN or -1 in NumPy output). Supported options:
+  'none': No columnar export is produced.
+  'csv': Rows are appended to a CSV file with a header row as trace events are flushed. The file can be loaded with
+  numpy.genfromtxt(filename, delimiter=',', names=True, dtype=None).
+  'npz': Rows are buffered in memory and written to numbered compressed NumPy files (each holding a structured array
+  named 'events') whenever TRACE_EXPORT_CHUNK_ROWS rows are buffered, and on termination. The chunks can be loaded with
+  numpy.concatenate([numpy.load(f)['events'] for f in sorted(glob.glob(prefix + '_*.npz'))]). Falls back to 'csv' if
+  NumPy is not available.
+  Default: 'csv'
+
+Join latency tracing: Each IGMP report is tagged with one trace ID per group record, of the form
+"<multicast group>-<reporting host IP>". Receiver applications (see groupflow_scripts/multicast_receiver_VLC.py) log
+the same trace ID along with their join and first packet times. Once OpenFlow rules have been sent for a routing event,
+a barrier request is sent to each modified router, and the GroupFlowTraceEvent is only archived once all barrier
+replies have been received. Trace events record a wall clock anchor, and the serialized events include wall clock times
+for the IGMP report and for barrier completion, so that controller phases can be correlated with receiver logs (which
+share the same clock in Mininet emulations). See groupflow_scripts/analyze_join_latency.py.
 
 Created on Oct 28th, 2013
 
@@ -28,47 +57,218 @@ Author: Alexander Craig - alexcraig1@gmail.com
 
 import time
 import datetime
+import os
+import csv
 from pox.core import core
 from pox.lib.revent import *
 from pox.lib.util import dpid_to_str
+from pox.lib.recoco import Timer
 import pox.lib.packet as pkt
+import pox.openflow.libopenflow_01 as of
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 USE_TIME_TIME = 0   # Benchmark using time.time()
 USE_TIME_CLOCK = 1  # Benchmark using time.clock()
+USE_MONOTONIC = 2   # Benchmark using a monotonic, high resolution clock (unaffected by system clock adjustments)
 
 # Set this constant to one of the above options
 # time.clock() is the default if no valid option is set here
-TIMING_MODE = USE_TIME_TIME
+TIMING_MODE = USE_MONOTONIC
+
+# Monotonic clock source: time.monotonic() where available, otherwise clock_gettime(CLOCK_MONOTONIC) through ctypes.
+# Falls back to time.time() if neither is available.
+try:
+    from time import monotonic as monotonic_time
+except ImportError:
+    try:
+        import ctypes
+        import ctypes.util
+
+        class _timespec(ctypes.Structure):
+            _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+        _CLOCK_MONOTONIC = 1
+        _librt = ctypes.CDLL(ctypes.util.find_library('rt') or ctypes.util.find_library('c'), use_errno = True)
+        _clock_gettime = _librt.clock_gettime
+        _clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(_timespec)]
+        _monotonic_timespec = _timespec()
+
+        def monotonic_time():
+            """Returns the value (in seconds) of the system monotonic clock."""
+            if _clock_gettime(_CLOCK_MONOTONIC, ctypes.byref(_monotonic_timespec)) != 0:
+                errno = ctypes.get_errno()
+                raise OSError(errno, os.strerror(errno))
+            return _monotonic_timespec.tv_sec + _monotonic_timespec.tv_nsec * 1e-9
+        monotonic_time()
+    except (ImportError, OSError, AttributeError, TypeError):
+        monotonic_time = None
+
+
+def get_curr_time():
+    """Returns the current time, using the method selected by the TIMING_MODE constant.
+
+    This method is used to record time values in all trace events. Valid values for TIMING_MODE are USE_TIME_TIME (which
+    uses time.time() to get the current time), USE_TIME_CLOCK (which uses time.clock() to get the current time) and
+    USE_MONOTONIC (which uses the system monotonic clock, or time.time() if no monotonic clock is available).
+    """
+    if TIMING_MODE == USE_MONOTONIC:
+        if monotonic_time is not None:
+            return monotonic_time()
+        return time.time()
+    if TIMING_MODE == USE_TIME_TIME:
+        return time.time()
+    if TIMING_MODE == USE_TIME_CLOCK:
+        return time.clock()
+
+    # time.clock() is the default behaviour if no valid option is specified
+    return time.clock()
+
+TRACE_RING_SIZE = 4096
+TRACE_FLUSH_BATCH = 256
+TRACE_MAX_AGE = 60  # Seconds
+
+# Constants used to determine the columnar export format of archived trace events
+TRACE_EXPORT_NONE = 0
+TRACE_EXPORT_CSV = 1
+TRACE_EXPORT_NPZ = 2
+TRACE_EXPORT_CHUNK_ROWS = 65536 # Rows buffered in memory before an npz export chunk is written
+
+# Trace event type identifiers used in columnar exports
+IGMP_TRACE_EVENT_TYPE = 'igmp'
+GROUPFLOW_TRACE_EVENT_TYPE = 'groupflow'
+
+# Fixed schema of columnar trace event exports, as (column name, NumPy dtype) tuples. All durations are in milliseconds,
+# and all timestamps are wall clock times. trigger_event_id is the event_id of the IGMPTraceEvent which triggered a
+# GroupFlowTraceEvent.
+TRACE_COLUMNS = [
+    ('event_id', 'i8'),
+    ('event_type', 'S9'),
+    ('trigger_event_id', 'i8'),
+    ('init_wall_time', 'f8'),
+    ('router_dpid', 'i8'),
+    ('host_ip', 'S15'),
+    ('multicast_group', 'S15'),
+    ('src_ip', 'S15'),
+    ('igmp_msg_type', 'i4'),
+    ('num_igmp_group_records', 'i4'),
+    ('igmp_processing_ms', 'f8'),
+    ('igmp_batch_delay_ms', 'f8'),
+    ('tree_calc_ms', 'f8'),
+    ('route_processing_ms', 'f8'),
+    ('flow_installation_ms', 'f8'),
+    ('flow_barrier_ms', 'f8'),
+    ('flow_barrier_wall_time', 'f8')]
 
 log = core.getLogger()
 
-class TraceEvent(EventMixin):
+class TraceEvent(object):
     
     """Superclass for trace events. Stores only the event ID and time of the event's creation.
     
-    Subclassed by IGMPTraceEvent and GroupFlowTraceEvent.
+    Subclassed by IGMPTraceEvent and GroupFlowTraceEvent. All trace event classes define __slots__ to minimize
+    allocation costs at high event rates.
+
+    The wall clock time (time.time()) of the event's creation is also stored in init_wall_time, so that trace times
+    recorded with a monotonic clock can be converted to wall clock times for correlation with other processes.
     """
+    
+    __slots__ = ['init_time', 'init_wall_time', 'event_id']
 
     def __init__(self, event_id=0):
         """Initializes a new event with the specified integer event_id."""
         self.init_time = self.get_curr_time()
+        self.init_wall_time = time.time()
         self.event_id = event_id
 
     def get_curr_time(self):
-        """Returns the current time, using the method selected by the TIMING_MODE constant.
+        """Returns the current time, using the method selected by the TIMING_MODE constant (see get_curr_time())."""
+        return get_curr_time()
 
-        This method is used to record time values in all subclasses of this class. Valid values
-        for TIMING_MODE are USE_TIME_TIME (which uses time.time() to get the current time) and
-        USE_TIME_CLOCK (which uses time.clock() to get the current time)
-        """
-        global TIMING_MODE
-        if TIMING_MODE == USE_TIME_TIME:
-            return time.time()
-        if TIMING_MODE == USE_TIME_CLOCK:
-            return time.clock()
+    def get_wall_time(self, trace_time):
+        """Returns the wall clock time corresponding to a time value recorded by this event."""
+        return self.init_wall_time + (trace_time - self.init_time)
 
-        # time.clock() is the default behaviour if no valid option is specified
-        return time.clock()
+
+def _to_ms(seconds):
+    """Converts a duration in seconds to milliseconds, preserving None values."""
+    if seconds is None:
+        return None
+    return seconds * 1000
+
+
+class LatencyHistogram(object):
+
+    """Online log-linear (HDR-style) histogram of latency values.
+
+    Values are recorded in integer microseconds. Values below SUB_BUCKET_COUNT are counted exactly, and larger values are
+    counted in buckets which retain the SUB_BUCKET_BITS most significant bits of the value, bounding the relative error
+    of reported percentiles to 2^-(SUB_BUCKET_BITS - 1) while using memory proportional to the logarithm of the value range.
+    """
+
+    SUB_BUCKET_BITS = 7
+    SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+
+    __slots__ = ['buckets', 'count', 'total', 'max_value']
+
+    def __init__(self):
+        self.buckets = {}   # Bucket lower bound (microseconds) -> count
+        self.count = 0
+        self.total = 0
+        self.max_value = 0
+
+    def record(self, value_seconds):
+        """Records a single latency value (in seconds)."""
+        value = int(value_seconds * 1000000)
+        if value < 0:
+            value = 0
+        if value >= self.SUB_BUCKET_COUNT:
+            shift = value.bit_length() - self.SUB_BUCKET_BITS
+            value = (value >> shift) << shift
+        self.buckets[value] = self.buckets.get(value, 0) + 1
+        self.count += 1
+        self.total += value_seconds
+        if value_seconds > self.max_value:
+            self.max_value = value_seconds
+
+    def get_percentile(self, percentile):
+        """Returns the lower bound (in seconds) of the bucket containing the specified percentile (0 - 100), or None if no
+        values have been recorded."""
+        if self.count == 0:
+            return None
+        threshold = self.count * percentile / 100.0
+        cumulative_count = 0
+        for bucket in sorted(self.buckets):
+            cumulative_count += self.buckets[bucket]
+            if cumulative_count >= threshold:
+                return bucket / 1000000.0
+        return self.max_value
+
+    def get_summary_str(self):
+        """Returns a single line summary of the histogram, with all values in milliseconds."""
+        if self.count == 0:
+            return 'Count:0'
+        return 'Count:' + str(self.count) + ' Mean:' + '{:10.6f}'.format(self.total / self.count * 1000).strip() \
+                + ' P50:' + '{:10.6f}'.format(self.get_percentile(50) * 1000).strip() \
+                + ' P90:' + '{:10.6f}'.format(self.get_percentile(90) * 1000).strip() \
+                + ' P99:' + '{:10.6f}'.format(self.get_percentile(99) * 1000).strip() \
+                + ' Max:' + '{:10.6f}'.format(self.max_value * 1000).strip()
+
+    def get_summary_dict(self):
+        """Returns a dictionary summary of the histogram (suitable for JSON output), with all values in milliseconds."""
+        if self.count == 0:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1000,
+            'p50_ms': self.get_percentile(50) * 1000,
+            'p90_ms': self.get_percentile(90) * 1000,
+            'p99_ms': self.get_percentile(99) * 1000,
+            'max_ms': self.max_value * 1000,
+        }
 
 
 class IGMPTraceEvent(TraceEvent):
@@ -78,6 +278,7 @@ class IGMPTraceEvent(TraceEvent):
     The following data is recorded:
     
     * router_dpid: Data plane identifier of the router which received the packet
+    * host_ip: IP address of the host which sent the packet
     * igmp_msg_type: The type of IGMP message processed (see constants defined in pox.lib.packet.igmpv3)
     * igmp_group_records: A list of tuples specifying the group records contained in the IGMP packet.
       Tuples are of the form (group_record_type, multicast_address).
@@ -85,27 +286,44 @@ class IGMPTraceEvent(TraceEvent):
     * num_igmp_group_records: Number of group records contained in the IGMP packet
     * igmp_processing_start_time: Time at which the packet was identified as an IGMP packet
     * igmp_prcessing_end_time: Time at which all IGMP processing associated with the IGMP packet was completed
+    * igmp_batch_delay: Length of time (in seconds) for which the reception state changes triggered by the IGMP packet
+      were held by the IGMP module's report coalescing window before being processed. This delay is included in the
+      interval between igmp_processing_start_time and igmp_processing_end_time, but is excluded from the value returned by
+      get_igmp_processing_time().
+    * coalesced_trace_events: IGMPTraceEvents of reports which were coalesced with this event's report, and whose
+      reception state changes were delivered to the GroupFlow module along with this event.
     """
 
+    __slots__ = ['router_dpid', 'host_ip', 'igmp_msg_type', 'igmp_group_records', 'num_igmp_group_records',
+            'igmp_processing_start_time', 'igmp_processing_end_time', 'igmp_batch_start_time', 'igmp_batch_delay',
+            'coalesced_trace_events', '_processing_complete']
+
     def __init__(self, event_id, router_dpid):
         """Initializes a new IGMPTraceEvent with the specified event_id and router_dpid"""
         TraceEvent.__init__(self, event_id)
         self.router_dpid = router_dpid
+        self.host_ip = None
         self.igmp_msg_type = None
         self.igmp_group_records = []
         self.num_igmp_group_records = 0
         self.igmp_processing_start_time = 0
-        self.igmp_proecssing_end_time = 0
+        self.igmp_processing_end_time = 0
+        self.igmp_batch_start_time = None
+        self.igmp_batch_delay = 0
+        self.coalesced_trace_events = []
         self._processing_complete = False
 
     def set_igmp_start_time(self, igmp_packet_in_event):
         """Processes a PacketIn event containing an IGMP packet, and sets associated data fields in the trace event.
 
         Fields which are populated by this method:
-        * igmp_msg_type, igmp_group_records, num_igmp_group_records, igmp_processing_start_time
+        * host_ip, igmp_msg_type, igmp_group_records, num_igmp_group_records, igmp_processing_start_time
         
         For best benchmarking accuracy, this method should be called as soon as the PacketIn is determined to contain an IGMP packet
         """
+        ipv4_pkt = igmp_packet_in_event.parsed.find(pkt.ipv4)
+        if not ipv4_pkt is None:
+            self.host_ip = ipv4_pkt.srcip
         igmp_pkt = igmp_packet_in_event.parsed.find(pkt.igmpv3)
         self.igmp_msg_type = igmp_pkt.msg_type
         for igmp_group_record in igmp_pkt.group_records:
@@ -113,6 +331,17 @@ class IGMPTraceEvent(TraceEvent):
         self.num_igmp_group_records = len(igmp_pkt.group_records)
         self.igmp_processing_start_time = self.get_curr_time()
 
+    def set_igmp_batch_start_time(self):
+        """Records the current time as the time at which the reception state changes triggered by this event were queued
+        for coalescing with other IGMP reports."""
+        self.igmp_batch_start_time = self.get_curr_time()
+
+    def set_igmp_batch_end_time(self):
+        """Records the batching delay of this event, using the current time as the time at which the coalesced reception
+        state changes were released for processing."""
+        if self.igmp_batch_start_time is not None:
+            self.igmp_batch_delay = self.get_curr_time() - self.igmp_batch_start_time
+
     def set_igmp_end_time(self):
         """Records the current time as the time at which IGMP processing associated with this event was completed."""
         self.igmp_processing_end_time = self.get_curr_time()
@@ -126,7 +355,40 @@ class IGMPTraceEvent(TraceEvent):
         if not self._processing_complete:
             return None
 
-        return self.igmp_processing_end_time - self.igmp_processing_start_time
+        return self.igmp_processing_end_time - self.igmp_processing_start_time - self.igmp_batch_delay
+
+    def get_trace_ids(self):
+        """Returns a list of the join trace IDs associated with this event, of the form "<multicast group>-<host IP>".
+
+        One trace ID is generated for each group record in the IGMP packet. Returns an empty list if the reporting host
+        is not known.
+        """
+        if self.host_ip is None:
+            return []
+        return [str(multicast_address) + '-' + str(self.host_ip) for record_type, multicast_address in
+                self.igmp_group_records]
+
+    def get_trace_ids_str(self):
+        """Returns a space separated listing of the trace IDs of this event and all coalesced events, where each trace ID
+        is suffixed with the wall clock time at which the associated report was received by the controller."""
+        trace_id_strs = []
+        for igmp_trace_event in [self] + self.coalesced_trace_events:
+            report_wall_time = '{:.6f}'.format(igmp_trace_event.get_wall_time(igmp_trace_event.igmp_processing_start_time))
+            for trace_id in igmp_trace_event.get_trace_ids():
+                trace_id_strs.append(trace_id + '@' + report_wall_time)
+        return ' '.join(trace_id_strs)
+
+    def get_columnar_row(self):
+        """Returns a tuple of the event's values in the order defined by TRACE_COLUMNS, with None for missing values."""
+        igmp_batch_delay = None
+        if self.igmp_batch_start_time is not None:
+            igmp_batch_delay = self.igmp_batch_delay
+        host_ip = None
+        if self.host_ip is not None:
+            host_ip = str(self.host_ip)
+        return (self.event_id, IGMP_TRACE_EVENT_TYPE, None, self.init_wall_time, self.router_dpid, host_ip, None, None,
+                self.igmp_msg_type, self.num_igmp_group_records, _to_ms(self.get_igmp_processing_time()),
+                _to_ms(igmp_batch_delay), None, None, None, None, None)
 
     def get_log_str(self):
         """Returns a plain-text representation of the event that will be used when the event is serialized to a log file.
@@ -136,9 +398,14 @@ class IGMPTraceEvent(TraceEvent):
         return_string = str(self.event_id) + ' - ' + '{:10.8f}'.format(self.init_time) + '\n'
         return_string += 'Router: ' + dpid_to_str(self.router_dpid) + ' IGMP Msg type: ' + str(
             self.igmp_msg_type) + ' Num Records: ' + str(self.num_igmp_group_records) + '\n'
+        trace_ids_str = self.get_trace_ids_str()
+        if trace_ids_str:
+            return_string += 'Trace IDs: ' + trace_ids_str + '\n'
         if self._processing_complete:
             return_string += 'IGMP processing time: ' + '{:10.8f}'.format(
                 self.get_igmp_processing_time() * 1000) + ' ms\n'
+            if self.igmp_batch_start_time is not None:
+                return_string += 'IGMP batching delay: ' + '{:10.8f}'.format(self.igmp_batch_delay * 1000) + ' ms\n'
         return return_string
 
 
@@ -160,6 +427,8 @@ class GroupFlowTraceEvent(TraceEvent):
     * route_processing_end_time: Time at which route processing was completed for this routing event.
     * flow_installation_start_time: Time at which OpenFlow rule installation was started for this routing event.
     * flow_installation_end_time: Time at which OpenFlow rule installation was completed for this routing event.
+    * flow_barrier_end_time: Time at which barrier replies were received from all routers modified by this routing event,
+      confirming that all OpenFlow rules have been applied in the data plane.
     * multicast_group: Multicast group address which this routing event is associated with.
     * src_ip: Multicast sender IP address which this routing event is associated with.
     
@@ -167,6 +436,12 @@ class GroupFlowTraceEvent(TraceEvent):
     tree calculation, and in these cases tree_calc_start_time and tree_calc_end_time will be set to None
     """
 
+    __slots__ = ['igmp_trace_event', 'tree_calc_start_time', 'tree_calc_end_time', '_complete_tree_calc',
+            'route_processing_start_time', 'route_processing_end_time', '_complete_route_processing',
+            'flow_installation_start_time', 'flow_installation_end_time', '_complete_flow_installation',
+            'flow_barrier_end_time', '_complete_flow_barrier', 'pending_barriers', 'archive_requested',
+            'multicast_group', 'src_ip']
+
     def __init__(self, event_id, igmp_trace_event=None):
         """Initializes a new GroupFlowTraceEvent with the specified event_id associated IGMPTraceEvent (defaults to None)"""
         TraceEvent.__init__(self, event_id)
@@ -179,13 +454,18 @@ class GroupFlowTraceEvent(TraceEvent):
         self._complete_tree_calc = False
 
         self.route_processing_start_time = None
-        self.route_proessing_end_time = None
+        self.route_processing_end_time = None
         self._complete_route_processing = False
 
         self.flow_installation_start_time = None
         self.flow_installation_end_time = None
         self._complete_flow_installation = False
 
+        self.flow_barrier_end_time = None
+        self._complete_flow_barrier = False
+        self.pending_barriers = set()   # (router_dpid, xid) tuples of outstanding barrier requests
+        self.archive_requested = False
+
         self.multicast_group = None
         self.src_ip = None
 
@@ -220,6 +500,11 @@ class GroupFlowTraceEvent(TraceEvent):
         self.flow_installation_end_time = self.get_curr_time()
         self._complete_flow_installation = True
 
+    def set_flow_barrier_end_time(self):
+        """Records the current time as the time at which all barrier replies for this routing event were received."""
+        self.flow_barrier_end_time = self.get_curr_time()
+        self._complete_flow_barrier = True
+
     def get_tree_calc_time(self):
         """Returns the length of time (in seconds) associated with tree calculation for this routing event.
 
@@ -250,6 +535,43 @@ class GroupFlowTraceEvent(TraceEvent):
 
         return self.flow_installation_end_time - self.flow_installation_start_time
 
+    def get_flow_barrier_time(self):
+        """Returns the length of time (in seconds) between the start of OpenFlow rule installation and the receipt of
+        all barrier replies for this routing event.
+
+        Returns None if the associated times have not been recorded.
+        """
+        if not self._complete_flow_barrier or not self._complete_flow_installation:
+            return None
+
+        return self.flow_barrier_end_time - self.flow_installation_start_time
+
+    def get_columnar_row(self):
+        """Returns a tuple of the event's values in the order defined by TRACE_COLUMNS, with None for missing values.
+
+        IGMP related columns are populated from the triggering IGMPTraceEvent (if any).
+        """
+        trigger_event_id = router_dpid = host_ip = igmp_msg_type = num_igmp_group_records = igmp_processing_time = None
+        if not self.igmp_trace_event is None:
+            trigger_event_id = self.igmp_trace_event.event_id
+            router_dpid = self.igmp_trace_event.router_dpid
+            if self.igmp_trace_event.host_ip is not None:
+                host_ip = str(self.igmp_trace_event.host_ip)
+            igmp_msg_type = self.igmp_trace_event.igmp_msg_type
+            num_igmp_group_records = self.igmp_trace_event.num_igmp_group_records
+            igmp_processing_time = self.igmp_trace_event.get_igmp_processing_time()
+        multicast_group = src_ip = flow_barrier_wall_time = None
+        if self.multicast_group is not None:
+            multicast_group = str(self.multicast_group)
+        if self.src_ip is not None:
+            src_ip = str(self.src_ip)
+        if self._complete_flow_barrier:
+            flow_barrier_wall_time = self.get_wall_time(self.flow_barrier_end_time)
+        return (self.event_id, GROUPFLOW_TRACE_EVENT_TYPE, trigger_event_id, self.init_wall_time, router_dpid, host_ip,
+                multicast_group, src_ip, igmp_msg_type, num_igmp_group_records, _to_ms(igmp_processing_time), None,
+                _to_ms(self.get_tree_calc_time()), _to_ms(self.get_route_processing_time()),
+                _to_ms(self.get_flow_installation_time()), _to_ms(self.get_flow_barrier_time()), flow_barrier_wall_time)
+
     def get_log_str(self):
         """Returns a plain-text representation of the event that will be used when the event is serialized to a log file."""
         return_string = str(self.event_id) + ' - ' + '{:10.8f}'.format(self.init_time) + '\n'
@@ -262,6 +584,10 @@ class GroupFlowTraceEvent(TraceEvent):
         if self._complete_flow_installation:
             return_string += 'Flow installation time: ' + '{:10.8f}'.format(
                 self.get_flow_installation_time() * 1000) + ' ms\n'
+        if self._complete_flow_barrier and self._complete_flow_installation:
+            return_string += 'Flow barrier time: ' + '{:10.8f}'.format(self.get_flow_barrier_time() * 1000) + ' ms\n'
+            return_string += 'Flow barrier wall time: ' + '{:.6f}'.format(
+                self.get_wall_time(self.flow_barrier_end_time)) + '\n'
 
         if not self.igmp_trace_event is None:
             return_string += 'Triggered by event:\n'
@@ -271,45 +597,148 @@ class GroupFlowTraceEvent(TraceEvent):
 
 
 class GroupFlowEventTracer(EventMixin):
-    """The GroupFlowEventTracer is responsible for managing currently active IGMPTraceEvents and GroupFlowTraceEvents"""
+    """The GroupFlowEventTracer is responsible for managing currently active IGMPTraceEvents and GroupFlowTraceEvents
+    
+    Active trace events are stored in a preallocated ring indexed by event_id, so that trace events can be initialized
+    and archived in constant time. Archived trace events are buffered and written to the log file in bulk. Active trace
+    events which are never archived are discarded once they exceed the maximum trace event age, or when their slot in the
+    ring is reused. As all tracer methods are called from the POX cooperative event loop, no locking is required.
+    """
     _core_name = "groupflow_event_tracer"
 
-    def __init__(self):
+    def __init__(self, ring_size = TRACE_RING_SIZE, flush_batch = TRACE_FLUSH_BATCH, max_age = TRACE_MAX_AGE,
+            export_mode = TRACE_EXPORT_CSV):
         """Initializes the module once dependencies have initialized"""
 
         def startup():
             self._log_file_name = datetime.datetime.now().strftime("eventtrace_%H-%M-%S_%B-%d_%Y.txt")
             log.info('Writing event trace info to file: ' + str(self._log_file_name))
             self._log_file = open(self._log_file_name, 'w') # TODO: Figure out how to properly close this on shutdown
+            if self.export_mode == TRACE_EXPORT_CSV:
+                self._export_file_name = self._log_file_name[:-len('.txt')] + '.csv'
+                log.info('Writing columnar event trace to file: ' + str(self._export_file_name))
+                self._export_file = open(self._export_file_name, 'wb')
+                self._export_writer = csv.writer(self._export_file)
+                self._export_writer.writerow([column_name for column_name, column_type in TRACE_COLUMNS])
+            elif self.export_mode == TRACE_EXPORT_NPZ:
+                # Prefix of the numbered chunk files
+                self._export_file_name = self._log_file_name[:-len('.txt')]
             self._module_init_time = time.time()
+            core.openflow.addListeners(self, priority = 0)
+            # Setup the timer to flush archived events and discard expired events
+            self._expiry_timer = Timer(max(1, self.max_age / 4), self.expire_trace_events, recurring = True)
 
         self._module_init_time = 0
         self._log_file = None
         self._log_file_name = None
         self._next_event_id = 0
-
-        self._igmp_trace_events = []
-        self._groupflow_trace_events = []
+        self._expiry_timer = None
+        self._export_file = None
+        self._export_file_name = None
+        self._export_writer = None
+        # Columnar rows held for NumPy export until the next chunk is written
+        self._export_rows = []
+        self._num_export_chunks = 0
+        
+        self.export_mode = export_mode
+        if self.export_mode == TRACE_EXPORT_NPZ and numpy is None:
+            log.warn('NumPy is not available, exporting trace events in CSV format')
+            self.export_mode = TRACE_EXPORT_CSV
+        self.ring_size = int(ring_size)
+        self.flush_batch = int(flush_batch)
+        self.max_age = float(max_age)   # Seconds
+        log.info('Set TraceRingSize:' + str(self.ring_size) + ' TraceFlushBatch:' + str(self.flush_batch)
+                + ' TraceMaxAge:' + str(self.max_age) + ' seconds TraceExport:' + str(self.export_mode))
+
+        # Ring of active trace events:  self._active_trace_events[event_id % ring_size] -> trace event (or None)
+        self._active_trace_events = [None] * self.ring_size
+        # Event ID of the oldest trace event which may still be active
+        self._oldest_event_id = 0
+        # Archived trace events which have not yet been written to the log file
+        self._pending_trace_events = []
+        # GroupFlowTraceEvents awaiting barrier replies: self._pending_barriers[(router_dpid, xid)] -> trace event
+        self._pending_barriers = {}
+        
+        self.num_archived_trace_events = 0
+        self.num_discarded_trace_events = 0
+        
+        # Per-phase latency histograms, updated as trace events are archived
+        self.tree_calc_histogram = LatencyHistogram()
+        self.route_processing_histogram = LatencyHistogram()
+        self.flow_installation_histogram = LatencyHistogram()
+        self.flow_barrier_histogram = LatencyHistogram()
+        self.igmp_processing_histogram = LatencyHistogram()
 
         # Setup listeners
         core.call_when_ready(startup, ('openflow'))
 
+    def get_histogram_summaries(self):
+        """Returns dictionary summaries (see LatencyHistogram.get_summary_dict()) of all non-empty latency histograms, keyed
+        by phase name."""
+        histograms = {
+            'igmp_processing': self.igmp_processing_histogram,
+            'tree_calc': self.tree_calc_histogram,
+            'route_processing': self.route_processing_histogram,
+            'flow_installation': self.flow_installation_histogram,
+            'flow_barrier': self.flow_barrier_histogram,
+        }
+        return dict((name, histogram.get_summary_dict()) for name, histogram in histograms.iteritems()
+                if histogram.count > 0)
+
     def termination_handler(self, signal, frame):
         """Method to cleanly terminate the module when a SIGINT signal is received.
 
-        All currently active trace events will be discarded, and the log file will be closed. This function is
-        typically called by the BenchmarkTerminator module.
+        All archived trace events are written to the log file, all currently active trace events are discarded, and the
+        log file is closed. This function is typically called by the BenchmarkTerminator module.
         """
+        if not self._expiry_timer is None:
+            self._expiry_timer.cancel()
+            self._expiry_timer = None
         if not self._log_file is None:
+            self.flush_trace_events()
+            self._log_file.flush()
+            os.fsync(self._log_file.fileno())
             self._log_file.close()
             self._log_file = None
             log.info('Termination signalled, closed log file: ' + str(self._log_file_name))
+        if not self._export_file is None:
+            self._export_file.close()
+            self._export_file = None
+            self._export_writer = None
+        if self.export_mode == TRACE_EXPORT_NPZ and not self._export_file_name is None:
+            self.write_npz_export()
+        log.info('TraceEvents Archived:' + str(self.num_archived_trace_events) + ' Discarded:'
+                + str(self.num_discarded_trace_events))
+        self.log_latency_summary()
+
+    def get_latency_summary(self):
+        """Returns a multi-line summary of the per-phase latency histograms (all values in milliseconds)."""
+        return 'Tree calc time: ' + self.tree_calc_histogram.get_summary_str() + '\n' \
+                + 'Route processing time: ' + self.route_processing_histogram.get_summary_str() + '\n' \
+                + 'Flow installation time: ' + self.flow_installation_histogram.get_summary_str() + '\n' \
+                + 'Flow barrier time: ' + self.flow_barrier_histogram.get_summary_str() + '\n' \
+                + 'IGMP processing time: ' + self.igmp_processing_histogram.get_summary_str()
+
+    def log_latency_summary(self):
+        """Writes the per-phase latency summary to the POX log. Can be called at any time to inspect tail latencies."""
+        for summary_line in self.get_latency_summary().split('\n'):
+            log.info(summary_line)
+
+    def _add_active_trace_event(self, trace_event):
+        """Stores the trace event in its ring slot, discarding any older event which still occupies the slot."""
+        slot = trace_event.event_id % self.ring_size
+        if not self._active_trace_events[slot] is None:
+            self._discard_pending_barriers(self._active_trace_events[slot])
+            self.num_discarded_trace_events += 1
+        self._active_trace_events[slot] = trace_event
+        # All events with an ID older than one ring length have now been overwritten
+        self._oldest_event_id = max(self._oldest_event_id, trace_event.event_id - self.ring_size + 1)
 
     def init_igmp_event_trace(self, router_dpid):
         """Returns a new IGMPTraceEvent with a unique event_id."""
         igmp_trace_event = IGMPTraceEvent(self._next_event_id, router_dpid)
         log.debug('Initialized IGMPTraceEvent with id: ' + str(self._next_event_id))
-        self._igmp_trace_events.append(igmp_trace_event)
+        self._add_active_trace_event(igmp_trace_event)
         self._next_event_id = self._next_event_id + 1
         return igmp_trace_event
 
@@ -322,28 +751,157 @@ class GroupFlowEventTracer(EventMixin):
             log.debug(
                 'Initialized GroupFlowTraceEvent with id: ' + str(self._next_event_id) + ' (triggered by event: ' + str(
                     igmp_trace_event.event_id) + ')')
-        self._groupflow_trace_events.append(groupflow_trace_event)
+        self._add_active_trace_event(groupflow_trace_event)
         self._next_event_id = self._next_event_id + 1
         return groupflow_trace_event
 
+    def send_flow_barrier(self, groupflow_trace_event, connection):
+        """Sends a barrier request on the specified connection, and records it as pending for the GroupFlowTraceEvent.
+
+        This should be called after all OpenFlow rules for the routing event have been sent to the router. Archiving of
+        the trace event is deferred until replies to all of its barrier requests have been received.
+        """
+        barrier = of.ofp_barrier_request()
+        barrier_key = (connection.dpid, barrier.xid)
+        groupflow_trace_event.pending_barriers.add(barrier_key)
+        self._pending_barriers[barrier_key] = groupflow_trace_event
+        connection.send(barrier)
+
+    def _handle_BarrierIn(self, event):
+        """Processes barrier replies, and archives GroupFlowTraceEvents once all of their barriers have completed."""
+        barrier_key = (event.dpid, event.xid)
+        groupflow_trace_event = self._pending_barriers.pop(barrier_key, None)
+        if groupflow_trace_event is None:
+            return
+        groupflow_trace_event.pending_barriers.discard(barrier_key)
+        if not groupflow_trace_event.pending_barriers:
+            groupflow_trace_event.set_flow_barrier_end_time()
+            if groupflow_trace_event.archive_requested:
+                self.archive_trace_event(groupflow_trace_event)
+
+    def _discard_pending_barriers(self, trace_event):
+        """Removes all pending barrier requests of the specified trace event."""
+        if isinstance(trace_event, GroupFlowTraceEvent):
+            for barrier_key in trace_event.pending_barriers:
+                self._pending_barriers.pop(barrier_key, None)
+            trace_event.pending_barriers.clear()
+
     def archive_trace_event(self, trace_event):
-        """Archives the specified event by serializing it to the log file, and removes the event from the module's memory."""
+        """Archives the specified event by queueing it for serialization to the log file, and removes the event from the
+        module's set of active events.
+        
+        If the event is a GroupFlowTraceEvent with outstanding barrier requests, archiving is deferred until all barrier
+        replies have been received.
+        """
         if trace_event is None:
             log.warn('Warning: Attempted to archive empty trace')
             return
 
-        if self._log_file is None:
+        if isinstance(trace_event, GroupFlowTraceEvent) and trace_event.pending_barriers:
+            trace_event.archive_requested = True
             return
 
-        self._log_file.write(trace_event.get_log_str())
-        self._log_file.write('\n')
+        self.record_latencies(trace_event)
+
+        if self._log_file is None:
+            return
 
-        if isinstance(trace_event, IGMPTraceEvent):
-            self._igmp_trace_events.remove(trace_event)
-        elif isinstance(trace_event, GroupFlowTraceEvent):
-            self._groupflow_trace_events.remove(trace_event)
+        slot = trace_event.event_id % self.ring_size
+        if self._active_trace_events[slot] is trace_event:
+            self._active_trace_events[slot] = None
+        
+        self._pending_trace_events.append(trace_event)
+        self.num_archived_trace_events += 1
+        if len(self._pending_trace_events) >= self.flush_batch:
+            self.flush_trace_events()
+
+    def record_latencies(self, trace_event):
+        """Records the completed phase times of the specified trace event in the per-phase latency histograms."""
+        if isinstance(trace_event, GroupFlowTraceEvent):
+            phase_time = trace_event.get_tree_calc_time()
+            if phase_time is not None:
+                self.tree_calc_histogram.record(phase_time)
+            phase_time = trace_event.get_route_processing_time()
+            if phase_time is not None:
+                self.route_processing_histogram.record(phase_time)
+            phase_time = trace_event.get_flow_installation_time()
+            if phase_time is not None:
+                self.flow_installation_histogram.record(phase_time)
+            phase_time = trace_event.get_flow_barrier_time()
+            if phase_time is not None:
+                self.flow_barrier_histogram.record(phase_time)
+        elif isinstance(trace_event, IGMPTraceEvent):
+            phase_time = trace_event.get_igmp_processing_time()
+            if phase_time is not None:
+                self.igmp_processing_histogram.record(phase_time)
+
+    def flush_trace_events(self):
+        """Writes all archived trace events to the log file in a single write, and appends them to the columnar export."""
+        if not self._pending_trace_events or self._log_file is None:
+            return
+        self._log_file.write(''.join([trace_event.get_log_str() + '\n' for trace_event in self._pending_trace_events]))
+        if self.export_mode == TRACE_EXPORT_CSV and not self._export_writer is None:
+            self._export_writer.writerows([['' if value is None else value for value in trace_event.get_columnar_row()]
+                    for trace_event in self._pending_trace_events])
+        elif self.export_mode == TRACE_EXPORT_NPZ:
+            self._export_rows.extend([trace_event.get_columnar_row() for trace_event in self._pending_trace_events])
+            if len(self._export_rows) >= TRACE_EXPORT_CHUNK_ROWS:
+                self.write_npz_export()
+        self._pending_trace_events = []
+
+    def write_npz_export(self):
+        """Writes all buffered export rows to the next numbered chunk file, as a compressed NumPy structured array named
+        'events', and clears the buffer.
+
+        Missing values are written as NaN for float columns, -1 for integer columns and empty strings for string columns.
+        """
+        if not self._export_rows:
+            return
+        missing_values = []
+        for column_name, column_type in TRACE_COLUMNS:
+            if column_type.startswith('f'):
+                missing_values.append(float('nan'))
+            elif column_type.startswith('i'):
+                missing_values.append(-1)
+            else:
+                missing_values.append('')
+        rows = [tuple(missing_values[index] if value is None else value for index, value in enumerate(row))
+                for row in self._export_rows]
+        events = numpy.array(rows, dtype = TRACE_COLUMNS)
+        chunk_file_name = self._export_file_name + '_' + '{:04d}'.format(self._num_export_chunks) + '.npz'
+        numpy.savez_compressed(chunk_file_name, events = events)
+        self._num_export_chunks += 1
+        log.info('Wrote ' + str(len(rows)) + ' trace events to file: ' + str(chunk_file_name))
+        self._export_rows = []
+
+    def expire_trace_events(self):
+        """Discards active trace events which are older than the maximum trace event age, and flushes archived events.
+        
+        As event IDs are assigned in order of creation, the ring is only scanned from the oldest potentially active event
+        up to the first event which has not expired.
+        """
+        expiry_time = get_curr_time() - self.max_age
+        while self._oldest_event_id < self._next_event_id:
+            slot = self._oldest_event_id % self.ring_size
+            trace_event = self._active_trace_events[slot]
+            if not trace_event is None:
+                if trace_event.init_time > expiry_time:
+                    break
+                self._discard_pending_barriers(trace_event)
+                self._active_trace_events[slot] = None
+                self.num_discarded_trace_events += 1
+            self._oldest_event_id += 1
+        
+        self.flush_trace_events()
 
 
-def launch():
+def launch(trace_ring_size = TRACE_RING_SIZE, trace_flush_batch = TRACE_FLUSH_BATCH, trace_max_age = TRACE_MAX_AGE,
+        trace_export = 'csv'):
     # Method called by the POX core when launching the module
-    core.registerNew(GroupFlowEventTracer)
+    export_mode = TRACE_EXPORT_CSV
+    if 'none' in str(trace_export):
+        export_mode = TRACE_EXPORT_NONE
+    elif 'npz' in str(trace_export):
+        export_mode = TRACE_EXPORT_NPZ
+    core.registerNew(GroupFlowEventTracer, int(trace_ring_size), int(trace_flush_batch), float(trace_max_age),
+            export_mode)
@@ -0,0 +1,249 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+#  Copyright 2014 Alexander Craig
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+This module profiles the event handlers and Timer callbacks of the GroupFlow, FlowTracker, IGMPManager and Discovery
+modules, to identify which handlers are blocking the recoco event loop when response times spike.
+
+All _handle_* methods and known Timer callbacks of the profiled classes are wrapped at launch, and per-handler call
+counts, cumulative and maximum CPU times, and cumulative and maximum wall clock times are recorded. Times are inclusive,
+so a handler which calls another profiled method also accounts for the time spent in that method. Event loop lag is
+measured as the delay between the scheduled and actual firing times of a recurring Timer. Results are written to the log
+periodically, and to a file when termination is signalled by the BenchmarkTerminator module.
+
+This module should be launched before the profiled modules on the POX command line, so that handlers and Timers bound
+during the launch of those modules are also profiled.
+
+The following command line arguments are supported:
+
+* profile_dump_interval: The interval (in seconds) at which handler statistics are written to the log. Set to 0 to only
+  write statistics on termination.
+  Default: 30
+* profile_lag_interval: The interval (in seconds) of the Timer used to measure event loop lag.
+  Default: 0.1
+* profile_sample_interval: If greater than 0, a sampling profiler is enabled which records the call stacks of all
+  threads (including the recoco event loop thread) every profile_sample_interval seconds of CPU time. On termination,
+  the samples are written to a file in the collapsed stack format used by flame graph tools (e.g. flamegraph.pl).
+  Default: 0
+
+Depends on misc.benchmark_terminator (optional)
+"""
+
+import sys
+import time
+import datetime
+import signal
+import threading
+from pox.core import core
+from pox.lib.revent import *
+from pox.lib.recoco import Timer
+from pox.misc.openflow_harness import cpu_time
+
+PROFILE_DUMP_INTERVAL = 30      # Seconds
+PROFILE_LAG_INTERVAL = 0.1      # Seconds
+PROFILE_SAMPLE_INTERVAL = 0     # Seconds of CPU time, 0 disables sampling
+
+# Timer callbacks (in addition to all _handle_* methods) which are profiled, keyed by module and class name
+PROFILED_METHODS = {
+    ('pox.openflow.groupflow', 'GroupFlowManager'): [],
+    ('pox.openflow.groupflow', 'MulticastPath'): ['update_flow_placement'],
+    ('pox.openflow.flow_tracker', 'FlowTracker'): ['output_peak_usage', 'raise_network_congestion_event'],
+    ('pox.openflow.flow_tracker', 'FlowTrackedSwitch'): ['launch_stats_query'],
+    ('pox.openflow.igmp_manager', 'IGMPManager'): ['process_expired_timers', 'launch_igmp_general_query',
+            'write_membership_snapshot'],
+    ('pox.openflow.igmp_manager', 'IGMPv3Router'): ['flush_coalesced_reception_update', 'send_group_specific_query',
+            'send_group_and_source_specific_query'],
+    ('pox.openflow.discovery', 'Discovery'): ['_expire_links'],
+    ('pox.openflow.discovery', 'LLDPSender'): ['_timer_handler'],
+}
+
+log = core.getLogger()
+
+
+class HandlerStats(object):
+
+    """Call statistics for a single profiled handler. All times are in seconds."""
+
+    __slots__ = ['num_calls', 'total_cpu_time', 'max_cpu_time', 'total_wall_time', 'max_wall_time']
+
+    def __init__(self):
+        self.num_calls = 0
+        self.total_cpu_time = 0
+        self.max_cpu_time = 0
+        self.total_wall_time = 0
+        self.max_wall_time = 0
+
+    def record(self, call_cpu_time, call_wall_time):
+        self.num_calls += 1
+        self.total_cpu_time += call_cpu_time
+        self.total_wall_time += call_wall_time
+        if call_cpu_time > self.max_cpu_time:
+            self.max_cpu_time = call_cpu_time
+        if call_wall_time > self.max_wall_time:
+            self.max_wall_time = call_wall_time
+
+
+class HandlerProfiler(EventMixin):
+
+    """Module which wraps event handlers and Timer callbacks of other modules to record per-handler CPU usage."""
+
+    _core_name = "handler_profiler"
+
+    def __init__(self, dump_interval = PROFILE_DUMP_INTERVAL, lag_interval = PROFILE_LAG_INTERVAL,
+            sample_interval = PROFILE_SAMPLE_INTERVAL):
+        """Wraps all profiled methods, and starts the event loop lag and dump Timers."""
+        self.dump_interval = float(dump_interval)
+        self.lag_interval = float(lag_interval)
+        self.sample_interval = float(sample_interval)
+        log.info('Set ProfileDumpInterval:' + str(self.dump_interval) + ' ProfileLagInterval:' + str(self.lag_interval)
+                + ' ProfileSampleInterval:' + str(self.sample_interval))
+
+        # Handler statistics, keyed by 'ClassName.method_name'
+        self.handler_stats = {}
+
+        # Event loop lag statistics (seconds)
+        self.num_lag_samples = 0
+        self.total_lag = 0
+        self.max_lag = 0
+        self._last_lag_check_time = time.time()
+
+        # Sampling profiler state: [collapsed stack string] -> number of samples
+        self.stack_samples = {}
+
+        self.wrap_profiled_methods()
+        self._lag_timer = Timer(self.lag_interval, self.check_event_loop_lag, recurring = True)
+        self._dump_timer = None
+        if self.dump_interval > 0:
+            self._dump_timer = Timer(self.dump_interval, self.log_handler_stats, recurring = True)
+        if self.sample_interval > 0:
+            signal.signal(signal.SIGPROF, self._sample_stacks)
+            # Restart system calls interrupted by samples rather than failing with EINTR
+            signal.siginterrupt(signal.SIGPROF, False)
+            signal.setitimer(signal.ITIMER_PROF, self.sample_interval, self.sample_interval)
+
+    def wrap_profiled_methods(self):
+        """Replaces the _handle_* methods and listed Timer callbacks of all profiled classes with profiling wrappers."""
+        for (module_name, class_name), method_names in PROFILED_METHODS.iteritems():
+            try:
+                module = __import__(module_name, fromlist = [class_name])
+            except ImportError:
+                log.debug('Module ' + module_name + ' not available, skipping profiling of ' + class_name)
+                continue
+            cls = getattr(module, class_name, None)
+            if cls is None:
+                continue
+            handler_names = [name for name in cls.__dict__ if name.startswith('_handle_')]
+            for method_name in handler_names + method_names:
+                self._wrap_method(cls, method_name)
+
+    def _wrap_method(self, cls, method_name):
+        """Replaces the specified method of the class with a wrapper which records call statistics."""
+        func = cls.__dict__.get(method_name)
+        if func is None or not callable(func) or getattr(func, '_profiled', False):
+            return
+        stats = self.handler_stats.setdefault(cls.__name__ + '.' + method_name, HandlerStats())
+
+        def profiled_method(*args, **kw):
+            start_cpu_time = cpu_time()
+            start_wall_time = time.time()
+            try:
+                return func(*args, **kw)
+            finally:
+                stats.record(cpu_time() - start_cpu_time, time.time() - start_wall_time)
+
+        profiled_method.__name__ = func.__name__
+        profiled_method.__doc__ = func.__doc__
+        profiled_method._profiled = True
+        setattr(cls, method_name, profiled_method)
+
+    def check_event_loop_lag(self):
+        """Records the delay between the scheduled and actual firing times of the lag Timer."""
+        curr_time = time.time()
+        lag = max(0, curr_time - self._last_lag_check_time - self.lag_interval)
+        self._last_lag_check_time = curr_time
+        self.num_lag_samples += 1
+        self.total_lag += lag
+        if lag > self.max_lag:
+            self.max_lag = lag
+
+    def _sample_stacks(self, signum, signal_frame):
+        """SIGPROF handler which records the call stack of every thread in collapsed form (thread name, then outermost
+        frame first)."""
+        thread_names = dict((thread.ident, thread.name) for thread in threading.enumerate())
+        for thread_id, frame in sys._current_frames().iteritems():
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(code.co_name + ' (' + code.co_filename + ':' + str(code.co_firstlineno) + ')')
+                frame = frame.f_back
+            stack.append(thread_names.get(thread_id, str(thread_id)))
+            stack.reverse()
+            collapsed_stack = ';'.join(stack)
+            self.stack_samples[collapsed_stack] = self.stack_samples.get(collapsed_stack, 0) + 1
+
+    def get_handler_stats_str(self):
+        """Returns a multi-line listing of handler statistics ordered by cumulative CPU time, with times in milliseconds."""
+        lines = []
+        if self.num_lag_samples > 0:
+            lines.append('EventLoopLag Samples:' + str(self.num_lag_samples) + ' Mean:'
+                    + '{:.3f}'.format(self.total_lag / self.num_lag_samples * 1000) + 'ms Max:'
+                    + '{:.3f}'.format(self.max_lag * 1000) + 'ms')
+        for handler_name, stats in sorted(self.handler_stats.iteritems(), key = lambda item: item[1].total_cpu_time,
+                reverse = True):
+            if stats.num_calls == 0:
+                continue
+            lines.append('Handler:' + handler_name + ' Calls:' + str(stats.num_calls)
+                    + ' CPU:' + '{:.3f}'.format(stats.total_cpu_time * 1000) + 'ms'
+                    + ' MaxCPU:' + '{:.3f}'.format(stats.max_cpu_time * 1000) + 'ms'
+                    + ' Wall:' + '{:.3f}'.format(stats.total_wall_time * 1000) + 'ms'
+                    + ' MaxWall:' + '{:.3f}'.format(stats.max_wall_time * 1000) + 'ms')
+        return '\n'.join(lines)
+
+    def log_handler_stats(self):
+        """Writes the current handler statistics to log.info"""
+        for line in self.get_handler_stats_str().split('\n'):
+            if line:
+                log.info(line)
+
+    def termination_handler(self, signal_num, frame):
+        """Stops profiling, and writes handler statistics (and collapsed stack samples, if sampling is enabled) to files.
+
+        This function is typically called by the BenchmarkTerminator module.
+        """
+        if self.sample_interval > 0:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        self._lag_timer.cancel()
+        if self._dump_timer is not None:
+            self._dump_timer.cancel()
+
+        file_prefix = datetime.datetime.now().strftime("handlerprofile_%H-%M-%S_%B-%d_%Y")
+        with open(file_prefix + '.txt', 'w') as stats_file:
+            stats_file.write(self.get_handler_stats_str() + '\n')
+        log.info('Termination signalled, wrote handler profile to file: ' + file_prefix + '.txt')
+
+        if self.stack_samples:
+            with open(file_prefix + '.folded', 'w') as stacks_file:
+                for collapsed_stack, num_samples in self.stack_samples.iteritems():
+                    stacks_file.write(collapsed_stack + ' ' + str(num_samples) + '\n')
+            log.info('Wrote ' + str(sum(self.stack_samples.values())) + ' stack samples to file: ' + file_prefix + '.folded')
+
+
+def launch(profile_dump_interval = PROFILE_DUMP_INTERVAL, profile_lag_interval = PROFILE_LAG_INTERVAL,
+        profile_sample_interval = PROFILE_SAMPLE_INTERVAL):
+    # Method called by the POX core when launching the module
+    core.registerNew(HandlerProfiler, float(profile_dump_interval), float(profile_lag_interval),
+            float(profile_sample_interval))
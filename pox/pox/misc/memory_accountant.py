@@ -0,0 +1,345 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+#  Copyright 2014 Alexander Craig
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+This module periodically reports the memory footprint of the long-lived state of the GroupFlow, IGMPManager, FlowTracker
+and GroupFlowEventTracer modules, and warns when any structure grows monotonically, so that leaks can be detected in
+multi-day soak tests.
+
+At each report, the number of entries and the approximate size of every structure listed in MEMORY_STRUCTURES is
+recorded (for modules which are running), along with the resident set size of the process. Sizes include the containers
+of each structure and (recursively) all built-in containers they hold, plus the shallow sizes of all other objects they
+hold, with shared objects counted once. Sizes are therefore approximate, but are comparable between reports. Entry counts
+are also reported for structures which are known to retain state after it is no longer needed: FlowTracker per-flow
+counters on ports which are no longer tracked, and GroupFlow reception state for routers which are no longer connected.
+
+If the entry count (or size) of a structure has not decreased over memory_growth_window consecutive reports, and has
+increased over the window, a warning is logged and the growth history of the structure is reset.
+
+Optionally, counts of live objects by type (from the garbage collector) are reported for the most common types, and
+allocation growth by source line is reported from tracemalloc snapshots (diffed against the first snapshot). tracemalloc
+is only available in Python 3.4+ (or Python 2 builds with pytracemalloc), and is disabled with a warning otherwise.
+
+Reports are written to the log, and appended to memory_report_file in CSV format (time, structure, entries, size_bytes).
+
+The following command line arguments are supported:
+
+* memory_report_interval: The interval (in seconds) between memory reports.
+  Default: 60
+* memory_growth_window: The number of consecutive reports over which monotonic growth generates a warning.
+  Default: 10
+* memory_type_counts: The number of object types (by live object count) to report. Set to 0 to disable.
+  Default: 0
+* memory_tracemalloc_frames: The number of stack frames recorded by tracemalloc for each allocation. Set to 0 to
+  disable tracemalloc.
+  Default: 0
+* memory_report_file: The CSV file to which reports are written. Set to 'none' to only write reports to the log.
+  Default: A file named with the current time (memoryreport_<time>.csv)
+
+Depends on misc.benchmark_terminator (optional)
+"""
+
+import sys
+import os
+import gc
+import time
+import datetime
+import collections
+from pox.core import core
+from pox.lib.revent import *
+from pox.lib.recoco import Timer
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+MEMORY_REPORT_INTERVAL = 60     # Seconds
+MEMORY_GROWTH_WINDOW = 10       # Reports
+MEMORY_TYPE_COUNTS = 0
+MEMORY_TRACEMALLOC_FRAMES = 0
+MEMORY_TRACEMALLOC_TOP = 10     # Source lines reported from each tracemalloc snapshot diff
+
+log = core.getLogger()
+
+
+def get_container_size(obj, visited):
+    """Returns the approximate size (in bytes) of a container, the built-in containers it holds (recursively), and the
+    shallow sizes of all other objects it holds. Objects whose ids are in visited are not counted again."""
+    if id(obj) in visited:
+        return 0
+    visited.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.iteritems():
+            size += get_container_size(key, visited) + get_container_size(value, visited)
+    elif isinstance(obj, (list, tuple, set, frozenset, collections.deque)):
+        for item in obj:
+            size += get_container_size(item, visited)
+    return size
+
+
+def get_process_rss_kb():
+    """Returns the resident set size (in kB) of the process, or None if it cannot be determined."""
+    try:
+        with open('/proc/self/status', 'r') as status_file:
+            for line in status_file:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except (IOError, OSError, ValueError):
+        pass
+    return None
+
+
+# Structure accessors: each takes the module component and returns (number of entries, list of containers to size)
+
+def get_groupflow_multicast_paths(groupflow):
+    return (sum([len(group_paths) for group_paths in groupflow.multicast_paths.itervalues()]),
+            [groupflow.multicast_paths])
+
+def get_groupflow_paths_by_flow_cookie(groupflow):
+    return len(groupflow.multicast_paths_by_flow_cookie), [groupflow.multicast_paths_by_flow_cookie]
+
+def get_groupflow_desired_reception_state(groupflow):
+    return (sum([len(reception) for reception in groupflow.desired_reception_state.itervalues() if reception is not None]),
+            [groupflow.desired_reception_state])
+
+def get_groupflow_departed_router_reception_state(groupflow):
+    departed_reception = [reception for router_dpid, reception in groupflow.desired_reception_state.iteritems()
+            if reception is not None and core.openflow.getConnection(router_dpid) is None]
+    return sum([len(reception) for reception in departed_reception]), departed_reception
+
+def get_tracer_active_trace_events(tracer):
+    return len([trace_event for trace_event in tracer._active_trace_events if trace_event is not None]), \
+            [tracer._active_trace_events]
+
+def get_tracer_pending_trace_events(tracer):
+    return len(tracer._pending_trace_events), [tracer._pending_trace_events]
+
+def get_tracer_pending_barriers(tracer):
+    return len(tracer._pending_barriers), [tracer._pending_barriers]
+
+def get_flow_tracker_flow_counters(flow_tracker):
+    counters = []
+    for switch in flow_tracker.switches.itervalues():
+        counters.extend([switch.flow_total_byte_count, switch.flow_interval_byte_count, switch.flow_interval_bandwidth_Mbps,
+                switch.flow_average_bandwidth_Mbps, switch.flow_max_bandwidth_Mbps])
+    num_entries = sum([len(port_flows) for switch in flow_tracker.switches.itervalues()
+            for port_flows in switch.flow_total_byte_count.itervalues()])
+    return num_entries, counters
+
+def get_flow_tracker_untracked_port_flow_counters(flow_tracker):
+    untracked_counters = []
+    for switch in flow_tracker.switches.itervalues():
+        for port_counters in [switch.flow_total_byte_count, switch.flow_interval_byte_count,
+                switch.flow_interval_bandwidth_Mbps, switch.flow_average_bandwidth_Mbps]:
+            for port_num, port_flows in port_counters.iteritems():
+                if not port_num in switch.tracked_ports:
+                    untracked_counters.append(port_flows)
+    return sum([len(port_flows) for port_flows in untracked_counters]), untracked_counters
+
+def get_flow_tracker_flow_max_util(flow_tracker):
+    return len(flow_tracker._flow_max_util), [flow_tracker._flow_max_util, flow_tracker._flow_max_by_switch,
+            flow_tracker._flow_max_forecast, flow_tracker._flow_max_forecast_by_switch]
+
+def get_flow_tracker_util_series(flow_tracker):
+    return len(flow_tracker.link_util_series) + len(flow_tracker.flow_util_series), \
+            [flow_tracker.link_util_series, flow_tracker.flow_util_series]
+
+def get_igmp_group_records(igmp_manager):
+    num_records = 0
+    for router in igmp_manager.routers.itervalues():
+        for port_records in router.multicast_records.itervalues():
+            num_records += len([record for record in port_records.itervalues() if record is not None])
+    return num_records, [router.multicast_records for router in igmp_manager.routers.itervalues()]
+
+def get_igmp_reporting_hosts(igmp_manager):
+    return sum([len(hosts) for router in igmp_manager.routers.itervalues() for hosts in router.reporting_hosts.itervalues()]), \
+            [router.reporting_hosts for router in igmp_manager.routers.itervalues()]
+
+def get_igmp_timer_heap(igmp_manager):
+    return len(igmp_manager._timer_heap), [igmp_manager._timer_heap]
+
+# Reported structures, as (structure name, component name, accessor) tuples
+MEMORY_STRUCTURES = [
+    ('groupflow.multicast_paths', 'openflow_groupflow', get_groupflow_multicast_paths),
+    ('groupflow.multicast_paths_by_flow_cookie', 'openflow_groupflow', get_groupflow_paths_by_flow_cookie),
+    ('groupflow.desired_reception_state', 'openflow_groupflow', get_groupflow_desired_reception_state),
+    ('groupflow.desired_reception_state.departed_routers', 'openflow_groupflow',
+            get_groupflow_departed_router_reception_state),
+    ('tracer.active_trace_events', 'groupflow_event_tracer', get_tracer_active_trace_events),
+    ('tracer.pending_trace_events', 'groupflow_event_tracer', get_tracer_pending_trace_events),
+    ('tracer.pending_barriers', 'groupflow_event_tracer', get_tracer_pending_barriers),
+    ('flow_tracker.flow_counters', 'openflow_flow_tracker', get_flow_tracker_flow_counters),
+    ('flow_tracker.flow_counters.untracked_ports', 'openflow_flow_tracker', get_flow_tracker_untracked_port_flow_counters),
+    ('flow_tracker.flow_max_util', 'openflow_flow_tracker', get_flow_tracker_flow_max_util),
+    ('flow_tracker.util_series', 'openflow_flow_tracker', get_flow_tracker_util_series),
+    ('igmp.group_records', 'openflow_igmp_manager', get_igmp_group_records),
+    ('igmp.reporting_hosts', 'openflow_igmp_manager', get_igmp_reporting_hosts),
+    ('igmp.timer_heap', 'openflow_igmp_manager', get_igmp_timer_heap),
+]
+
+
+class MemoryAccountant(EventMixin):
+
+    """Module which periodically reports the memory footprint of controller structures, and warns on monotonic growth."""
+
+    _core_name = "memory_accountant"
+
+    def __init__(self, report_interval = MEMORY_REPORT_INTERVAL, growth_window = MEMORY_GROWTH_WINDOW,
+            type_counts = MEMORY_TYPE_COUNTS, tracemalloc_frames = MEMORY_TRACEMALLOC_FRAMES, report_file = None):
+        """Starts tracemalloc (if enabled), opens the report file and starts the report Timer."""
+        self.report_interval = float(report_interval)
+        self.growth_window = max(2, int(growth_window))
+        self.type_counts = int(type_counts)
+        self.tracemalloc_frames = int(tracemalloc_frames)
+        log.info('Set MemoryReportInterval:' + str(self.report_interval) + ' MemoryGrowthWindow:'
+                + str(self.growth_window) + ' MemoryTypeCounts:' + str(self.type_counts) + ' MemoryTracemallocFrames:'
+                + str(self.tracemalloc_frames))
+
+        # Recent report values, keyed by (structure name, value name)
+        self._growth_history = {}
+        self.num_growth_warnings = 0
+        self._tracemalloc_baseline = None
+
+        if self.tracemalloc_frames > 0:
+            if tracemalloc is None:
+                log.warn('tracemalloc is not available (requires Python 3.4+ or pytracemalloc), allocation tracing disabled')
+                self.tracemalloc_frames = 0
+            else:
+                tracemalloc.start(self.tracemalloc_frames)
+
+        self._report_file = None
+        if report_file is None:
+            report_file = datetime.datetime.now().strftime("memoryreport_%H-%M-%S_%B-%d_%Y.csv")
+        if report_file != 'none':
+            self._report_file = open(report_file, 'w')
+            self._report_file.write('time,structure,entries,size_bytes\n')
+            log.info('Writing memory reports to file: ' + report_file)
+
+        self._report_timer = Timer(self.report_interval, self.write_memory_report, recurring = True)
+        core.addListenerByName('GoingDownEvent', self.going_down_handler)
+
+    def check_growth(self, structure_name, value_name, value):
+        """Records a report value, and logs a warning if the value has grown monotonically over the growth window."""
+        history = self._growth_history.setdefault((structure_name, value_name),
+                collections.deque(maxlen = self.growth_window))
+        history.append(value)
+        if len(history) < self.growth_window or history[-1] <= history[0]:
+            return
+        for i in xrange(1, len(history)):
+            if history[i] < history[i - 1]:
+                return
+        self.num_growth_warnings += 1
+        log.warn('Monotonic growth of ' + structure_name + ' ' + value_name + ' over ' + str(self.growth_window)
+                + ' reports: ' + str(history[0]) + ' -> ' + str(history[-1]))
+        history.clear()
+
+    def get_structure_reports(self):
+        """Returns a list of (structure name, number of entries, approximate size in bytes) tuples for all structures of
+        running modules."""
+        structure_reports = []
+        for structure_name, component_name, accessor in MEMORY_STRUCTURES:
+            if not core.hasComponent(component_name):
+                continue
+            try:
+                num_entries, containers = accessor(getattr(core, component_name))
+            except Exception as e:
+                log.debug('Unable to account structure ' + structure_name + ': ' + type(e).__name__ + ': ' + str(e))
+                continue
+            visited = set()
+            size = sum([get_container_size(container, visited) for container in containers])
+            structure_reports.append((structure_name, num_entries, size))
+        return structure_reports
+
+    def get_type_counts(self):
+        """Returns a list of (type name, number of live objects) tuples for the most common types tracked by the garbage
+        collector."""
+        type_counts = collections.Counter(type(obj).__name__ for obj in gc.get_objects())
+        return type_counts.most_common(self.type_counts)
+
+    def write_memory_report(self):
+        """Writes a memory report to the log and report file, and checks all reported values for monotonic growth.
+
+        This is called from a recoco Timer, so all module state is read from the POX event loop.
+        """
+        report_start_time = time.time()
+        report_rows = []
+        for structure_name, num_entries, size in self.get_structure_reports():
+            report_rows.append((structure_name, num_entries, size))
+            self.check_growth(structure_name, 'entries', num_entries)
+            self.check_growth(structure_name, 'size', size)
+
+        rss_kb = get_process_rss_kb()
+        if rss_kb is not None:
+            report_rows.append(('process.rss', None, rss_kb * 1024))
+            self.check_growth('process.rss', 'size', rss_kb)
+
+        if self.type_counts > 0:
+            for type_name, num_objects in self.get_type_counts():
+                report_rows.append(('type.' + type_name, num_objects, None))
+                self.check_growth('type.' + type_name, 'entries', num_objects)
+
+        if self.tracemalloc_frames > 0:
+            traced_size, traced_peak = tracemalloc.get_traced_memory()
+            report_rows.append(('tracemalloc.traced', None, traced_size))
+            snapshot = tracemalloc.take_snapshot()
+            if self._tracemalloc_baseline is None:
+                self._tracemalloc_baseline = snapshot
+            else:
+                for stat in snapshot.compare_to(self._tracemalloc_baseline, 'lineno')[:MEMORY_TRACEMALLOC_TOP]:
+                    log.info('TracemallocGrowth: ' + str(stat))
+
+        for structure_name, num_entries, size in report_rows:
+            log.info('Memory:' + structure_name + ' Entries:' + str(num_entries) + ' Size:' + str(size))
+        if self._report_file is not None:
+            for structure_name, num_entries, size in report_rows:
+                self._report_file.write(str(report_start_time) + ',' + structure_name + ','
+                        + ('' if num_entries is None else str(num_entries)) + ',' + ('' if size is None else str(size))
+                        + '\n')
+            self._report_file.flush()
+        log.debug('Memory report completed in ' + '{:.3f}'.format(time.time() - report_start_time) + ' seconds')
+
+    def going_down_handler(self, event):
+        """Writes a final memory report and closes the report file when POX is stopped."""
+        self.termination_handler(None, None)
+
+    def termination_handler(self, signal, frame):
+        """Writes a final memory report, stops tracemalloc (if enabled) and closes the report file. This function is
+        typically called by the BenchmarkTerminator module."""
+        if self._report_timer is None:
+            return
+        self._report_timer.cancel()
+        self._report_timer = None
+        self.write_memory_report()
+        if self.tracemalloc_frames > 0:
+            tracemalloc.stop()
+        if self._report_file is not None:
+            self._report_file.flush()
+            os.fsync(self._report_file.fileno())
+            self._report_file.close()
+            self._report_file = None
+        log.info('Termination signalled, memory accounting stopped with ' + str(self.num_growth_warnings)
+                + ' growth warnings')
+
+
+def launch(memory_report_interval = MEMORY_REPORT_INTERVAL, memory_growth_window = MEMORY_GROWTH_WINDOW,
+        memory_type_counts = MEMORY_TYPE_COUNTS, memory_tracemalloc_frames = MEMORY_TRACEMALLOC_FRAMES,
+        memory_report_file = None):
+    # Method called by the POX core when launching the module
+    core.registerNew(MemoryAccountant, float(memory_report_interval), int(memory_growth_window), int(memory_type_counts),
+            int(memory_tracemalloc_frames), memory_report_file)
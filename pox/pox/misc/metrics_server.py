@@ -0,0 +1,248 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+#  Copyright 2014 Alexander Craig
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+This module exposes live controller metrics in the Prometheus text exposition format over a local HTTP socket, so that
+benchmarking scripts can poll structured metrics rather than scraping the POX log.
+
+Metrics are collected from the POX event loop at a fixed interval and cached, and the HTTP server thread only serves
+the most recently rendered metrics text. The following metrics are reported (where the associated module is running):
+
+* OpenFlow PacketIns, port/flow stats replies (counters and per-second rates)
+* GroupFlow tree calculations and flow modifications sent (counters and per-second rates)
+* IGMP packets processed, coalesced reports, suppressed last member queries and fast leaves
+* Statistics query round trip times (max and mean of the most recent query on each switch)
+* Peak and average link utilization
+* Event loop lag (the delay between the scheduled and actual firing time of the collection timer)
+* Per-phase latency percentiles from the GroupFlowEventTracer histograms
+
+The following command line arguments are supported:
+
+* metrics_address: The address on which the HTTP server listens.
+  Default: 127.0.0.1
+* metrics_port: The port on which the HTTP server listens. Metrics are served at any path (e.g. /metrics).
+  Default: 9091
+* metrics_interval: The interval (in seconds) at which metrics are collected.
+  Default: 1
+
+Depends on openflow, openflow.flow_tracker (optional), openflow.igmp_manager (optional), openflow.groupflow (optional),
+misc.groupflow_event_tracer (optional)
+"""
+
+import time
+import threading
+import BaseHTTPServer
+from pox.core import core
+from pox.lib.revent import *
+from pox.lib.recoco import Timer
+
+METRICS_ADDRESS = '127.0.0.1'
+METRICS_PORT = 9091
+METRICS_INTERVAL = 1    # Seconds
+
+# Percentiles reported for each trace latency histogram
+HISTOGRAM_QUANTILES = [0.5, 0.9, 0.99]
+
+log = core.getLogger()
+
+
+class MetricsRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    """HTTP request handler which serves the most recently rendered metrics text of the MetricsServer."""
+
+    def do_GET(self):
+        body = self.server.metrics_server.metrics_text
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Suppress the default per-request logging to stderr
+        pass
+
+
+class MetricsServer(EventMixin):
+
+    """Module which collects controller metrics and serves them over HTTP in the Prometheus text format."""
+
+    _core_name = "metrics_server"
+
+    def __init__(self, metrics_address = METRICS_ADDRESS, metrics_port = METRICS_PORT, metrics_interval = METRICS_INTERVAL):
+        """Initializes the module, and starts the HTTP server and metrics collection timer once dependencies have loaded."""
+
+        def startup():
+            core.openflow.addListeners(self, priority = 0)
+            self._last_collection_time = time.time()
+            self._collection_timer = Timer(self.metrics_interval, self.collect_metrics, recurring = True)
+            self.start_http_server()
+
+        self.metrics_address = str(metrics_address)
+        self.metrics_port = int(metrics_port)
+        self.metrics_interval = float(metrics_interval)
+        log.info('Set MetricsAddress:' + self.metrics_address + ' MetricsPort:' + str(self.metrics_port)
+                + ' MetricsInterval:' + str(self.metrics_interval))
+
+        self.metrics_text = ''
+        self._http_server = None
+        self._http_thread = None
+        self._collection_timer = None
+        self._last_collection_time = None
+
+        self.num_packet_ins = 0
+        self.num_flow_stats_received = 0
+        self.num_port_stats_received = 0
+        self.event_loop_lag = 0
+        self.max_event_loop_lag = 0
+
+        # Counter values at the previous collection, used to calculate per-second rates: [metric name] -> value
+        self._prev_counter_values = {}
+
+        core.call_when_ready(startup, ('openflow'))
+
+    def start_http_server(self):
+        """Starts the HTTP server on a daemon thread."""
+        try:
+            self._http_server = BaseHTTPServer.HTTPServer((self.metrics_address, self.metrics_port), MetricsRequestHandler)
+        except Exception as e:
+            log.warn('Unable to start metrics server on ' + self.metrics_address + ':' + str(self.metrics_port) + ': ' + str(e))
+            return
+        self._http_server.metrics_server = self
+        self._http_thread = threading.Thread(target = self._http_server.serve_forever)
+        self._http_thread.daemon = True
+        self._http_thread.start()
+        log.info('Serving metrics on http://' + self.metrics_address + ':' + str(self.metrics_port) + '/metrics')
+
+    def termination_handler(self, signal, frame):
+        """Stops metrics collection and shuts down the HTTP server. This function is typically called by the
+        BenchmarkTerminator module."""
+        if self._collection_timer is not None:
+            self._collection_timer.cancel()
+            self._collection_timer = None
+        if self._http_server is not None:
+            self._http_server.shutdown()
+            self._http_server.server_close()
+            self._http_server = None
+            log.info('Termination signalled, stopped metrics server')
+
+    def _handle_PacketIn(self, event):
+        self.num_packet_ins += 1
+
+    def _handle_FlowStatsReceived(self, event):
+        self.num_flow_stats_received += 1
+
+    def _handle_PortStatsReceived(self, event):
+        self.num_port_stats_received += 1
+
+    def collect_metrics(self):
+        """Collects metrics from all running modules and renders the metrics text served by the HTTP server.
+
+        This is called from a recoco Timer, so all module state is read from the POX event loop.
+        """
+        curr_time = time.time()
+        interval_len = curr_time - self._last_collection_time
+        self.event_loop_lag = max(0, interval_len - self.metrics_interval)
+        self.max_event_loop_lag = max(self.max_event_loop_lag, self.event_loop_lag)
+        self._last_collection_time = curr_time
+
+        lines = []
+        counters = [
+            ('pox_openflow_packet_ins_total', 'OpenFlow PacketIn messages received', self.num_packet_ins),
+            ('pox_openflow_flow_stats_replies_total', 'OpenFlow flow stats replies received', self.num_flow_stats_received),
+            ('pox_openflow_port_stats_replies_total', 'OpenFlow port stats replies received', self.num_port_stats_received)]
+        gauges = [
+            ('pox_event_loop_lag_seconds', 'Lag of the most recent metrics collection timer', self.event_loop_lag),
+            ('pox_event_loop_lag_max_seconds', 'Maximum observed lag of the metrics collection timer', self.max_event_loop_lag)]
+
+        if core.hasComponent('openflow_groupflow'):
+            groupflow = core.openflow_groupflow
+            counters.append(('groupflow_tree_calculations_total', 'Multicast tree calculations', groupflow.num_tree_calculations))
+            counters.append(('groupflow_flow_mods_total', 'Flow modifications sent by GroupFlow', groupflow.num_flow_mods_sent))
+            counters.append(('groupflow_congestion_events_handled_total', 'Congestion events handled',
+                    groupflow.num_cong_events_handled))
+
+        if core.hasComponent('openflow_igmp_manager'):
+            igmp_manager = core.openflow_igmp_manager
+            counters.append(('igmp_packets_total', 'IGMP packets processed', igmp_manager.num_igmp_packets))
+            counters.append(('igmp_coalesced_reports_total', 'IGMP reports merged into an earlier report\'s event',
+                    igmp_manager.num_coalesced_reports))
+            counters.append(('igmp_suppressed_queries_total', 'Last member queries skipped due to explicit tracking',
+                    igmp_manager.num_suppressed_queries))
+            counters.append(('igmp_fast_leaves_total', 'Last member queries replaced by fast leave', igmp_manager.num_fast_leaves))
+            gauges.append(('igmp_routers', 'Routers managed by the IGMP manager', len(igmp_manager.routers)))
+
+        if core.hasComponent('openflow_flow_tracker'):
+            flow_tracker = core.openflow_flow_tracker
+            peak_usage, avg_usage, num_links = flow_tracker.get_network_utilization()
+            gauges.append(('flowtracker_link_utilization_max_mbps', 'Peak link utilization', peak_usage))
+            gauges.append(('flowtracker_link_utilization_avg_mbps', 'Average link utilization', avg_usage))
+            gauges.append(('flowtracker_tracked_links', 'Links with tracked utilization', num_links))
+            network_times = flow_tracker.get_stats_network_times()
+            if network_times:
+                gauges.append(('flowtracker_stats_rtt_max_seconds', 'Maximum statistics query round trip time',
+                        max(network_times)))
+                gauges.append(('flowtracker_stats_rtt_avg_seconds', 'Mean statistics query round trip time',
+                        sum(network_times) / len(network_times)))
+            counters.append(('flowtracker_link_util_events_total', 'LinkUtilizationEvents raised',
+                    flow_tracker.num_link_util_events_raised))
+            counters.append(('flowtracker_network_cong_events_total', 'NetworkCongestionEvents raised',
+                    flow_tracker.num_network_cong_events_raised))
+
+        for name, help_str, value in counters:
+            lines.append('# HELP ' + name + ' ' + help_str)
+            lines.append('# TYPE ' + name + ' counter')
+            lines.append(name + ' ' + str(value))
+
+        # Per-second rates of all counters over the last collection interval
+        for name, help_str, value in counters:
+            rate_name = name[:-len('_total')] + '_per_second'
+            rate = 0
+            if name in self._prev_counter_values and interval_len > 0:
+                rate = (value - self._prev_counter_values[name]) / interval_len
+            self._prev_counter_values[name] = value
+            gauges.append((rate_name, help_str + ' per second', rate))
+
+        for name, help_str, value in gauges:
+            lines.append('# HELP ' + name + ' ' + help_str)
+            lines.append('# TYPE ' + name + ' gauge')
+            lines.append(name + ' ' + str(value))
+
+        if core.hasComponent('groupflow_event_tracer'):
+            tracer = core.groupflow_event_tracer
+            histograms = [
+                ('groupflow_tree_calc_seconds', 'Tree calculation time', tracer.tree_calc_histogram),
+                ('groupflow_route_processing_seconds', 'Route processing time', tracer.route_processing_histogram),
+                ('groupflow_flow_installation_seconds', 'Flow installation time', tracer.flow_installation_histogram),
+                ('groupflow_flow_barrier_seconds', 'Flow installation to barrier completion time', tracer.flow_barrier_histogram),
+                ('igmp_processing_seconds', 'IGMP processing time', tracer.igmp_processing_histogram)]
+            for name, help_str, histogram in histograms:
+                lines.append('# HELP ' + name + ' ' + help_str)
+                lines.append('# TYPE ' + name + ' summary')
+                if histogram.count > 0:
+                    for quantile in HISTOGRAM_QUANTILES:
+                        lines.append(name + '{quantile="' + str(quantile) + '"} '
+                                + str(histogram.get_percentile(quantile * 100)))
+                lines.append(name + '_sum ' + str(histogram.total))
+                lines.append(name + '_count ' + str(histogram.count))
+
+        self.metrics_text = '\n'.join(lines) + '\n'
+
+
+def launch(metrics_address = METRICS_ADDRESS, metrics_port = METRICS_PORT, metrics_interval = METRICS_INTERVAL):
+    # Method called by the POX core when launching the module
+    core.registerNew(MetricsServer, metrics_address, int(metrics_port), float(metrics_interval))
@@ -0,0 +1,78 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+#  Copyright 2014 Alexander Craig
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+Helpers shared by the modules which drive the POX modules from connections not accepted by of_01 (misc.groupflow_benchmark
+and misc.openflow_replayer), and by the profiling modules. This is not a POX component, and has no launch function.
+
+POX provides no public API for registering such connections, so they are registered with the OpenFlow nexus through its
+private _connect() and _disconnect() methods (see update_nexus_connection()). check_nexus_connection_support() should be
+called when a harness starts, so that it fails clearly if the running POX version does not provide them.
+"""
+
+import time
+from pox.core import core
+from pox.misc.groupflow_event_tracer import get_curr_time
+
+# CPU time of the current process
+try:
+    cpu_time = time.process_time
+except AttributeError:
+    cpu_time = time.clock
+
+
+def check_nexus_connection_support():
+    """Raises a RuntimeError if the OpenFlow nexus does not provide the private methods used by
+    update_nexus_connection()."""
+    missing_methods = [method_name for method_name in ('_connect', '_disconnect')
+            if not hasattr(core.openflow, method_name)]
+    if missing_methods:
+        raise RuntimeError('The OpenFlow nexus of this POX version does not provide '
+                + ', '.join(['core.openflow.' + method_name + '()' for method_name in missing_methods])
+                + ', simulated connections cannot be registered')
+
+
+def update_nexus_connection(connection, connected = True):
+    """Registers a simulated connection with the OpenFlow nexus (or unregisters it, if connected is False), as of_01
+    does for accepted connections, so that modules can reach it through core.openflow.getConnection() and
+    core.openflow.sendToDPID().
+
+    A RuntimeError is raised if the running POX version does not provide the private nexus methods used (see
+    check_nexus_connection_support()).
+    """
+    check_nexus_connection_support()
+    if connected:
+        core.openflow._connect(connection)
+    else:
+        core.openflow._disconnect(connection.dpid)
+
+
+def raise_openflow_event(connection, event_type, *args):
+    """Raises an OpenFlow event on the OpenFlow nexus and then the connection (in the same fashion as of_01).
+
+    Returns a tuple of (handler_time, error), where handler_time is the time (in seconds) taken by all handlers, and
+    error is the exception raised by a handler (or None if all handlers completed).
+    """
+    error = None
+    start_time = get_curr_time()
+    try:
+        event = core.openflow.raiseEvent(event_type, connection, *args)
+        if event is None or event.halt != True:
+            connection.raiseEvent(event_type, connection, *args)
+    except Exception as e:
+        error = e
+    return get_curr_time() - start_time, error
@@ -0,0 +1,259 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+#  Copyright 2014 Alexander Craig
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+This module records every OpenFlow message received from or sent to switches by the controller into a compact binary
+file, so that a live run can later be replayed into the POX modules by the misc.openflow_replayer module.
+
+Received messages are recorded from the OpenFlow events raised by the POX core (the features reply of ConnectionUp
+events, PacketIns, flow and port stats replies, barrier replies, port status, flow removed and error messages). The
+recorder listens with a priority above all other modules (including the discovery module, which halts LLDP PacketIns),
+so that messages are recorded before any handler can halt an event. Sent messages are recorded by wrapping the send()
+method of each connection when it comes up. Messages exchanged during the OpenFlow handshake (before ConnectionUp) are
+not recorded.
+
+Recording file format (all fields in network byte order):
+
+* File header: RECORDING_MAGIC, followed by the wall clock time at which recording started (double)
+* Records: A header (RECORD_HEADER_FORMAT) containing the time of the record relative to the start of the recording
+  (double, in seconds), the record type (RECORD_OPENFLOW_IN, RECORD_OPENFLOW_OUT or RECORD_CONNECTION_DOWN), the
+  datapath ID of the switch and the length of the record data, followed by the record data (a packed OpenFlow message,
+  or no data for RECORD_CONNECTION_DOWN records)
+
+Recording files with a name ending in .gz are gzip compressed. To record a Mininet run, add misc.openflow_recorder to
+the POX command line used by the benchmarking scripts.
+
+The following command line arguments are supported:
+
+* recording_file: The file to which OpenFlow messages are recorded.
+  Default: A file named with the current time (ofrecording_<time>.bin.gz)
+* recording_flush_interval: The interval (in seconds) at which buffered records are written to the recording file.
+  Default: 1
+
+Depends on openflow, misc.benchmark_terminator (optional)
+"""
+
+import time
+import datetime
+import os
+import gzip
+import struct
+from pox.core import core
+from pox.lib.revent import *
+from pox.lib.recoco import Timer
+
+RECORDING_FLUSH_INTERVAL = 1    # Seconds
+
+RECORDING_MAGIC = 'GFOFREC1'
+RECORDING_HEADER_FORMAT = '!8sd'
+RECORDING_HEADER_LEN = struct.calcsize(RECORDING_HEADER_FORMAT)
+RECORD_HEADER_FORMAT = '!dBQI'
+RECORD_HEADER_LEN = struct.calcsize(RECORD_HEADER_FORMAT)
+
+# Record types
+RECORD_OPENFLOW_IN = 0      # OpenFlow message received from a switch
+RECORD_OPENFLOW_OUT = 1     # OpenFlow message sent to a switch
+RECORD_CONNECTION_DOWN = 2  # Switch connection closed
+
+# Priority of the recorder's OpenFlow listeners, which must be higher than that of the discovery module (0xffffffff)
+RECORDER_PRIORITY = 0x100000000
+
+log = core.getLogger()
+
+
+def open_recording_file(filepath, mode):
+    """Opens a recording file, using gzip compression if the file name ends in .gz"""
+    if filepath.endswith('.gz'):
+        return gzip.open(filepath, mode)
+    return open(filepath, mode)
+
+
+def read_recording(filepath):
+    """Reads a recording file, and returns a (start_time, records) tuple, where start_time is the wall clock time at which
+    recording started, and records is a list of (record_time, record_type, dpid, data) tuples in recorded order.
+
+    A truncated final record (such as one left by a controller which did not terminate cleanly) is ignored.
+    """
+    records = []
+    with open_recording_file(filepath, 'rb') as recording_file:
+        magic, start_time = struct.unpack(RECORDING_HEADER_FORMAT, recording_file.read(RECORDING_HEADER_LEN))
+        if magic != RECORDING_MAGIC:
+            raise ValueError('Not an OpenFlow recording file: ' + str(filepath))
+        while True:
+            header = recording_file.read(RECORD_HEADER_LEN)
+            if len(header) < RECORD_HEADER_LEN:
+                break
+            record_time, record_type, dpid, data_len = struct.unpack(RECORD_HEADER_FORMAT, header)
+            data = recording_file.read(data_len)
+            if len(data) < data_len:
+                break
+            records.append((record_time, record_type, dpid, data))
+    return start_time, records
+
+
+def get_openflow_type(data):
+    """Returns the message type from the header of a packed OpenFlow message."""
+    return ord(data[1])
+
+
+def get_openflow_xid(data):
+    """Returns the transaction ID from the header of a packed OpenFlow message."""
+    return struct.unpack_from('!I', data, 4)[0]
+
+
+def get_normalized_flow_mod(data):
+    """Returns a packed flow mod with its transaction ID zeroed, so that flow mods sent in different runs can be compared."""
+    return data[:4] + '\x00\x00\x00\x00' + data[8:]
+
+
+class RecordingWriter(object):
+
+    """Buffered writer for OpenFlow recording files."""
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.start_time = time.time()
+        self.num_records = 0
+        self.num_bytes = 0
+        self._pending_records = []
+        self._recording_file = open_recording_file(filepath, 'wb')
+        self._recording_file.write(struct.pack(RECORDING_HEADER_FORMAT, RECORDING_MAGIC, self.start_time))
+
+    def write_record(self, record_type, dpid, data):
+        """Buffers a single record, timestamped with the current time."""
+        self._pending_records.append(struct.pack(RECORD_HEADER_FORMAT, time.time() - self.start_time, record_type, dpid,
+                len(data)) + data)
+        self.num_records += 1
+        self.num_bytes += RECORD_HEADER_LEN + len(data)
+
+    def flush(self):
+        """Writes all buffered records to the recording file."""
+        if self._pending_records and self._recording_file is not None:
+            self._recording_file.write(''.join(self._pending_records))
+            self._pending_records = []
+
+    def close(self):
+        """Writes all buffered records, and closes the recording file."""
+        if self._recording_file is None:
+            return
+        self.flush()
+        self._recording_file.flush()
+        if not isinstance(self._recording_file, gzip.GzipFile):
+            os.fsync(self._recording_file.fileno())
+        self._recording_file.close()
+        self._recording_file = None
+
+
+class OpenFlowRecorder(EventMixin):
+
+    """Module which records all OpenFlow messages exchanged with switches to a recording file."""
+
+    _core_name = "openflow_recorder"
+
+    def __init__(self, recording_file = None, flush_interval = RECORDING_FLUSH_INTERVAL):
+        """Opens the recording file, and starts recording once the OpenFlow module has loaded."""
+
+        def startup():
+            core.openflow.addListeners(self, priority = RECORDER_PRIORITY)
+            self._flush_timer = Timer(self.flush_interval, self.writer.flush, recurring = True)
+            log.info('Recording OpenFlow messages to file: ' + self.writer.filepath)
+
+        if recording_file is None:
+            recording_file = datetime.datetime.now().strftime("ofrecording_%H-%M-%S_%B-%d_%Y.bin.gz")
+        self.flush_interval = float(flush_interval)
+        self.writer = RecordingWriter(recording_file)
+        self.num_pack_errors = 0
+        self._flush_timer = None
+
+        core.addListenerByName('GoingDownEvent', self.going_down_handler)
+        core.call_when_ready(startup, ('openflow'))
+
+    def record_message(self, record_type, dpid, msg):
+        """Records an OpenFlow message (either packed, or as a libopenflow message object)."""
+        if self.writer is None:
+            return
+        if not isinstance(msg, bytes):
+            try:
+                msg = msg.pack()
+            except Exception as e:
+                self.num_pack_errors += 1
+                log.warn('Unable to pack message for recording: ' + type(e).__name__ + ': ' + str(e))
+                return
+        self.writer.write_record(record_type, dpid, msg)
+
+    def wrap_connection_send(self, connection):
+        """Replaces the send() method of the connection with a wrapper which records all sent messages."""
+        send = connection.send
+
+        def recorded_send(data):
+            self.record_message(RECORD_OPENFLOW_OUT, connection.dpid, data)
+            send(data)
+
+        connection.send = recorded_send
+
+    def _handle_ConnectionUp(self, event):
+        self.record_message(RECORD_OPENFLOW_IN, event.dpid, event.ofp)
+        self.wrap_connection_send(event.connection)
+
+    def _handle_ConnectionDown(self, event):
+        self.record_message(RECORD_CONNECTION_DOWN, event.dpid, '')
+
+    def _handle_PacketIn(self, event):
+        self.record_message(RECORD_OPENFLOW_IN, event.dpid, event.ofp)
+
+    def _handle_BarrierIn(self, event):
+        self.record_message(RECORD_OPENFLOW_IN, event.dpid, event.ofp)
+
+    def _handle_PortStatus(self, event):
+        self.record_message(RECORD_OPENFLOW_IN, event.dpid, event.ofp)
+
+    def _handle_FlowRemoved(self, event):
+        self.record_message(RECORD_OPENFLOW_IN, event.dpid, event.ofp)
+
+    def _handle_ErrorIn(self, event):
+        self.record_message(RECORD_OPENFLOW_IN, event.dpid, event.ofp)
+
+    def _handle_FlowStatsReceived(self, event):
+        # Multipart replies are recorded as one record per part
+        for stats_reply in event.ofp:
+            self.record_message(RECORD_OPENFLOW_IN, event.connection.dpid, stats_reply)
+
+    def _handle_PortStatsReceived(self, event):
+        for stats_reply in event.ofp:
+            self.record_message(RECORD_OPENFLOW_IN, event.connection.dpid, stats_reply)
+
+    def going_down_handler(self, event):
+        """Closes the recording file when POX is stopped."""
+        self.termination_handler(None, None)
+
+    def termination_handler(self, signal, frame):
+        """Stops recording, and writes and closes the recording file. This function is typically called by the
+        BenchmarkTerminator module."""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if self.writer is None:
+            return
+        self.writer.close()
+        log.info('Termination signalled, wrote ' + str(self.writer.num_records) + ' OpenFlow records ('
+                + str(self.writer.num_bytes) + ' bytes) to file: ' + self.writer.filepath)
+        self.writer = None
+
+
+def launch(recording_file = None, recording_flush_interval = RECORDING_FLUSH_INTERVAL):
+    # Method called by the POX core when launching the module
+    core.registerNew(OpenFlowRecorder, recording_file, float(recording_flush_interval))
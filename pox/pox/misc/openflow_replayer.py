@@ -0,0 +1,388 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+#  Copyright 2014 Alexander Craig
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+This module replays an OpenFlow recording produced by the misc.openflow_recorder module into the POX modules, so that
+controller performance and decisions can be compared across controller versions using identical input.
+
+Each recorded features reply creates a replay connection (and raises ConnectionUp), and all other received messages are
+raised as OpenFlow events on the OpenFlow nexus and then the replay connection (in the same fashion as of_01), at their
+original times scaled by replay_speed. Multipart stats replies are reassembled before FlowStatsReceived and
+PortStatsReceived events are raised. Messages sent by the controller to replay connections are not delivered anywhere,
+but are recorded to replay_output_file (in the recording file format) and compared with the messages sent in the
+recorded run. The transaction IDs of recorded barrier replies are rewritten to the IDs of the corresponding barrier
+requests sent during replay (matched by their order on each switch), so that modules waiting on barriers behave as they
+did in the recorded run.
+
+When replay completes, the following results are written to replay_results_file in JSON format, and POX is stopped
+(after flushing all benchmarking modules if misc.benchmark_terminator is running):
+
+* Handler latency percentiles and error counts for each replayed event type
+* Process CPU time and wall clock time taken by the replay
+* The latency histograms of the GroupFlowEventTracer (if running)
+* Decision equivalence: The flow mods sent to each switch during replay are compared (with transaction IDs ignored) to
+  those sent in the recorded run, both in order and as an unordered set, and the first mismatch is reported
+
+Note that modules which measure time intervals with the wall clock (such as the FlowTracker's stats processing) observe
+compressed intervals when replay_speed is not 1, which changes utilization estimates and therefore utilization based
+routing decisions. Decision equivalence should be compared at the original speed, or with static link weights.
+groupflow_scripts/compare_openflow_replays.py compares the results of two replays (e.g. of two controller versions).
+
+Example:
+
+./pox.py --no-openflow openflow openflow.discovery openflow.flow_tracker openflow.igmp_manager
+    misc.groupflow_event_tracer openflow.groupflow misc.openflow_replayer --recording_file=ofrecording.bin.gz
+
+The following command line arguments are supported:
+
+* recording_file: The recording file to replay.
+  Default: None (required)
+* replay_speed: The speed at which messages are replayed relative to the recorded run (e.g. 2 replays twice as fast).
+  Set to 0 to replay messages as fast as possible.
+  Default: 1
+* replay_batch_size: The maximum number of messages replayed in a single iteration of the POX event loop.
+  Default: 100
+* replay_results_file: The file to which replay results are written in JSON format.
+  Default: openflow_replay_results.json
+* replay_output_file: The file to which messages sent by the controller during replay are recorded. Set to 'none' to
+  disable.
+  Default: openflow_replay_output.bin.gz
+
+Note: Replay connections are registered with the OpenFlow nexus through its private _connect() and _disconnect()
+methods (see misc.openflow_harness), and replay is aborted at startup if the running POX
+version does not provide them. The replayer has not yet been exercised end to end against a running POX installation
+or a real recording, so the handler error counts in the results file should be checked before replay results are
+relied on.
+
+Depends on openflow, misc.openflow_recorder, misc.groupflow_event_tracer (optional), misc.benchmark_terminator (optional)
+"""
+
+import time
+import os
+import json
+from pox.core import core
+from pox.lib.revent import *
+from pox.lib.recoco import Timer
+from pox.openflow import *
+from pox.misc.openflow_recorder import *
+from pox.misc.groupflow_event_tracer import LatencyHistogram
+from pox.misc.openflow_harness import cpu_time, check_nexus_connection_support, update_nexus_connection, \
+        raise_openflow_event
+import pox.openflow.libopenflow_01 as of
+
+REPLAY_SPEED = 1
+REPLAY_BATCH_SIZE = 100
+REPLAY_RESULTS_FILE = 'openflow_replay_results.json'
+REPLAY_OUTPUT_FILE = 'openflow_replay_output.bin.gz'
+REPLAY_SETTLE_TIME = 2  # Seconds waited after the last replayed message before results are written
+
+# Event types raised for each type of received OpenFlow message (stats replies and features replies are handled
+# separately)
+OPENFLOW_IN_EVENTS = {
+    of.OFPT_PACKET_IN: PacketIn,
+    of.OFPT_BARRIER_REPLY: BarrierIn,
+    of.OFPT_PORT_STATUS: PortStatus,
+    of.OFPT_FLOW_REMOVED: FlowRemoved,
+    of.OFPT_ERROR: ErrorIn,
+}
+
+log = core.getLogger()
+
+
+def unpack_openflow_message(data):
+    """Unpacks a packed OpenFlow message into a libopenflow message object."""
+    return of._message_type_to_class[get_openflow_type(data)].unpack_new(data)[1]
+
+
+class ReplayConnection(EventMixin):
+
+    """Stand-in for the OpenFlow connection of a recorded switch. Messages sent to the connection are passed to the
+    OpenFlowReplayer."""
+
+    _eventMixin_events = set([ConnectionUp, ConnectionDown, PortStatus, FlowRemoved, PacketIn, ErrorIn, BarrierIn,
+            FlowStatsReceived, PortStatsReceived])
+
+    def __init__(self, replayer, features):
+        self.replayer = replayer
+        self.features = features
+        self.dpid = features.datapath_id
+        self.ID = self.dpid
+        self.connect_time = time.time()
+        self.stats_reply_parts = []     # Parts of a multipart stats reply which has not yet been completed
+
+    def __str__(self):
+        return '[ReplayConnection ' + str(self.dpid) + ']'
+
+    def send(self, data):
+        self.replayer.record_sent_message(self.dpid, data)
+
+
+class OpenFlowReplayer(EventMixin):
+
+    """Module which replays an OpenFlow recording into the POX modules, and reports controller performance and decision
+    equivalence."""
+
+    _core_name = "openflow_replayer"
+
+    def __init__(self, recording_file, replay_speed = REPLAY_SPEED, batch_size = REPLAY_BATCH_SIZE,
+            results_file = REPLAY_RESULTS_FILE, output_file = REPLAY_OUTPUT_FILE):
+        """Loads the recording, and starts replay once all other modules have loaded."""
+
+        def startup():
+            try:
+                check_nexus_connection_support()
+            except RuntimeError as e:
+                log.error('Replay aborted: ' + str(e))
+                core.quit()
+                return
+            self._replay_start_time = time.time()
+            self._replay_start_cpu_time = cpu_time()
+            core.callLater(self.replay_next_messages)
+
+        self.recording_file = recording_file
+        self.replay_speed = float(replay_speed)
+        self.batch_size = max(1, int(batch_size))
+        self.results_file = results_file
+        self.output_writer = None
+        if output_file is not None:
+            self.output_writer = RecordingWriter(output_file)
+        log.info('Set RecordingFile:' + str(self.recording_file) + ' ReplaySpeed:' + str(self.replay_speed)
+                + ' ReplayBatchSize:' + str(self.batch_size))
+
+        recording_start_time, records = read_recording(recording_file)
+        self.input_records = []             # Received messages and connection down records, in recorded order
+        self.recorded_flow_mods = {}        # Normalized flow mods sent in the recorded run, keyed by dpid
+        self.recorded_barrier_index = {}    # Order of barrier requests sent in the recorded run: [dpid][xid] -> index
+        for record_time, record_type, dpid, data in records:
+            if record_type != RECORD_OPENFLOW_OUT:
+                self.input_records.append((record_time, record_type, dpid, data))
+            elif get_openflow_type(data) == of.OFPT_FLOW_MOD:
+                self.recorded_flow_mods.setdefault(dpid, []).append(get_normalized_flow_mod(data))
+            elif get_openflow_type(data) == of.OFPT_BARRIER_REQUEST:
+                barrier_index = self.recorded_barrier_index.setdefault(dpid, {})
+                barrier_index[get_openflow_xid(data)] = len(barrier_index)
+        log.info('Loaded ' + str(len(records)) + ' records (' + str(len(self.input_records))
+                + ' received messages) from recording: ' + str(recording_file))
+
+        self.connections = {}           # ReplayConnections, keyed by dpid
+        self.replayed_flow_mods = {}    # Normalized flow mods sent during replay, keyed by dpid
+        self.replayed_barrier_xids = {} # Transaction IDs of barrier requests sent during replay, keyed by dpid
+        self.num_sent_messages = 0
+        self.num_replayed_messages = 0
+        self.num_unknown_connection_messages = 0
+
+        self.event_histograms = {}      # LatencyHistograms of handler processing times, keyed by event type name
+        self.event_errors = {}          # Number of handler exceptions, keyed by event type name
+
+        self._next_record_index = 0
+        self._replay_start_time = None
+        self._replay_start_cpu_time = None
+        self._first_record_time = 0
+        if self.input_records:
+            self._first_record_time = self.input_records[0][0]
+
+        core.call_when_ready(startup, ('openflow'))
+
+    def record_sent_message(self, dpid, data):
+        """Records a message sent by the controller to a replay connection."""
+        if not isinstance(data, bytes):
+            data = data.pack()
+        self.num_sent_messages += 1
+        if self.output_writer is not None:
+            self.output_writer.write_record(RECORD_OPENFLOW_OUT, dpid, data)
+        if get_openflow_type(data) == of.OFPT_FLOW_MOD:
+            self.replayed_flow_mods.setdefault(dpid, []).append(get_normalized_flow_mod(data))
+        elif get_openflow_type(data) == of.OFPT_BARRIER_REQUEST:
+            self.replayed_barrier_xids.setdefault(dpid, []).append(get_openflow_xid(data))
+
+    def get_replayed_barrier_xid(self, dpid, recorded_xid):
+        """Returns the transaction ID of the barrier request sent during replay which corresponds to a recorded barrier
+        request, or the recorded ID if no such barrier request has been sent."""
+        barrier_index = self.recorded_barrier_index.get(dpid, {}).get(recorded_xid)
+        replayed_xids = self.replayed_barrier_xids.get(dpid, [])
+        if barrier_index is not None and barrier_index < len(replayed_xids):
+            return replayed_xids[barrier_index]
+        return recorded_xid
+
+    def raise_openflow_event(self, connection, event_type, *args):
+        """Raises an OpenFlow event on the OpenFlow nexus and then the connection (in the same fashion as of_01), and
+        records the time taken by all handlers."""
+        event_name = event_type.__name__
+        handler_time, error = raise_openflow_event(connection, event_type, *args)
+        if error is not None:
+            self.event_errors[event_name] = self.event_errors.get(event_name, 0) + 1
+            log.warn('Handler error for ' + event_name + ': ' + type(error).__name__ + ': ' + str(error))
+        if not event_name in self.event_histograms:
+            self.event_histograms[event_name] = LatencyHistogram()
+        self.event_histograms[event_name].record(handler_time)
+
+    def replay_record(self, record_type, dpid, data):
+        """Replays a single received message or connection down record."""
+        if record_type == RECORD_CONNECTION_DOWN:
+            connection = self.connections.pop(dpid, None)
+            if connection is not None:
+                update_nexus_connection(connection, connected = False)
+                self.raise_openflow_event(connection, ConnectionDown)
+            return
+
+        msg = unpack_openflow_message(data)
+        msg_type = get_openflow_type(data)
+        if msg_type == of.OFPT_FEATURES_REPLY:
+            connection = ReplayConnection(self, msg)
+            self.connections[dpid] = connection
+            update_nexus_connection(connection)
+            self.raise_openflow_event(connection, ConnectionUp, msg)
+            return
+
+        connection = self.connections.get(dpid)
+        if connection is None:
+            self.num_unknown_connection_messages += 1
+            return
+
+        if msg_type == of.OFPT_STATS_REPLY:
+            connection.stats_reply_parts.append(msg)
+            if msg.flags & of.OFPSF_REPLY_MORE:
+                return
+            parts = connection.stats_reply_parts
+            connection.stats_reply_parts = []
+            stats = []
+            for part in parts:
+                stats.extend(part.body)
+            if parts[0].type == of.OFPST_FLOW:
+                self.raise_openflow_event(connection, FlowStatsReceived, parts, stats)
+            elif parts[0].type == of.OFPST_PORT:
+                self.raise_openflow_event(connection, PortStatsReceived, parts, stats)
+        elif msg_type in OPENFLOW_IN_EVENTS:
+            if msg_type == of.OFPT_BARRIER_REPLY:
+                msg.xid = self.get_replayed_barrier_xid(dpid, msg.xid)
+            self.raise_openflow_event(connection, OPENFLOW_IN_EVENTS[msg_type], msg)
+
+    def replay_next_messages(self):
+        """Replays all messages which are due (up to batch_size messages), and schedules the next call."""
+        replay_time = time.time() - self._replay_start_time
+        num_replayed = 0
+        while self._next_record_index < len(self.input_records) and num_replayed < self.batch_size:
+            record_time, record_type, dpid, data = self.input_records[self._next_record_index]
+            if self.replay_speed > 0 and (record_time - self._first_record_time) / self.replay_speed > replay_time:
+                break
+            self._next_record_index += 1
+            num_replayed += 1
+            self.num_replayed_messages += 1
+            try:
+                self.replay_record(record_type, dpid, data)
+            except Exception as e:
+                log.warn('Unable to replay record ' + str(self._next_record_index - 1) + ': ' + type(e).__name__ + ': '
+                        + str(e))
+
+        if self._next_record_index >= len(self.input_records):
+            log.info('Replayed ' + str(self.num_replayed_messages) + ' messages in '
+                    + '{:.3f}'.format(time.time() - self._replay_start_time) + ' seconds')
+            Timer(REPLAY_SETTLE_TIME, self.finish_replay)
+        elif self.replay_speed <= 0 or num_replayed >= self.batch_size:
+            core.callLater(self.replay_next_messages)
+        else:
+            next_record_time = self.input_records[self._next_record_index][0] - self._first_record_time
+            Timer(max(0, next_record_time / self.replay_speed - (time.time() - self._replay_start_time)),
+                    self.replay_next_messages)
+
+    def get_decision_equivalence(self):
+        """Compares the flow mods sent to each switch during replay to those sent in the recorded run."""
+        ordered_equivalent_dpids = 0
+        unordered_equivalent_dpids = 0
+        first_mismatch = None
+        dpids = sorted(set(self.recorded_flow_mods.keys()) | set(self.replayed_flow_mods.keys()))
+        for dpid in dpids:
+            recorded_flow_mods = self.recorded_flow_mods.get(dpid, [])
+            replayed_flow_mods = self.replayed_flow_mods.get(dpid, [])
+            if recorded_flow_mods == replayed_flow_mods:
+                ordered_equivalent_dpids += 1
+            elif first_mismatch is None:
+                for index in xrange(max(len(recorded_flow_mods), len(replayed_flow_mods))):
+                    if index >= len(recorded_flow_mods) or index >= len(replayed_flow_mods) \
+                            or recorded_flow_mods[index] != replayed_flow_mods[index]:
+                        first_mismatch = {'dpid': dpid, 'flow_mod_index': index}
+                        break
+            if sorted(recorded_flow_mods) == sorted(replayed_flow_mods):
+                unordered_equivalent_dpids += 1
+        return {
+            'recorded_flow_mods': sum([len(flow_mods) for flow_mods in self.recorded_flow_mods.itervalues()]),
+            'replayed_flow_mods': sum([len(flow_mods) for flow_mods in self.replayed_flow_mods.itervalues()]),
+            'switches': len(dpids),
+            'ordered_equivalent_switches': ordered_equivalent_dpids,
+            'unordered_equivalent_switches': unordered_equivalent_dpids,
+            'equivalent': ordered_equivalent_dpids == len(dpids),
+            'first_mismatch': first_mismatch,
+        }
+
+    def finish_replay(self):
+        """Flushes benchmarking modules, writes replay results to results_file, and stops POX."""
+        replay_duration = time.time() - self._replay_start_time
+        replay_cpu_time = cpu_time() - self._replay_start_cpu_time
+        if core.hasComponent('benchmark_terminator'):
+            core.benchmark_terminator.flush_benchmarking(None, None)
+        if self.output_writer is not None:
+            self.output_writer.close()
+            log.info('Wrote ' + str(self.output_writer.num_records) + ' sent messages to file: '
+                    + self.output_writer.filepath)
+
+        events = {}
+        for event_name, histogram in self.event_histograms.iteritems():
+            events[event_name] = histogram.get_summary_dict()
+            events[event_name]['errors'] = self.event_errors.get(event_name, 0)
+            log.info('Event:' + event_name + ' ' + histogram.get_summary_str() + ' Errors:'
+                    + str(self.event_errors.get(event_name, 0)))
+
+        results = {
+            'recording_file': self.recording_file,
+            'output_file': os.path.abspath(self.output_writer.filepath) if self.output_writer is not None else None,
+            'replay_speed': self.replay_speed,
+            'duration': replay_duration,
+            'cpu_time': replay_cpu_time,
+            'replayed_messages': self.num_replayed_messages,
+            'sent_messages': self.num_sent_messages,
+            'unknown_connection_messages': self.num_unknown_connection_messages,
+            'events': events,
+            'trace_histograms': {},
+            'decisions': self.get_decision_equivalence(),
+        }
+        if core.hasComponent('groupflow_event_tracer'):
+            results['trace_histograms'] = core.groupflow_event_tracer.get_histogram_summaries()
+
+        decisions = results['decisions']
+        log.info('Replay CPUTime:' + '{:.3f}'.format(replay_cpu_time) + ' Duration:' + '{:.3f}'.format(replay_duration)
+                + ' RecordedFlowMods:' + str(decisions['recorded_flow_mods']) + ' ReplayedFlowMods:'
+                + str(decisions['replayed_flow_mods']) + ' EquivalentSwitches:'
+                + str(decisions['ordered_equivalent_switches']) + '/' + str(decisions['switches']))
+        if not decisions['equivalent']:
+            log.warn('Replayed flow mods differ from recorded run, first mismatch: ' + str(decisions['first_mismatch']))
+
+        with open(self.results_file, 'w') as results_file:
+            json.dump(results, results_file, indent = 4, sort_keys = True)
+        log.info('Wrote replay results to file: ' + str(self.results_file))
+        core.callLater(core.quit)
+
+
+def launch(recording_file = None, replay_speed = REPLAY_SPEED, replay_batch_size = REPLAY_BATCH_SIZE,
+        replay_results_file = REPLAY_RESULTS_FILE, replay_output_file = REPLAY_OUTPUT_FILE):
+    # Method called by the POX core when launching the module
+    if recording_file is None:
+        log.error('A recording file must be specified with --recording_file')
+        return
+    if 'none' in str(replay_output_file):
+        replay_output_file = None
+    core.registerNew(OpenFlowReplayer, recording_file, float(replay_speed), int(replay_batch_size), replay_results_file,
+            replay_output_file)
@@ -25,10 +25,11 @@ The following command line arguments are supported:
 
 * query_interval: The length of time (in seconds) which should elapse between consecutive flow/port stats queries to switches. 
   Default: 2
-* link_max_bw: The maximum bandwidth (in Mbps) of network links. Note that in the current implementation, all links must have
-  uniform bandwidth.
+* link_max_bw: The default maximum bandwidth (in Mbps) of network links. This value is used for any link which has no
+  capacity configured through link_capacity_file, link_capacity_from_features, or the set_link_capacity() API.
   Default: 30
-* link_cong_threshold: The utilization (in Mbps) above which a link should be considered as congested. Must be <= link_max_bw.
+* link_cong_threshold: The utilization (in Mbps) above which a link of capacity link_max_bw should be considered as congested.
+  Must be <= link_max_bw. Links with a different capacity use the same threshold scaled relative to their capacity.
   Default: 28.5 
 * avg_smooth_factor: The alpha value to use for the bandwidth estimation exponential average. The bandwidth utilization
   at each monitoring interval i is specified by BW_est_i = (alpha * BW_val_(i)) + ((1 - alpha) * BW_est_(i-1)). Higher alpha values
@@ -37,6 +38,53 @@ The following command line arguments are supported:
 * log_peak_usage: (True/False) If true, the peak and average utilization in the network are logged to debug.info at an interval of
   (query_interval / 1.5) seconds.
   Default: False.
+* link_cong_clear_threshold: The utilization (in Mbps) below which a congested link of capacity link_max_bw is considered to
+  be no longer congested. Must be <= link_cong_threshold, and is scaled by link capacity in the same manner as
+  link_cong_threshold. Setting this lower than link_cong_threshold provides hysteresis in congestion detection.
+  Default: link_cong_threshold
+* cong_event_suppression: The minimum interval (in seconds) between consecutive congestion events raised for the same
+  link while it remains congested.
+  Default: 0
+* coalesce_cong_events: (True/False) If true, a single NetworkCongestionEvent listing all newly congested links is raised
+  once per query interval, instead of one LinkUtilizationEvent per congested link.
+  Default: False
+* bw_estimator: The predictive bandwidth estimator maintained alongside the exponential average for each port and flow.
+  Supported options are 'none', 'holt' (Holt linear trend exponential smoothing, using avg_smooth_factor as the level
+  smoothing factor) and 'kalman' (scalar Kalman filter with a random walk process model). Requires NumPy.
+  Default: none
+* forecast_horizon: The number of query intervals ahead for which bandwidth forecasts are produced.
+  Default: 1
+* holt_trend_factor: The trend smoothing factor (beta) used by the 'holt' estimator.
+  Default: 0.3
+* kalman_process_var: The process noise variance (in Mbps^2 per query interval) used by the 'kalman' estimator.
+  Default: 1.0
+* kalman_measurement_var: The measurement noise variance (in Mbps^2) used by the 'kalman' estimator.
+  Default: 4.0
+* forecast_confidence_z: The number of standard deviations spanned by each side of the forecast confidence band.
+  Default: 1.96
+* flow_topk: If greater than 0, enables compact flow tracking, in which exact per flow bandwidth state is only maintained
+  for the flow_topk largest flows on each tracked port. The remaining flows on each port are estimated from their
+  lifetime average rate (byte count / flow duration) and summarized in a Count-Min sketch, which is rebuilt every
+  query interval. Flows are promoted into and evicted from the exactly tracked set in the fashion of the Space-Saving
+  algorithm. Setting this to 0 tracks all flows exactly.
+  Default: 0
+* flow_sketch_width: The number of counters in each row of the per-port Count-Min sketch used by compact flow tracking.
+  Default: 64
+* flow_sketch_depth: The number of rows (hash functions) in the per-port Count-Min sketch used by compact flow tracking.
+  Default: 4
+* link_capacity_file: Path to a BRITE topology file from which per-link capacities should be read. Switch DPIDs are
+  assumed to match BRITE node IDs (as generated by the BriteTopo class in groupflow_shared.py).
+  Default: None
+* link_capacity_from_features: (True/False) If true, link capacities are set from the current port speed reported in the
+  OpenFlow port features of each switch. Note that Mininet emulated links will generally not report their emulated rate.
+  Default: False
+* timeseries_len: The maximum number of samples retained for each link and flow utilization time series. Older samples are
+  discarded once this limit is reached. The series of a flow is discarded when the flow is removed from a link, and the
+  series of a link is discarded when the link is no longer tracked. Setting this to 0 disables time series recording.
+  Default: 600
+* timeseries_export: (True/False) If true, all recorded time series are exported to a NumPy .npz file (named to match the
+  flow tracker log file) when the module is terminated. Requires NumPy.
+  Default: False
 
 Depends on openflow.discovery
 
@@ -58,6 +106,13 @@ from pox.lib.addresses import IPAddr, EthAddr
 from pox.lib.recoco import Timer
 import time
 import datetime
+import os
+from collections import deque
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 log = core.getLogger()
 
@@ -71,6 +126,26 @@ LINK_MAX_BANDWIDTH_MbPS = 30 # MegaBits per second
 LINK_CONGESTION_THRESHOLD_MbPS = 0.95 * LINK_MAX_BANDWIDTH_MbPS
 PERIODIC_QUERY_INTERVAL = 2 # Seconds
 
+# Maps OpenFlow port feature flags to the associated port speed in Mbps
+PORT_FEATURE_SPEEDS_MbPS = [
+    (of.OFPPF_10GB_FD, 10000),
+    (of.OFPPF_1GB_FD, 1000),
+    (of.OFPPF_1GB_HD, 1000),
+    (of.OFPPF_100MB_FD, 100),
+    (of.OFPPF_100MB_HD, 100),
+    (of.OFPPF_10MB_FD, 10),
+    (of.OFPPF_10MB_HD, 10)
+]
+TIME_SERIES_MAX_SAMPLES = 600
+FORECAST_HORIZON = 1 # Query intervals
+HOLT_TREND_SMOOTHING_FACTOR = 0.3
+KALMAN_PROCESS_VARIANCE = 1.0 # Mbps^2 per query interval
+KALMAN_MEASUREMENT_VARIANCE = 4.0 # Mbps^2
+FORECAST_CONFIDENCE_Z = 1.96
+FLOW_TOP_K = 0 # 0 disables compact flow tracking
+FLOW_SKETCH_WIDTH = 64
+FLOW_SKETCH_DEPTH = 4
+
 class LinkUtilizationEvent(Event):
 
     """Event which reports link status in the event of link congestion, or under under other conditions (TBD).
@@ -104,6 +179,281 @@ class LinkUtilizationEvent(Event):
         self.flow_map = flow_map
 
 
+class NetworkCongestionEvent(Event):
+
+    """Event which reports all links on which congestion was detected during a single polling round.
+
+    This class contains the following public attributes:
+
+    * link_events: A list of LinkUtilizationEvent objects, one per congested link, describing the state of each link at the
+      time its congestion was detected.
+    """
+
+    def __init__ (self, link_events):
+        Event.__init__(self)
+        self.link_events = link_events
+
+
+class UtilizationTimeSeries(object):
+    """Bounded ring buffer of (timestamp, utilization) samples supporting windowed queries.
+
+    Samples must be added in non-decreasing timestamp order. Once max_samples samples have been recorded, each new sample
+    discards the oldest one. All windowed queries consider samples with timestamps in the range
+    (end_time - window_seconds, end_time], where end_time defaults to the current time. A window_seconds of None
+    selects every retained sample.
+    """
+
+    def __init__(self, max_samples):
+        self.max_samples = max_samples
+        self._times = deque(maxlen=max_samples)
+        self._values = deque(maxlen=max_samples)
+
+    def __len__(self):
+        return len(self._times)
+
+    def add_sample(self, sample_time, value):
+        """Records a single utilization sample (in Mbps) taken at sample_time."""
+        self._times.append(sample_time)
+        self._values.append(value)
+
+    def get_samples(self, window_seconds=None, end_time=None):
+        """Returns a list of (timestamp, utilization) tuples for all samples in the specified window, oldest first."""
+        if window_seconds is None:
+            return zip(self._times, self._values)
+
+        if end_time is None:
+            end_time = time.time()
+        start_time = end_time - window_seconds
+        samples = []
+        # Walk backwards from the newest sample, stopping as soon as the window start is passed
+        for index in xrange(len(self._times) - 1, -1, -1):
+            sample_time = self._times[index]
+            if sample_time <= start_time:
+                break
+            if sample_time <= end_time:
+                samples.append((sample_time, self._values[index]))
+        samples.reverse()
+        return samples
+
+    def get_values(self, window_seconds=None, end_time=None):
+        """Returns a list of utilization values for all samples in the specified window, oldest first."""
+        return [sample[1] for sample in self.get_samples(window_seconds, end_time)]
+
+    def window_max(self, window_seconds=None, end_time=None):
+        """Returns the maximum utilization in the specified window, or None if the window contains no samples."""
+        values = self.get_values(window_seconds, end_time)
+        if not values:
+            return None
+        return max(values)
+
+    def window_mean(self, window_seconds=None, end_time=None):
+        """Returns the mean utilization in the specified window, or None if the window contains no samples."""
+        values = self.get_values(window_seconds, end_time)
+        if not values:
+            return None
+        return sum(values) / float(len(values))
+
+    def window_percentile(self, percentile, window_seconds=None, end_time=None):
+        """Returns the specified percentile (0 - 100) of utilization in the window, or None if the window contains no samples.
+
+        Percentiles are linearly interpolated between the closest ranks (matching the default behaviour of numpy.percentile).
+        """
+        values = sorted(self.get_values(window_seconds, end_time))
+        if not values:
+            return None
+        rank = (len(values) - 1) * (min(max(percentile, 0), 100) / 100.0)
+        lower_index = int(rank)
+        upper_index = min(lower_index + 1, len(values) - 1)
+        return values[lower_index] + ((values[upper_index] - values[lower_index]) * (rank - lower_index))
+
+
+class BandwidthEstimator(object):
+    """Superclass for predictive bandwidth estimators, which track a set of bandwidth series keyed by an arbitrary key.
+
+    Estimator state is stored in a single NumPy array with one row per key, so that all series tracked by an estimator
+    (e.g. all flows on a port) are updated with a single set of vectorized operations per query interval. Subclasses
+    define the state columns by implementing _init_rows(), _update_rows() and _forecast_row().
+
+    Subclassed by HoltEstimator and KalmanEstimator.
+    """
+
+    NUM_STATE_VARS = 0
+
+    def __init__(self, forecast_horizon, confidence_z):
+        self.forecast_horizon = forecast_horizon
+        self.confidence_z = confidence_z
+        self._keys = []
+        self._key_index = {}
+        self._state = np.zeros((0, self.NUM_STATE_VARS))
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._key_index
+
+    def update(self, samples, prune=True):
+        """Updates the estimator with a new bandwidth sample (in Mbps) for each key in the samples map.
+
+        Keys which have not been seen before are initialized from their first sample. If prune is True, any tracked key
+        which does not appear in samples is discarded.
+        """
+        if prune:
+            removed_keys = set(key for key in self._key_index if key not in samples)
+            if removed_keys:
+                self._remove_keys(removed_keys)
+
+        new_keys = []
+        update_indexes = []
+        update_values = []
+        for key in samples:
+            if key in self._key_index:
+                update_indexes.append(self._key_index[key])
+                update_values.append(samples[key])
+            else:
+                new_keys.append(key)
+
+        if update_indexes:
+            self._update_rows(np.array(update_indexes, dtype=np.intp), np.array(update_values, dtype=np.float64))
+
+        if new_keys:
+            for key in new_keys:
+                self._key_index[key] = len(self._keys)
+                self._keys.append(key)
+            self._state = np.vstack((self._state,
+                    self._init_rows(np.array([samples[key] for key in new_keys], dtype=np.float64))))
+
+    def forecast(self, key):
+        """Returns a tuple of (forecast, lower_bound, upper_bound) bandwidths (in Mbps) for forecast_horizon intervals ahead.
+
+        Returns None if the key is not tracked by this estimator. All returned values are clamped to be non-negative.
+        """
+        if key not in self._key_index:
+            return None
+        forecast, std_dev = self._forecast_row(self._state[self._key_index[key]], self.forecast_horizon)
+        band = self.confidence_z * std_dev
+        return (max(forecast, 0), max(forecast - band, 0), max(forecast + band, 0))
+
+    def get_forecasts(self):
+        """Returns a map of the forecast tuples (see forecast()) of all tracked keys, keyed by key."""
+        return dict((key, self.forecast(key)) for key in self._keys)
+
+    def remove(self, keys):
+        """Discards the state of the specified keys (keys which are not tracked are ignored)."""
+        removed_keys = set(key for key in keys if key in self._key_index)
+        if removed_keys:
+            self._remove_keys(removed_keys)
+
+    def _remove_keys(self, removed_keys):
+        """Discards the state of the specified set of tracked keys."""
+        keep_mask = np.ones(len(self._keys), dtype=bool)
+        for key in removed_keys:
+            keep_mask[self._key_index[key]] = False
+        self._state = self._state[keep_mask]
+        self._keys = [key for key in self._keys if key not in removed_keys]
+        self._key_index = dict((key, index) for index, key in enumerate(self._keys))
+
+    def _init_rows(self, values):
+        raise NotImplementedError()
+
+    def _update_rows(self, indexes, values):
+        raise NotImplementedError()
+
+    def _forecast_row(self, row, horizon):
+        raise NotImplementedError()
+
+
+class HoltEstimator(BandwidthEstimator):
+    """Holt linear trend (double exponential smoothing) bandwidth estimator.
+
+    The forecast variance is estimated from an exponential average of squared one step forecast errors, and is assumed to
+    grow linearly with the forecast horizon.
+    """
+
+    NUM_STATE_VARS = 3  # Level, trend, error variance
+
+    def __init__(self, forecast_horizon, confidence_z, level_factor, trend_factor):
+        BandwidthEstimator.__init__(self, forecast_horizon, confidence_z)
+        self.level_factor = level_factor
+        self.trend_factor = trend_factor
+
+    def _init_rows(self, values):
+        rows = np.zeros((len(values), self.NUM_STATE_VARS))
+        rows[:, 0] = values
+        return rows
+
+    def _update_rows(self, indexes, values):
+        level = self._state[indexes, 0]
+        trend = self._state[indexes, 1]
+        error = values - (level + trend)
+        new_level = (self.level_factor * values) + ((1 - self.level_factor) * (level + trend))
+        self._state[indexes, 1] = (self.trend_factor * (new_level - level)) + ((1 - self.trend_factor) * trend)
+        self._state[indexes, 0] = new_level
+        self._state[indexes, 2] = (self.level_factor * error * error) + ((1 - self.level_factor) * self._state[indexes, 2])
+
+    def _forecast_row(self, row, horizon):
+        return (row[0] + (horizon * row[1]), (row[2] * horizon) ** 0.5)
+
+
+class KalmanEstimator(BandwidthEstimator):
+    """Scalar Kalman filter bandwidth estimator, using a random walk process model."""
+
+    NUM_STATE_VARS = 2  # Estimate, estimate variance
+
+    def __init__(self, forecast_horizon, confidence_z, process_var, measurement_var):
+        BandwidthEstimator.__init__(self, forecast_horizon, confidence_z)
+        self.process_var = process_var
+        self.measurement_var = measurement_var
+
+    def _init_rows(self, values):
+        rows = np.zeros((len(values), self.NUM_STATE_VARS))
+        rows[:, 0] = values
+        rows[:, 1] = self.measurement_var
+        return rows
+
+    def _update_rows(self, indexes, values):
+        predicted_var = self._state[indexes, 1] + self.process_var
+        gain = predicted_var / (predicted_var + self.measurement_var)
+        self._state[indexes, 0] += gain * (values - self._state[indexes, 0])
+        self._state[indexes, 1] = (1 - gain) * predicted_var
+
+    def _forecast_row(self, row, horizon):
+        return (row[0], (row[1] + (horizon * self.process_var) + self.measurement_var) ** 0.5)
+
+
+class CountMinSketch(object):
+    """Count-Min sketch which summarizes a set of non-negative values keyed by arbitrary hashable keys.
+
+    Estimates returned by the sketch never underestimate the total value added for a key, and overestimate it by at most
+    (e / width) * total_value with probability 1 - exp(-depth).
+    """
+
+    def __init__(self, width, depth):
+        self.width = width
+        self.depth = depth
+        self.total_value = 0
+        self._rows = [[0] * width for i in range(0, depth)]
+
+    def add(self, key, value):
+        """Adds value to the counters associated with key."""
+        for row_index in range(0, self.depth):
+            self._rows[row_index][hash((row_index, key)) % self.width] += value
+        self.total_value += value
+
+    def estimate(self, key):
+        """Returns the estimated total value added for key (0 if the key has never been added)."""
+        if self.total_value == 0:
+            return 0
+        return min(self._rows[row_index][hash((row_index, key)) % self.width] for row_index in range(0, self.depth))
+
+    def clear(self):
+        """Resets all counters in the sketch to 0."""
+        for row in self._rows:
+            for counter_index in range(0, self.width):
+                row[counter_index] = 0
+        self.total_value = 0
+
+
 class FlowTrackedSwitch(EventMixin):
     """Class used to manage statistics querying and processing for a single OpenFlow switch.
 
@@ -144,6 +494,19 @@ class FlowTrackedSwitch(EventMixin):
         self.flow_total_average_bandwidth_Mbps = {} # This map stores the total estimated bandwidth on a per port basis
         self.flow_average_switch_load = 0
 
+        # Compact flow tracking state (only used if flow_tracker.flow_topk > 0). Maps are keyed by port number, and store
+        # the estimated bandwidth of flows which are not exactly tracked on the port.
+        self.flow_tail_sketch = {}
+        self.flow_tail_bandwidth_Mbps = {}
+
+        # Maximum average bandwidth of each flow across all tracked ports on this switch, keyed by flow cookie
+        self.flow_max_bandwidth_Mbps = {}
+        # Forecast tuple (see BandwidthEstimator.forecast()) with the largest forecast of each flow across all tracked ports
+        # on this switch, keyed by flow cookie (only maintained if forecasting is enabled)
+        self.flow_max_forecast = {}
+        # Number of (port, flow cookie) entries in flow_average_bandwidth_Mbps
+        self.num_tracked_flow_entries = 0
+
         # Port maps record reception statistics based on PortStats queries
         # Maps are keyed by port number
         # Byte/bandwidth counts are only recorded on a per port basis
@@ -153,6 +516,11 @@ class FlowTrackedSwitch(EventMixin):
         self.port_average_bandwidth_Mbps = {}
         self.port_average_switch_load = 0
 
+        # Predictive bandwidth estimators (None if no estimator is configured). Port estimators are keyed by port number,
+        # flow estimators are stored in a map keyed by port number, and each is keyed by flow cookie.
+        self.port_estimator = self.flow_tracker.create_bandwidth_estimator()
+        self.flow_estimators = {}
+
         self._periodic_query_timer = None
 
     def __repr__(self):
@@ -205,6 +573,7 @@ class FlowTrackedSwitch(EventMixin):
         """
         self.tracked_ports = tracked_ports
         log.debug('Switch ' + dpid_to_str(self.dpid) + ' set tracked ports: ' + str(tracked_ports))
+        self.flow_tracker.remove_link_congestion_state(self.dpid, tracked_ports)
         # Delete any stored state on ports which are no longer tracked
         keys_to_del = []
         for port_no in self.flow_interval_byte_count:
@@ -212,6 +581,7 @@ class FlowTrackedSwitch(EventMixin):
                 keys_to_del.append(port_no)
 
         for key in keys_to_del:
+            self.flow_tracker.remove_time_series(self.dpid, key, self.flow_average_bandwidth_Mbps[key].keys(), True)
             del self.flow_total_byte_count[key]
             del self.flow_interval_byte_count[key]
             del self.flow_interval_bandwidth_Mbps[key]
@@ -222,6 +592,99 @@ class FlowTrackedSwitch(EventMixin):
             del self.port_interval_bandwidth_Mbps[key]
             del self.port_average_bandwidth_Mbps[key]
 
+            if key in self.flow_estimators:
+                del self.flow_estimators[key]
+            if self.port_estimator is not None:
+                self.port_estimator.remove([key])
+            if key in self.flow_tail_sketch:
+                del self.flow_tail_sketch[key]
+                del self.flow_tail_bandwidth_Mbps[key]
+
+        if keys_to_del:
+            self.update_flow_max_bandwidth()
+
+    def update_flow_max_bandwidth(self):
+        """Recalculates the maximum average bandwidth (and maximum forecast, if forecasting is enabled) of each flow on this
+        switch, and updates the FlowTracker's global indexes of maximum flow utilizations and forecasts and count of
+        tracked flow entries."""
+        flow_max_bandwidth_Mbps = {}
+        num_tracked_flow_entries = 0
+        for port_num in self.flow_average_bandwidth_Mbps:
+            num_tracked_flow_entries += len(self.flow_average_bandwidth_Mbps[port_num])
+            for flow_cookie, flow_bw in self.flow_average_bandwidth_Mbps[port_num].iteritems():
+                if flow_bw > flow_max_bandwidth_Mbps.get(flow_cookie, -1):
+                    flow_max_bandwidth_Mbps[flow_cookie] = flow_bw
+        self.flow_tracker.update_flow_max_index(self.dpid, self.flow_max_bandwidth_Mbps, flow_max_bandwidth_Mbps)
+        self.flow_max_bandwidth_Mbps = flow_max_bandwidth_Mbps
+
+        if self.port_estimator is not None:
+            flow_max_forecast = {}
+            for flow_estimator in self.flow_estimators.itervalues():
+                for flow_cookie, forecast in flow_estimator.get_forecasts().iteritems():
+                    if flow_cookie not in flow_max_forecast or forecast[0] > flow_max_forecast[flow_cookie][0]:
+                        flow_max_forecast[flow_cookie] = forecast
+            self.flow_tracker.update_flow_max_forecast_index(self.dpid, self.flow_max_forecast, flow_max_forecast)
+            self.flow_max_forecast = flow_max_forecast
+        self.flow_tracker.update_tracked_flow_entries(num_tracked_flow_entries - self.num_tracked_flow_entries)
+        self.num_tracked_flow_entries = num_tracked_flow_entries
+
+    def compact_flow_byte_counts(self, curr_event_byte_count, curr_event_rate_Mbps):
+        """Restricts exact flow tracking to the flow_tracker.flow_topk largest flows on each port.
+
+        Flows which are already exactly tracked are ranked by their average bandwidth, and all other flows are ranked by
+        their lifetime average rate. The highest ranked flows are retained in curr_event_byte_count, and all other flows
+        are removed from curr_event_byte_count (causing their exact state to be discarded) and added to the port's
+        Count-Min sketch. Newly promoted flows have their byte counters and averages seeded from their lifetime rate, so
+        that they do not report their entire byte count as a single interval.
+
+        * curr_event_byte_count: Map of cumulative byte counts reported in this FlowStats response, keyed by port number
+          and flow cookie
+        * curr_event_rate_Mbps: Map of lifetime average rates (in Mbps) reported in this FlowStats response, keyed by port
+          number and flow cookie
+        """
+        flow_topk = self.flow_tracker.flow_topk
+        for port_num in self.flow_tail_sketch:
+            if port_num not in curr_event_byte_count:
+                self.flow_tail_sketch[port_num].clear()
+                self.flow_tail_bandwidth_Mbps[port_num] = 0
+
+        for port_num in curr_event_byte_count:
+            if port_num not in self.flow_tail_sketch:
+                self.flow_tail_sketch[port_num] = CountMinSketch(self.flow_tracker.flow_sketch_width,
+                        self.flow_tracker.flow_sketch_depth)
+            else:
+                self.flow_tail_sketch[port_num].clear()
+            self.flow_tail_bandwidth_Mbps[port_num] = 0
+
+            port_byte_counts = curr_event_byte_count[port_num]
+            tracked_flows = self.flow_total_byte_count.setdefault(port_num, {})
+            average_flows = self.flow_average_bandwidth_Mbps.setdefault(port_num, {})
+            if len(port_byte_counts) <= flow_topk:
+                # All reported flows fit in the exactly tracked set, only newly appearing flows need to be seeded
+                ranked_flows = [(curr_event_rate_Mbps[port_num][flow_cookie], flow_cookie) for flow_cookie in port_byte_counts
+                        if flow_cookie not in tracked_flows]
+            else:
+                ranked_flows = []
+                for flow_cookie in port_byte_counts:
+                    if flow_cookie in tracked_flows and flow_cookie in average_flows:
+                        ranked_flows.append((average_flows[flow_cookie], flow_cookie))
+                    else:
+                        ranked_flows.append((curr_event_rate_Mbps[port_num][flow_cookie], flow_cookie))
+                ranked_flows.sort(reverse=True)
+
+                for flow_rate, flow_cookie in ranked_flows[flow_topk:]:
+                    del port_byte_counts[flow_cookie]
+                    self.flow_tail_sketch[port_num].add(flow_cookie, flow_rate)
+                    self.flow_tail_bandwidth_Mbps[port_num] += flow_rate
+
+            for flow_rate, flow_cookie in ranked_flows[:flow_topk]:
+                if flow_cookie not in tracked_flows:
+                    seeded_bytes = (flow_rate * 1048576.0 / 8.0) * self.flow_tracker.periodic_query_interval_seconds
+                    tracked_flows[flow_cookie] = max(0, port_byte_counts[flow_cookie] - int(seeded_bytes))
+                    self.flow_interval_byte_count.setdefault(port_num, {})
+                    self.flow_interval_bandwidth_Mbps.setdefault(port_num, {})[flow_cookie] = flow_rate
+                    average_flows[flow_cookie] = flow_rate
+
     def launch_stats_query(self):
         """Sends an OpenFlow FlowStatsRequest and PortStatsRequest to the switch associated with this object."""
         if self.is_connected:
@@ -318,7 +781,7 @@ class FlowTrackedSwitch(EventMixin):
             # Update instant bandwidth - Note that this is capped at 5% above the link's maximum supported bandwidth
             self.port_interval_bandwidth_Mbps[port_num] = min(((self.port_interval_byte_count[
                                                             port_num] * 8.0) / 1048576.0) / (interval_len),
-                                                            self.flow_tracker.link_max_bw * 1.05)
+                                                            self.flow_tracker.get_link_capacity(self.dpid, port_num) * 1.05)
             # Update running average bandwidth
             if port_num in self.port_average_bandwidth_Mbps:
                 self.port_average_bandwidth_Mbps[port_num] = (self.flow_tracker.avg_smooth_factor *
@@ -328,6 +791,13 @@ class FlowTrackedSwitch(EventMixin):
             else:
                 self.port_average_bandwidth_Mbps[port_num] = self.port_interval_bandwidth_Mbps[port_num]
 
+        if self.port_estimator is not None:
+            valid_port_bandwidths = {}
+            for port_num in self.port_interval_byte_count:
+                if port_num not in invalid_stat_ports:
+                    valid_port_bandwidths[port_num] = self.port_interval_bandwidth_Mbps[port_num]
+            self.port_estimator.update(valid_port_bandwidths, prune=False)
+
         port_average_switch_load = 0
         for port_num in self.port_average_bandwidth_Mbps:
             port_average_switch_load += self.port_average_bandwidth_Mbps[port_num]
@@ -356,25 +826,23 @@ class FlowTrackedSwitch(EventMixin):
                         self.port_average_bandwidth_Mbps[port_num]) + '\n')
                 
                 if PORT_STATS_GENERATE_LINK_EVENTS:
-                    if(self.port_average_bandwidth_Mbps[port_num] >= (self.flow_tracker.link_cong_threshold)):
-                        # Generate an event if the link is congested
-                        # First, get the switch on the other side of this link
-                        send_switch_dpid = None
-                        send_port = None
-                        for link in core.openflow_discovery.adjacency:
-                            if link.dpid1 == self.dpid and link.port1 == port_num:
-                                send_switch_dpid = link.dpid2
-                                send_port = link.port2
-                                break
-                                
-                        if send_switch_dpid is None or send_port is None:
-                            continue
+                    # Generate an event if the link is congested
+                    # First, get the switch on the other side of this link
+                    send_switch_dpid = None
+                    send_port = None
+                    for link in core.openflow_discovery.adjacency:
+                        if link.dpid1 == self.dpid and link.port1 == port_num:
+                            send_switch_dpid = link.dpid2
+                            send_port = link.port2
+                            break
                             
-                        log.debug('PortStats: Congested link detected! SendSw: ' + dpid_to_str(send_switch_dpid) + ' Port: ' + str(send_port))
-                        event = LinkUtilizationEvent(send_switch_dpid, send_port, self.flow_tracker.link_cong_threshold,
-                                self.port_average_bandwidth_Mbps[port_num], LinkUtilizationEvent.PORT_STATS,
-                                self.flow_tracker.switches[send_switch_dpid].flow_average_bandwidth_Mbps[port_num])
-                        self.flow_tracker.raiseEvent(event)
+                    if send_switch_dpid is None or send_port is None or send_switch_dpid not in self.flow_tracker.switches:
+                        continue
+                        
+                    self.flow_tracker.process_link_utilization(send_switch_dpid, send_port,
+                            self.port_average_bandwidth_Mbps[port_num], LinkUtilizationEvent.PORT_STATS,
+                            self.flow_tracker.switches[send_switch_dpid].flow_average_bandwidth_Mbps.get(send_port, {}),
+                            reception_time)
 
             self.flow_tracker._log_file.write('\n')
 
@@ -411,6 +879,8 @@ class FlowTrackedSwitch(EventMixin):
             num_flows[port_num] = 0
 
         curr_event_byte_count = {}
+        curr_event_rate_Mbps = {}   # Only populated when compact flow tracking is enabled
+        compact_tracking = self.flow_tracker.flow_topk > 0
 
         # Check for new ports on the switch
         ports = self.connection.features.ports
@@ -446,6 +916,17 @@ class FlowTrackedSwitch(EventMixin):
                             curr_event_byte_count[action.port] = {}
                             curr_event_byte_count[action.port][flow_stat.cookie] = flow_stat.byte_count
 
+                        if compact_tracking:
+                            flow_duration = flow_stat.duration_sec + (flow_stat.duration_nsec / 1000000000.0)
+                            flow_rate = 0
+                            if flow_duration > 0:
+                                flow_rate = ((flow_stat.byte_count * 8.0) / 1048576.0) / flow_duration
+                            port_rates = curr_event_rate_Mbps.setdefault(action.port, {})
+                            port_rates[flow_stat.cookie] = port_rates.get(flow_stat.cookie, 0) + flow_rate
+
+        if compact_tracking:
+            self.compact_flow_byte_counts(curr_event_byte_count, curr_event_rate_Mbps)
+
         # Determine the number of new bytes that appeared this interval
         negative_byte_count = False
         for port_num in curr_event_byte_count:
@@ -497,6 +978,7 @@ class FlowTrackedSwitch(EventMixin):
                 del self.flow_interval_bandwidth_Mbps[removal[0]][removal[1]]
             if removal[1] in self.flow_average_bandwidth_Mbps[removal[0]]:
                 del self.flow_average_bandwidth_Mbps[removal[0]][removal[1]]
+            self.flow_tracker.remove_time_series(self.dpid, removal[0], [removal[1]])
 
         # Skip further processing if this was the first measurement interval, or if the measurement interval had an unreasonable duration
         if negative_byte_count or self._last_flow_stats_query_response_time is None:
@@ -523,7 +1005,7 @@ class FlowTrackedSwitch(EventMixin):
                 # Update instant bandwidth - Note that this is capped at 5% above the link's maximum supported bandwidth
                 self.flow_interval_bandwidth_Mbps[port_num][flow_cookie] = \
                         min(((self.flow_interval_byte_count[port_num][flow_cookie] * 8.0) / 1048576.0) / (interval_len),
-                        self.flow_tracker.link_max_bw * 1.05)
+                        self.flow_tracker.get_link_capacity(self.dpid, port_num) * 1.05)
                         
                 # Update running average bandwidth
                 self.flow_average_bandwidth_Mbps[port_num][flow_cookie] = \
@@ -536,13 +1018,22 @@ class FlowTrackedSwitch(EventMixin):
                             + 'on \n\tSwitch: ' + dpid_to_str(self.dpid) + ' Port: ' + str(port_num) + ' Flow Cookie: ' + str(flow_cookie)
                             + '\n\tInterval Len: ' + str(interval_len))
             
-            self.flow_total_average_bandwidth_Mbps[port_num] = sum(self.flow_average_bandwidth_Mbps[port_num].itervalues())
+            self.flow_total_average_bandwidth_Mbps[port_num] = sum(self.flow_average_bandwidth_Mbps[port_num].itervalues()) \
+                    + self.flow_tail_bandwidth_Mbps.get(port_num, 0)
+
+            if self.port_estimator is not None:
+                if port_num not in self.flow_estimators:
+                    self.flow_estimators[port_num] = self.flow_tracker.create_bandwidth_estimator()
+                self.flow_estimators[port_num].update(self.flow_interval_bandwidth_Mbps[port_num])
 
         flow_average_switch_load = 0
         for port_num in self.flow_average_bandwidth_Mbps:
             for flow_cookie in self.flow_average_bandwidth_Mbps[port_num]:
                 flow_average_switch_load += self.flow_average_bandwidth_Mbps[port_num][flow_cookie]
+        for port_num in self.flow_tail_bandwidth_Mbps:
+            flow_average_switch_load += self.flow_tail_bandwidth_Mbps[port_num]
         self.flow_average_switch_load = flow_average_switch_load
+        self.update_flow_max_bandwidth()
 
         # Update last response time
         complete_processing_time = time.time()
@@ -570,14 +1061,15 @@ class FlowTrackedSwitch(EventMixin):
                             self.flow_average_bandwidth_Mbps[port_num][flow_cookie]) + '\n')
                 
                 link_util_Mbps = self.flow_tracker.get_link_utilization_mbps(self.dpid, port_num)
+                self.flow_tracker.record_time_series_samples(self.dpid, port_num, reception_time, link_util_Mbps,
+                        self.flow_average_bandwidth_Mbps[port_num])
+
                 # Generate an event if the link is congested
-                if link_util_Mbps >= self.flow_tracker.link_cong_threshold:
-                    event = LinkUtilizationEvent(self.dpid, port_num, self.flow_tracker.link_cong_threshold,
-                            link_util_Mbps, LinkUtilizationEvent.FLOW_STATS, self.flow_average_bandwidth_Mbps[port_num])
-                    self.flow_tracker.raiseEvent(event)
+                self.flow_tracker.process_link_utilization(self.dpid, port_num, link_util_Mbps,
+                        LinkUtilizationEvent.FLOW_STATS, self.flow_average_bandwidth_Mbps[port_num], reception_time)
                 
                 # Log to console if a link is fully utilized
-                if link_util_Mbps >= self.flow_tracker.link_max_bw:
+                if link_util_Mbps >= self.flow_tracker.get_link_capacity(self.dpid, port_num):
                     # Get the DPID of the switch on the other side of the link
                     receive_switch_dpid = None
                     for link in core.openflow_discovery.adjacency:
@@ -603,10 +1095,17 @@ class FlowTracker(EventMixin):
     _core_name = "openflow_flow_tracker"
     
     _eventMixin_events = set([
-        LinkUtilizationEvent
+        LinkUtilizationEvent,
+        NetworkCongestionEvent
     ])
 
-    def __init__(self, query_interval, link_max_bw, link_cong_threshold, avg_smooth_factor, log_peak_usage):
+    def __init__(self, query_interval, link_max_bw, link_cong_threshold, avg_smooth_factor, log_peak_usage,
+            timeseries_len=TIME_SERIES_MAX_SAMPLES, timeseries_export=False, link_capacity_file=None,
+            link_capacity_from_features=False, link_cong_clear_threshold=None, cong_event_suppression=0,
+            coalesce_cong_events=False, bw_estimator='none', forecast_horizon=FORECAST_HORIZON,
+            holt_trend_factor=HOLT_TREND_SMOOTHING_FACTOR, kalman_process_var=KALMAN_PROCESS_VARIANCE,
+            kalman_measurement_var=KALMAN_MEASUREMENT_VARIANCE, forecast_confidence_z=FORECAST_CONFIDENCE_Z,
+            flow_topk=FLOW_TOP_K, flow_sketch_width=FLOW_SKETCH_WIDTH, flow_sketch_depth=FLOW_SKETCH_DEPTH):
         """Initializes the FlowTracker module, and configures all required listeners once dependencies have loaded."""
         # Listen to dependencies
         def startup():
@@ -620,16 +1119,52 @@ class FlowTracker(EventMixin):
 
         self._got_first_connection = False  # Flag used to start the periodic query thread when the first ConnectionUp is received
         self._peak_usage_output_timer = None
+        self._cong_event_timer = None
 
         self.periodic_query_interval_seconds = float(query_interval)
         self.link_max_bw = float(link_max_bw)
         self.link_cong_threshold = float(link_cong_threshold)
         self.avg_smooth_factor = float(avg_smooth_factor)
         self.log_peak_usage = float(log_peak_usage)
+        if link_cong_clear_threshold is None:
+            self.link_cong_clear_threshold = self.link_cong_threshold
+        else:
+            self.link_cong_clear_threshold = float(link_cong_clear_threshold)
+        if self.link_cong_clear_threshold > self.link_cong_threshold:
+            log.warn('LinkCongClearThreshold is greater than LinkCongThreshold, using LinkCongThreshold.')
+            self.link_cong_clear_threshold = self.link_cong_threshold
+        self.cong_event_suppression = float(cong_event_suppression)
+        self.coalesce_cong_events = coalesce_cong_events
+        self.bw_estimator = str(bw_estimator)
+        if self.bw_estimator not in ('none', 'holt', 'kalman'):
+            log.warn('Unrecognized bandwidth estimator: ' + self.bw_estimator + ', disabling bandwidth forecasts.')
+            self.bw_estimator = 'none'
+        if self.bw_estimator != 'none' and np is None:
+            log.warn('NumPy is not available, disabling bandwidth forecasts.')
+            self.bw_estimator = 'none'
+        self.forecast_horizon = float(forecast_horizon)
+        self.holt_trend_factor = float(holt_trend_factor)
+        self.kalman_process_var = float(kalman_process_var)
+        self.kalman_measurement_var = float(kalman_measurement_var)
+        self.forecast_confidence_z = float(forecast_confidence_z)
+        self.flow_topk = int(flow_topk)
+        self.flow_sketch_width = int(flow_sketch_width)
+        self.flow_sketch_depth = int(flow_sketch_depth)
+        self.timeseries_len = int(timeseries_len)
+        self.timeseries_export = timeseries_export
+        if self.timeseries_export and np is None:
+            log.warn('NumPy is not available, time series will not be exported.')
+            self.timeseries_export = False
 
         log.info('Set QueryInterval:' + str(self.periodic_query_interval_seconds) + ' LinkMaxBw:' + str(
             self.link_max_bw) + 'Mbps LinkCongThreshold:' + str(self.link_cong_threshold)
-                 + 'Mbps AvgSmoothFactor:' + str(self.avg_smooth_factor) + ' LogPeakUsage:' + str(self.log_peak_usage))
+                 + 'Mbps AvgSmoothFactor:' + str(self.avg_smooth_factor) + ' LogPeakUsage:' + str(self.log_peak_usage)
+                 + ' TimeSeriesLen:' + str(self.timeseries_len) + ' TimeSeriesExport:' + str(self.timeseries_export))
+        log.info('Set LinkCongClearThreshold:' + str(self.link_cong_clear_threshold) + 'Mbps CongEventSuppression:'
+                 + str(self.cong_event_suppression) + ' CoalesceCongEvents:' + str(self.coalesce_cong_events))
+        log.info('Set BwEstimator:' + self.bw_estimator + ' ForecastHorizon:' + str(self.forecast_horizon))
+        log.info('Set FlowTopK:' + str(self.flow_topk) + ' FlowSketchWidth:' + str(self.flow_sketch_width)
+                 + ' FlowSketchDepth:' + str(self.flow_sketch_depth))
 
         self._module_init_time = 0
         self._log_file = None
@@ -638,6 +1173,40 @@ class FlowTracker(EventMixin):
         # Map is keyed by dpid
         self.switches = {}
 
+        # Per-link capacities (in Mbps), keyed by (dpid, output_port). Links without an entry use self.link_max_bw
+        self.link_capacity_mbps = {}
+        self.link_capacity_from_features = link_capacity_from_features
+        # Capacities read from a topology file, keyed by (dpid1, dpid2). These are resolved to port numbers as adjacencies
+        # are learned.
+        self._link_capacity_by_dpid_pair = {}
+        if link_capacity_file is not None:
+            self.load_link_capacity_file(link_capacity_file)
+
+        # Links currently considered congested, keyed by (dpid, output_port). Values store the time at which the last
+        # congestion event was generated for the link (or None if no event has been generated yet).
+        self._congested_links = {}
+        # LinkUtilizationEvents waiting to be delivered in the next NetworkCongestionEvent, keyed by (dpid, output_port)
+        self._pending_cong_link_events = {}
+        self.num_link_util_events_raised = 0
+        self.num_network_cong_events_raised = 0
+        self.num_cong_events_suppressed = 0
+
+        # Global index of maximum flow utilizations. _flow_max_by_switch maps flow cookie -> {dpid: max Mbps on switch}, and
+        # _flow_max_util maps flow cookie -> max Mbps across all switches.
+        self._flow_max_by_switch = {}
+        self._flow_max_util = {}
+        # Global index of maximum flow forecasts (only maintained if forecasting is enabled), in the same form with forecast
+        # tuples (see BandwidthEstimator.forecast()) in place of Mbps values, ordered by their forecast value.
+        self._flow_max_forecast_by_switch = {}
+        self._flow_max_forecast = {}
+        # Number of exactly tracked (switch, port, flow cookie) entries across all switches, and its peak value
+        self.num_tracked_flow_entries = 0
+        self.peak_tracked_flow_entries = 0
+
+        # Utilization time series, keyed by (dpid, output_port) for links and (dpid, output_port, flow_cookie) for flows
+        self.link_util_series = {}
+        self.flow_util_series = {}
+
         # Setup listeners
         core.call_when_ready(startup, ('openflow', 'openflow_igmp_manager', 'openflow_discovery'))
 
@@ -646,21 +1215,271 @@ class FlowTracker(EventMixin):
 
         This function is typically called by the BenchmarkTerminator module.
         """
+        log.info('LinkUtilizationEvents raised: ' + str(self.num_link_util_events_raised) + ' NetworkCongestionEvents raised: '
+                + str(self.num_network_cong_events_raised) + ' Congestion events suppressed: ' + str(self.num_cong_events_suppressed))
         if not self._log_file is None:
-            # Write out the final topology of the network
-            self._log_file.flush()
-            self._log_file.write('Final Network Topology:\n')
+            self._log_file.write('CongestionEvents LinkUtilizationEvents:' + str(self.num_link_util_events_raised)
+                    + ' NetworkCongestionEvents:' + str(self.num_network_cong_events_raised) + ' Suppressed:'
+                    + str(self.num_cong_events_suppressed) + '\n')
+            self._log_file.write('FlowTracking TopK:' + str(self.flow_topk) + ' PeakTrackedFlowEntries:'
+                    + str(self.peak_tracked_flow_entries) + '\n\n')
+            # Write out the final topology of the network. The receive side of each link is read directly from the
+            # adjacency entry, rather than through get_link_utilization_normalized() (which scans the adjacency map).
+            topology_lines = ['Final Network Topology:\n']
             for link in core.openflow_discovery.adjacency:
                 if link.dpid1 in self.switches and link.port1 in self.switches[link.dpid1].tracked_ports:
-                    self._log_file.write(str(link.dpid1) + ' P:' + str(link.port1) + ' -> ' + str(link.dpid2) 
-                            + ' P:' + str(link.port2) + ' U:' + str(self.get_link_utilization_normalized(link.dpid1, link.port1))
+                    link_util_mbps = 0
+                    if link.dpid2 in self.switches:
+                        link_util_mbps = self.switches[link.dpid2].port_average_bandwidth_Mbps.get(link.port2, 0)
+                    topology_lines.append(str(link.dpid1) + ' P:' + str(link.port1) + ' -> ' + str(link.dpid2)
+                            + ' P:' + str(link.port2) + ' U:' + str(link_util_mbps / self.get_link_capacity(link.dpid1, link.port1))
                             + ' NF:' + str(self.switches[link.dpid1].num_flows[link.port1]) + '\n')
+            self._log_file.write(''.join(topology_lines))
+            self._log_file.flush()
+            os.fsync(self._log_file.fileno())
             self._log_file.close()
             self._log_file = None
             log.info('Termination signalled, closed log file: ' + str(self._log_file_name))
 
-    def output_peak_usage(self):
-        """Outputs the current peak utilization and average link utilization to log.info"""
+            if self.timeseries_export:
+                self.export_time_series(self._log_file_name[:-len('.txt')] + '.npz')
+
+    def create_bandwidth_estimator(self):
+        """Returns a new BandwidthEstimator of the type configured by bw_estimator, or None if forecasting is disabled."""
+        if self.bw_estimator == 'holt':
+            return HoltEstimator(self.forecast_horizon, self.forecast_confidence_z, self.avg_smooth_factor,
+                    self.holt_trend_factor)
+        if self.bw_estimator == 'kalman':
+            return KalmanEstimator(self.forecast_horizon, self.forecast_confidence_z, self.kalman_process_var,
+                    self.kalman_measurement_var)
+        return None
+
+    def get_link_cong_clear_threshold(self, switch_dpid, output_port):
+        """Returns the utilization (in Mbps) below which the specified link should no longer be considered congested."""
+        return self.link_cong_clear_threshold * (self.get_link_capacity(switch_dpid, output_port) / self.link_max_bw)
+
+    def process_link_utilization(self, switch_dpid, output_port, link_util_mbps, stats_type, flow_map, sample_time):
+        """Updates the congestion state of a link with a new utilization estimate, and generates a congestion event if required.
+
+        A link becomes congested when its utilization reaches the link's congestion threshold, and remains congested until
+        its utilization falls below the link's congestion clear threshold. While a link remains congested, congestion events
+        are generated at most once per cong_event_suppression seconds. Events are either raised immediately as
+        LinkUtilizationEvents, or queued for the next NetworkCongestionEvent if coalesce_cong_events is set.
+
+        * switch_dpid: The dataplane identifier of the switch on the transmitting side of the link
+        * output_port: The output port on switch with dpid switch_dpid corresponding to the link
+        * link_util_mbps: The estimated utilization of the link (in Mbps)
+        * stats_type: One of LinkUtilizationEvent.FLOW_STATS or LinkUtilizationEvent.PORT_STATS
+        * flow_map: A map of estimated flow utilizations (in Mbps) on the link, keyed by flow cookie
+        * sample_time: The time at which the statistics were received
+        """
+        link_key = (switch_dpid, output_port)
+        if link_key in self._congested_links:
+            if link_util_mbps < self.get_link_cong_clear_threshold(switch_dpid, output_port):
+                log.debug('Congestion cleared on Switch: ' + dpid_to_str(switch_dpid) + ' Port: ' + str(output_port))
+                del self._congested_links[link_key]
+                return
+        elif link_util_mbps >= self.get_link_cong_threshold(switch_dpid, output_port):
+            self._congested_links[link_key] = None
+        else:
+            return
+
+        last_event_time = self._congested_links[link_key]
+        if last_event_time is not None and sample_time - last_event_time < self.cong_event_suppression:
+            self.num_cong_events_suppressed += 1
+            return
+
+        self._congested_links[link_key] = sample_time
+        event = LinkUtilizationEvent(switch_dpid, output_port, self.get_link_cong_threshold(switch_dpid, output_port),
+                link_util_mbps, stats_type, dict(flow_map))
+        if self.coalesce_cong_events:
+            self._pending_cong_link_events[link_key] = event
+        else:
+            self.num_link_util_events_raised += 1
+            self.raiseEvent(event)
+
+    def remove_link_congestion_state(self, switch_dpid, tracked_ports=None):
+        """Removes the congestion state (and any queued congestion events) of links transmitting from the specified switch,
+        so that links which have gone away are not reported in later NetworkCongestionEvents.
+
+        * switch_dpid: The dataplane identifier of the switch on the transmitting side of the links
+        * tracked_ports: If specified, only the state of links on output ports not in this list is removed
+        """
+        for link_state in (self._congested_links, self._pending_cong_link_events):
+            stale_links = [link_key for link_key in link_state if link_key[0] == switch_dpid
+                    and (tracked_ports is None or link_key[1] not in tracked_ports)]
+            for link_key in stale_links:
+                del link_state[link_key]
+
+    def raise_network_congestion_event(self):
+        """Raises a NetworkCongestionEvent listing all congested links queued since the last call, if any.
+
+        This is called once per query interval when coalesce_cong_events is set.
+        """
+        if not self._pending_cong_link_events:
+            return
+
+        link_events = self._pending_cong_link_events.values()
+        self._pending_cong_link_events = {}
+        log.debug('Raising NetworkCongestionEvent for ' + str(len(link_events)) + ' congested links')
+        self.num_network_cong_events_raised += 1
+        self.raiseEvent(NetworkCongestionEvent(link_events))
+
+    def set_link_capacity(self, switch_dpid, output_port, capacity_mbps):
+        """Sets the capacity (in Mbps) of the link on the specified switch and output port.
+
+        * switch_dpid: The dataplane identifier of the switch on the transmitting side of the link
+        * output_port: The output port on switch with dpid switch_dpid corresponding to the link
+        * capacity_mbps: The maximum bandwidth of the link (in Mbps)
+        """
+        self.link_capacity_mbps[(switch_dpid, output_port)] = float(capacity_mbps)
+        log.debug('Set link capacity Switch: ' + dpid_to_str(switch_dpid) + ' Port: ' + str(output_port) + ' Capacity: '
+                + str(capacity_mbps) + ' Mbps')
+
+    def get_link_capacity(self, switch_dpid, output_port):
+        """Returns the capacity (in Mbps) of the link on the specified switch and output port.
+
+        Returns link_max_bw if no capacity has been configured for the link.
+        """
+        return self.link_capacity_mbps.get((switch_dpid, output_port), self.link_max_bw)
+
+    def get_link_cong_threshold(self, switch_dpid, output_port):
+        """Returns the utilization (in Mbps) above which the specified link should be considered congested.
+
+        The configured link_cong_threshold is defined relative to link_max_bw, and is scaled by the capacity of the link.
+        """
+        return self.link_cong_threshold * (self.get_link_capacity(switch_dpid, output_port) / self.link_max_bw)
+
+    def load_link_capacity_file(self, file_path):
+        """Reads per-link capacities from the edges section of a BRITE topology file.
+
+        Capacities are applied in both directions of each edge once the associated adjacency is learned through a
+        MulticastTopoEvent.
+        """
+        topology_file = open(file_path, 'r')
+        in_edge_section = False
+        for line in topology_file:
+            if not in_edge_section:
+                if 'Edges:' in line:
+                    in_edge_section = True
+                continue
+
+            line = line.strip()
+            if not line:
+                break
+            line_split = line.split('\t')
+            node_id_1 = int(line_split[1])
+            node_id_2 = int(line_split[2])
+            bandwidth_Mbps = float(line_split[5])
+            self._link_capacity_by_dpid_pair[(node_id_1, node_id_2)] = bandwidth_Mbps
+            self._link_capacity_by_dpid_pair[(node_id_2, node_id_1)] = bandwidth_Mbps
+        topology_file.close()
+        log.info('Read ' + str(len(self._link_capacity_by_dpid_pair) / 2) + ' link capacities from file: ' + str(file_path))
+
+    def _set_link_capacities_from_features(self, connection):
+        """Sets link capacities for all ports on a switch from the current port speeds reported in its port features."""
+        for port in connection.features.ports:
+            if port.port_no == of.OFPP_LOCAL or port.port_no == of.OFPP_CONTROLLER:
+                continue
+            for feature_flag, speed_mbps in PORT_FEATURE_SPEEDS_MbPS:
+                if port.curr & feature_flag:
+                    self.set_link_capacity(connection.dpid, port.port_no, speed_mbps)
+                    break
+
+    def record_time_series_samples(self, switch_dpid, output_port, sample_time, link_util_mbps, flow_util_map):
+        """Appends link and per-flow utilization samples for a single link to the module's time series.
+
+        * switch_dpid: The dataplane identifier of the switch on the transmitting side of the link
+        * output_port: The output port on switch with dpid switch_dpid corresponding to the link
+        * sample_time: The time at which the statistics were received
+        * link_util_mbps: The estimated utilization of the link (in Mbps)
+        * flow_util_map: A map of estimated flow utilizations (in Mbps), keyed by flow cookie
+        """
+        if self.timeseries_len <= 0:
+            return
+
+        link_key = (switch_dpid, output_port)
+        if link_key not in self.link_util_series:
+            self.link_util_series[link_key] = UtilizationTimeSeries(self.timeseries_len)
+        self.link_util_series[link_key].add_sample(sample_time, link_util_mbps)
+
+        for flow_cookie in flow_util_map:
+            flow_key = (switch_dpid, output_port, flow_cookie)
+            if flow_key not in self.flow_util_series:
+                self.flow_util_series[flow_key] = UtilizationTimeSeries(self.timeseries_len)
+            self.flow_util_series[flow_key].add_sample(sample_time, flow_util_map[flow_cookie])
+
+    def remove_time_series(self, switch_dpid, output_port, flow_cookies, remove_link=False):
+        """Removes the utilization time series of flows which are no longer tracked on a link, so that series do not
+        accumulate for removed flows over long runs.
+
+        * switch_dpid: The dataplane identifier of the switch on the transmitting side of the link
+        * output_port: The output port on switch with dpid switch_dpid corresponding to the link
+        * flow_cookies: The flow cookies of the flows whose series should be removed
+        * remove_link: If True, the series of the link itself is also removed (i.e. the link is no longer tracked)
+        """
+        for flow_cookie in flow_cookies:
+            self.flow_util_series.pop((switch_dpid, output_port, flow_cookie), None)
+        if remove_link:
+            self.link_util_series.pop((switch_dpid, output_port), None)
+
+    def get_link_utilization_series(self, switch_dpid, output_port):
+        """Returns the UtilizationTimeSeries (in Mbps) for the specified link, or None if no samples have been recorded.
+
+        * switch_dpid: The dataplane identifier of the switch on the transmitting side of the link
+        * output_port: The output port on switch with dpid switch_dpid corresponding to the link
+        """
+        return self.link_util_series.get((switch_dpid, output_port))
+
+    def get_flow_utilization_series(self, switch_dpid, output_port, flow_cookie):
+        """Returns the UtilizationTimeSeries (in Mbps) for the specified flow on the specified link, or None if no samples have been recorded.
+
+        * switch_dpid: The dataplane identifier of the switch on the transmitting side of the link
+        * output_port: The output port on switch with dpid switch_dpid corresponding to the link
+        * flow_cookie: The flow cookie assigned to the flow of interest
+        """
+        return self.flow_util_series.get((switch_dpid, output_port, flow_cookie))
+
+    def export_time_series(self, file_path):
+        """Exports all recorded time series to a NumPy .npz file at the specified path.
+
+        The file contains one row per sample, stored in the following flat arrays:
+
+        * link_dpid, link_port, link_time, link_mbps: Link utilization samples
+        * flow_dpid, flow_port, flow_cookie, flow_time, flow_mbps: Per-flow utilization samples
+        """
+        if np is None:
+            log.warn('NumPy is not available, unable to export time series.')
+            return
+
+        link_dpid, link_port, link_time, link_mbps = [], [], [], []
+        for link_key in self.link_util_series:
+            for sample_time, util_mbps in self.link_util_series[link_key].get_samples():
+                link_dpid.append(link_key[0])
+                link_port.append(link_key[1])
+                link_time.append(sample_time)
+                link_mbps.append(util_mbps)
+
+        flow_dpid, flow_port, flow_cookie, flow_time, flow_mbps = [], [], [], [], []
+        for flow_key in self.flow_util_series:
+            for sample_time, util_mbps in self.flow_util_series[flow_key].get_samples():
+                flow_dpid.append(flow_key[0])
+                flow_port.append(flow_key[1])
+                flow_cookie.append(flow_key[2])
+                flow_time.append(sample_time)
+                flow_mbps.append(util_mbps)
+
+        np.savez(file_path,
+                link_dpid=np.array(link_dpid, dtype=np.uint64), link_port=np.array(link_port, dtype=np.uint16),
+                link_time=np.array(link_time, dtype=np.float64), link_mbps=np.array(link_mbps, dtype=np.float64),
+                flow_dpid=np.array(flow_dpid, dtype=np.uint64), flow_port=np.array(flow_port, dtype=np.uint16),
+                flow_cookie=np.array(flow_cookie, dtype=np.uint64), flow_time=np.array(flow_time, dtype=np.float64),
+                flow_mbps=np.array(flow_mbps, dtype=np.float64))
+        log.info('Exported flow tracker time series to file: ' + str(file_path))
+
+    def get_network_utilization(self):
+        """Returns a tuple of (peak link utilization, average link utilization, number of links) across all tracked links, with
+        utilizations in Mbps."""
         peak_usage = 0
         total_usage = 0
         num_links = 0
@@ -677,10 +1496,30 @@ class FlowTracker(EventMixin):
                 if util > peak_usage:
                     peak_usage = util
         
+        if num_links == 0:
+            return peak_usage, 0, num_links
+        return peak_usage, total_usage / float(num_links), num_links
+
+    def get_stats_network_times(self):
+        """Returns a list of the most recent port and flow statistics query network times (in seconds) of all connected
+        switches, i.e. the round trip time between sending each query and receiving the response."""
+        network_times = []
+        for switch in self.switches.itervalues():
+            if not switch.is_connected:
+                continue
+            if switch._last_port_stats_query_network_time is not None:
+                network_times.append(switch._last_port_stats_query_network_time)
+            if switch._last_flow_stats_query_network_time is not None:
+                network_times.append(switch._last_flow_stats_query_network_time)
+        return network_times
+
+    def output_peak_usage(self):
+        """Outputs the current peak utilization and average link utilization to log.info"""
+        peak_usage, avg_usage, num_links = self.get_network_utilization()
         cur_time = time.time()
         log.info('Network peak link throughput (Mbps): ' + str(peak_usage) + ' Time:' + str(cur_time))
         if num_links > 0:
-            log.info('Network avg link throughput (Mbps): ' + str(total_usage / float(num_links)) + ' Time:' + str(cur_time))
+            log.info('Network avg link throughput (Mbps): ' + str(avg_usage) + ' Time:' + str(cur_time))
 
     def _handle_ConnectionUp(self, event):
         """Handler for ConnectionUp from the discovery module, which represents a new switch joining the network."""
@@ -695,11 +1534,17 @@ class FlowTracker(EventMixin):
             log.debug('Restablished connection with switch: ' + dpid_to_str(event.dpid))
             self.switches[event.dpid].listen_on_connection(event.connection)
 
+        if self.link_capacity_from_features:
+            self._set_link_capacities_from_features(event.connection)
+
         if not self._got_first_connection:
             self._got_first_connection = True
             if self.log_peak_usage:
                 self._peak_usage_output_timer = Timer(self.periodic_query_interval_seconds / 1.5, self.output_peak_usage
                     , recurring=True)
+            if self.coalesce_cong_events:
+                self._cong_event_timer = Timer(self.periodic_query_interval_seconds, self.raise_network_congestion_event,
+                    recurring=True)
 
     def _handle_ConnectionDown(self, event):
         """Handler for ConnectionDown from the discovery module, which represents a switch leaving the network."""
@@ -709,6 +1554,7 @@ class FlowTracker(EventMixin):
         else:
             log.debug('Lost connection with switch: ' + dpid_to_str(event.dpid))
             switch.ignore_connection()
+        self.remove_link_congestion_state(event.dpid)
 
     def _handle_FlowStatsReceived(self, event):
         """Forwards the flow statistics contained in the FlowStats event to the appropriate FlowTrackedSwitch."""
@@ -728,6 +1574,9 @@ class FlowTracker(EventMixin):
                 for switch2 in event.adjacency_map[switch1]:
                     if event.adjacency_map[switch1][switch2] is not None:
                         tracked_ports.append(event.adjacency_map[switch1][switch2])
+                        if (switch1, switch2) in self._link_capacity_by_dpid_pair:
+                            self.set_link_capacity(switch1, event.adjacency_map[switch1][switch2],
+                                    self._link_capacity_by_dpid_pair[(switch1, switch2)])
                 self.switches[switch1].set_tracked_ports(tracked_ports)
 
     def get_link_utilization_mbps(self, switch_dpid, output_port):
@@ -739,13 +1588,7 @@ class FlowTracker(EventMixin):
         flow stats will be returned.
         """
         # First, get the switch on the other side of this link
-        receive_switch_dpid = None
-        receive_port = None
-        for link in core.openflow_discovery.adjacency:
-            if link.dpid1 == switch_dpid and link.port1 == output_port:
-                receive_switch_dpid = link.dpid2
-                receive_port = link.port2
-                break
+        receive_switch_dpid, receive_port = self.get_link_receive_port(switch_dpid, output_port)
 
         if receive_switch_dpid is None:
             # Reception statistics unavailable, use the transmission statistics if available
@@ -761,15 +1604,65 @@ class FlowTracker(EventMixin):
 
         return 0    # TODO: May want to throw exception here
 
+    def get_link_receive_port(self, switch_dpid, output_port):
+        """Returns a tuple of (receive_switch_dpid, receive_port) for the link on the specified switch and output port.
+
+        Returns (None, None) if the link is not known to the discovery module.
+        """
+        for link in core.openflow_discovery.adjacency:
+            if link.dpid1 == switch_dpid and link.port1 == output_port:
+                return (link.dpid2, link.port2)
+        return (None, None)
+
+    def get_link_utilization_forecast(self, switch_dpid, output_port):
+        """Returns a tuple of (forecast, lower_bound, upper_bound) utilizations (in Mbps) on the specified link.
+
+        Forecasts are produced by the configured bw_estimator for forecast_horizon query intervals ahead, using port stats
+        from the receive side of the link where available (in the same fashion as get_link_utilization_mbps()). If no
+        forecast is available, the current utilization estimate is returned as the forecast and both bounds.
+        """
+        receive_switch_dpid, receive_port = self.get_link_receive_port(switch_dpid, output_port)
+        if receive_switch_dpid in self.switches:
+            port_estimator = self.switches[receive_switch_dpid].port_estimator
+            if port_estimator is not None and receive_port in port_estimator:
+                return port_estimator.forecast(receive_port)
+
+        link_util_mbps = self.get_link_utilization_mbps(switch_dpid, output_port)
+        return (link_util_mbps, link_util_mbps, link_util_mbps)
+
+    def get_flow_utilization_forecast(self, switch_dpid, output_port, flow_cookie):
+        """Returns a tuple of (forecast, lower_bound, upper_bound) utilizations (in Mbps) for a flow on the specified link.
+
+        Returns None if no forecast is available for the specified flow.
+        """
+        if switch_dpid in self.switches:
+            flow_estimator = self.switches[switch_dpid].flow_estimators.get(output_port)
+            if flow_estimator is not None:
+                return flow_estimator.forecast(flow_cookie)
+        return None
+
+    def get_max_flow_utilization_forecast(self, flow_cookie):
+        """Returns a tuple of (forecast, lower_bound, upper_bound) utilizations (in Mbps) for the specified flow cookie,
+        taken from the tracked link with the largest forecast.
+
+        Forecasts are served from a global index maintained as FlowStats are processed. If no forecast is available, the
+        value returned by get_max_flow_utilization() is used for all three values.
+        """
+        if flow_cookie in self._flow_max_forecast:
+            return self._flow_max_forecast[flow_cookie]
+
+        max_util_mbps = self.get_max_flow_utilization(flow_cookie)
+        return (max_util_mbps, max_util_mbps, max_util_mbps)
+
     def get_link_utilization_normalized(self, switch_dpid, output_port):
         """Returns the current estimated utilization (as a normalized value between 0 and 1) on a particular link.
         
         * switch_dpid: The dataplane identifier of the switch on the transmitting side of the link
         * output_port: The output port on switch with dpid switch_dpid corresponding to the link
         
-        Note: Current implementation assumes all links have equal maximum bandwidth which is defined by self.link_max_bw
+        Utilization is normalized by the capacity of the link (see get_link_capacity()).
         """
-        return self.get_link_utilization_mbps(switch_dpid, output_port) / self.link_max_bw
+        return self.get_link_utilization_mbps(switch_dpid, output_port) / self.get_link_capacity(switch_dpid, output_port)
 
     def get_flow_utilization_normalized(self, switch_dpid, output_port, flow_cookie):
         """Returns the percentage of link utilization on a particular link contributed by a particular flow (as a normalized value between 0 and 1).
@@ -778,11 +1671,7 @@ class FlowTracker(EventMixin):
         * output_port: The output port on switch with dpid switch_dpid corresponding to the link
         * flow_cookie: The flow cookie assigned to the flow of interest
         """
-        flow_bw_usage = 0
-        if switch_dpid in self.switches:
-            if output_port in self.switches[switch_dpid].flow_average_bandwidth_Mbps:
-                if flow_cookie in self.switches[switch_dpid].flow_average_bandwidth_Mbps[output_port]:
-                    flow_bw_usage = self.switches[switch_dpid].flow_average_bandwidth_Mbps[output_port][flow_cookie]
+        flow_bw_usage = self.get_flow_utilization_mbps(switch_dpid, output_port, flow_cookie)
         
         total_link_bw_usage = 0
         if switch_dpid in self.switches:
@@ -794,16 +1683,94 @@ class FlowTracker(EventMixin):
         else:
             return flow_bw_usage / total_link_bw_usage
     
+    def get_flow_utilization_mbps(self, switch_dpid, output_port, flow_cookie):
+        """Returns the estimated utilization (in Mbps) on a particular link contributed by a particular flow.
+
+        If compact flow tracking is enabled and the flow is not exactly tracked on the link, the estimate is read from the
+        port's Count-Min sketch.
+
+        * switch_dpid: The dataplane identifier of the switch on the transmitting side of the link
+        * output_port: The output port on switch with dpid switch_dpid corresponding to the link
+        * flow_cookie: The flow cookie assigned to the flow of interest
+        """
+        if switch_dpid not in self.switches:
+            return 0
+        switch = self.switches[switch_dpid]
+        if output_port in switch.flow_average_bandwidth_Mbps:
+            if flow_cookie in switch.flow_average_bandwidth_Mbps[output_port]:
+                return switch.flow_average_bandwidth_Mbps[output_port][flow_cookie]
+        if output_port in switch.flow_tail_sketch:
+            return switch.flow_tail_sketch[output_port].estimate(flow_cookie)
+        return 0
+
+    def update_flow_max_index(self, switch_dpid, prev_flow_max_map, flow_max_map):
+        """Updates the global index of maximum flow utilizations with new per switch maximums.
+
+        * switch_dpid: The dataplane identifier of the switch reporting new maximums
+        * prev_flow_max_map: The map of maximum flow utilizations (in Mbps) previously reported by the switch, keyed by cookie
+        * flow_max_map: The new map of maximum flow utilizations (in Mbps) on the switch, keyed by cookie
+        """
+        self._update_max_index(self._flow_max_by_switch, self._flow_max_util, switch_dpid, prev_flow_max_map,
+                flow_max_map, lambda flow_util_mbps: flow_util_mbps)
+
+    def update_flow_max_forecast_index(self, switch_dpid, prev_flow_max_map, flow_max_map):
+        """Updates the global index of maximum flow forecasts with new per switch maximums.
+
+        * switch_dpid: The dataplane identifier of the switch reporting new maximums
+        * prev_flow_max_map: The map of maximum forecast tuples previously reported by the switch, keyed by cookie
+        * flow_max_map: The new map of maximum forecast tuples on the switch, keyed by cookie
+        """
+        self._update_max_index(self._flow_max_forecast_by_switch, self._flow_max_forecast, switch_dpid, prev_flow_max_map,
+                flow_max_map, lambda forecast: forecast[0])
+
+    def _update_max_index(self, max_by_switch, max_index, switch_dpid, prev_flow_max_map, flow_max_map, value_key):
+        """Updates a global index of per flow maximums (max_index, keyed by cookie) and its per switch values (max_by_switch,
+        keyed by cookie and then dpid) with new per switch maximums. Values are ordered by value_key(value)."""
+        for flow_cookie in prev_flow_max_map:
+            if flow_cookie not in flow_max_map:
+                switch_maxes = max_by_switch[flow_cookie]
+                del switch_maxes[switch_dpid]
+                if switch_maxes:
+                    max_index[flow_cookie] = max(switch_maxes.itervalues(), key = value_key)
+                else:
+                    del max_by_switch[flow_cookie]
+                    del max_index[flow_cookie]
+
+        for flow_cookie, flow_max in flow_max_map.iteritems():
+            if prev_flow_max_map.get(flow_cookie) == flow_max:
+                continue
+            switch_maxes = max_by_switch.setdefault(flow_cookie, {})
+            switch_maxes[switch_dpid] = flow_max
+            if flow_cookie not in max_index or value_key(flow_max) >= value_key(max_index[flow_cookie]):
+                max_index[flow_cookie] = flow_max
+            else:
+                max_index[flow_cookie] = max(switch_maxes.itervalues(), key = value_key)
+
+    def update_tracked_flow_entries(self, entry_delta):
+        """Adjusts the count of exactly tracked flow entries across all switches, and records its peak value.
+
+        * entry_delta: The change in the number of tracked flow entries on a single switch
+        """
+        self.num_tracked_flow_entries += entry_delta
+        if self.num_tracked_flow_entries > self.peak_tracked_flow_entries:
+            self.peak_tracked_flow_entries = self.num_tracked_flow_entries
+
     def get_max_flow_utilization(self, flow_cookie):
         """Returns the maximum estimated utilization (in Mbps) for the specified flow cookie across all tracked links in the network.
+
+        Exactly tracked flows are served from a global index maintained as FlowStats are processed. If compact flow tracking
+        is enabled and the flow is not exactly tracked on any link, the maximum Count-Min sketch estimate is returned.
         
         * flow_cookie: The flow cookie assigned to the flow of interest
         """
+        if flow_cookie in self._flow_max_util:
+            return self._flow_max_util[flow_cookie]
+
         max_util_mbps = 0
-        for switch_dpid in self.switches:
-            for output_port in self.switches[switch_dpid].flow_average_bandwidth_Mbps:
-                if flow_cookie in self.switches[switch_dpid].flow_average_bandwidth_Mbps[output_port]:
-                    flow_util_mbps = self.switches[switch_dpid].flow_average_bandwidth_Mbps[output_port][flow_cookie]
+        if self.flow_topk > 0:
+            for switch_dpid in self.switches:
+                for flow_sketch in self.switches[switch_dpid].flow_tail_sketch.itervalues():
+                    flow_util_mbps = flow_sketch.estimate(flow_cookie)
                     if flow_util_mbps > max_util_mbps:
                         max_util_mbps = flow_util_mbps
         
@@ -819,8 +1786,19 @@ class FlowTracker(EventMixin):
 
 def launch(query_interval=PERIODIC_QUERY_INTERVAL, link_max_bw=LINK_MAX_BANDWIDTH_MbPS,
            link_cong_threshold=LINK_CONGESTION_THRESHOLD_MbPS, avg_smooth_factor=AVERAGE_SMOOTHING_FACTOR,
-           log_peak_usage=False):
+           log_peak_usage=False, timeseries_len=TIME_SERIES_MAX_SAMPLES, timeseries_export=False,
+           link_capacity_file=None, link_capacity_from_features=False, link_cong_clear_threshold=None,
+           cong_event_suppression=0, coalesce_cong_events=False, bw_estimator='none', forecast_horizon=FORECAST_HORIZON,
+           holt_trend_factor=HOLT_TREND_SMOOTHING_FACTOR, kalman_process_var=KALMAN_PROCESS_VARIANCE,
+           kalman_measurement_var=KALMAN_MEASUREMENT_VARIANCE, forecast_confidence_z=FORECAST_CONFIDENCE_Z,
+           flow_topk=FLOW_TOP_K, flow_sketch_width=FLOW_SKETCH_WIDTH, flow_sketch_depth=FLOW_SKETCH_DEPTH):
     # Method called by the POX core when launching the module
+    if link_cong_clear_threshold is not None:
+        link_cong_clear_threshold = float(link_cong_clear_threshold)
     flow_tracker = FlowTracker(float(query_interval), float(link_max_bw), float(link_cong_threshold),
-        float(avg_smooth_factor), bool(log_peak_usage))
+        float(avg_smooth_factor), bool(log_peak_usage), int(timeseries_len), str(timeseries_export) == 'True',
+        link_capacity_file, str(link_capacity_from_features) == 'True', link_cong_clear_threshold,
+        float(cong_event_suppression), str(coalesce_cong_events) == 'True', str(bw_estimator), float(forecast_horizon),
+        float(holt_trend_factor), float(kalman_process_var), float(kalman_measurement_var), float(forecast_confidence_z),
+        int(flow_topk), int(flow_sketch_width), int(flow_sketch_depth))
     core.register('openflow_flow_tracker', flow_tracker)
\ No newline at end of file
@@ -41,13 +41,20 @@ The following command line arguments are supported:
   'periodic': Existing flows are periodically replaced.
   'cong_threshold': In this mode, flow replacement is triggered by the FlowTracker module reporting congestion on a link traversed by the flow.
   Upon receiving a LinkUtilizationEvent, the GroupFlow module will attempt to replace the largest flows traversing the link until the link is
-  brought back under its congestion threshold.
+  brought back under its congestion threshold. NetworkCongestionEvents are handled by processing each listed link in the same fashion.
   Default: 'none'
 * flow_replacement_interval: Determines the flow replacement interval in a mode specific fashion (always specified in seconds): 
   'none': Has no effect
   'periodic': Sets the periodic interval at which flows are replaced.
   'cong_threshold': Sets the minimum interval that must elapse after flow placement, before the flow can be replaced.
   Default: 10
+* util_estimate: Determines the utilization estimates used when calculating link weights. Supported options:
+  'current': The current (exponentially averaged) link and flow utilizations are used, and the utilization of the flow being
+  routed is doubled as a simple attempt to handle variability in flow rates.
+  'forecast': The bandwidth forecasts produced by the FlowTracker bw_estimator are used for both link and flow utilization.
+  'upper': The upper bounds of the FlowTracker bandwidth forecast confidence bands are used for both link and flow utilization.
+  Forecast modes fall back to current utilization on links and flows for which no forecast is available.
+  Default: 'current'
 
 Depends on openflow.igmp_manager, misc.groupflow_event_tracer (optional)
 
@@ -93,6 +100,11 @@ NO_FLOW_REPLACEMENT = 0
 PERIODIC_FLOW_REPLACEMENT = 1
 CONG_THRESHOLD_FLOW_REPLACEMENT = 2
 
+# Utilization estimates used for link weight calculation
+CURRENT_UTIL_ESTIMATE = 0
+FORECAST_UTIL_ESTIMATE = 1
+UPPER_BOUND_UTIL_ESTIMATE = 2
+
 # Developer constants
 # The below constants enable/configure experimental features which have not yet been integrated into the module API
 ENABLE_OUT_OF_ORDER_PACKET_DELIVERY = False
@@ -123,6 +135,7 @@ class MulticastPath(object):
         if not groupflow_trace_event is None:
             groupflow_trace_event.set_tree_calc_start_time(self.dst_mcast_address, self.src_ip)
         self._last_flow_replacement_time = time.time()
+        self.groupflow_manager.num_tree_calculations += 1
     
         self._calc_link_weights()
         
@@ -165,26 +178,55 @@ class MulticastPath(object):
         and a dynamic weight which is based on the current utilization (determined by
         groupflow_manager.utilization_link_weight). Setting groupflow_manager.utilization_link_weight to 0 will always
         results in shortest hop routing.
+
+        If groupflow_manager.util_estimate is FORECAST_UTIL_ESTIMATE or UPPER_BOUND_UTIL_ESTIMATE, the FlowTracker bandwidth
+        forecasts (or the upper bounds of their confidence bands) are used in place of the current utilization.
         """
         curr_topo_graph = self.groupflow_manager.topology_graph
         self.node_list = list(self.groupflow_manager.node_set)
         
         weighted_topo_graph = []
-        current_util = core.openflow_flow_tracker.get_max_flow_utilization(self.flow_cookie) / core.openflow_flow_tracker.link_max_bw
-        log.info('Current utilization of flow ' + str(self.flow_cookie) + ': ' + str(current_util * core.openflow_flow_tracker.link_max_bw) + ' Mbps')
+        util_estimate = self.groupflow_manager.util_estimate
+        if util_estimate == CURRENT_UTIL_ESTIMATE:
+            current_util_mbps = core.openflow_flow_tracker.get_max_flow_utilization(self.flow_cookie)
+            log.info('Current utilization of flow ' + str(self.flow_cookie) + ': ' + str(current_util_mbps) + ' Mbps')
+        else:
+            # Index into the (forecast, lower_bound, upper_bound) tuples returned by the FlowTracker
+            forecast_index = 0 if util_estimate == FORECAST_UTIL_ESTIMATE else 2
+            current_util_mbps = core.openflow_flow_tracker.get_max_flow_utilization_forecast(self.flow_cookie)[forecast_index]
+            log.info('Forecast utilization of flow ' + str(self.flow_cookie) + ': ' + str(current_util_mbps) + ' Mbps')
         
         for edge in curr_topo_graph:
             output_port = self.groupflow_manager.adjacency[edge[0]][edge[1]]
-            raw_link_util = core.openflow_flow_tracker.get_link_utilization_normalized(edge[0], output_port);
-            link_util_mcast_flow = core.openflow_flow_tracker.get_flow_utilization_normalized(edge[0], output_port, self.flow_cookie)
-            
-            link_util = max(0, (raw_link_util * (1 - link_util_mcast_flow)))
+            link_capacity = core.openflow_flow_tracker.get_link_capacity(edge[0], output_port)
+            current_util = current_util_mbps / link_capacity
             
-            # link_util = raw_link_util # Uncommenting this line will cause flows to reroute around their own traffic, good for testing
-            
-            # Current utilization here is doubled as a simple attempt to handle variability in flow rates
-            if link_util + (current_util * 2) > 1:
-                link_util = 1
+            if util_estimate == CURRENT_UTIL_ESTIMATE:
+                raw_link_util = core.openflow_flow_tracker.get_link_utilization_normalized(edge[0], output_port);
+                link_util_mcast_flow = core.openflow_flow_tracker.get_flow_utilization_normalized(edge[0], output_port, self.flow_cookie)
+                
+                link_util = max(0, (raw_link_util * (1 - link_util_mcast_flow)))
+                
+                # link_util = raw_link_util # Uncommenting this line will cause flows to reroute around their own traffic, good for testing
+                
+                # Current utilization here is doubled as a simple attempt to handle variability in flow rates
+                if link_util + (current_util * 2) > 1:
+                    link_util = 1
+            else:
+                raw_link_util = min(1, core.openflow_flow_tracker.get_link_utilization_forecast(edge[0], output_port)[forecast_index] / link_capacity)
+                flow_forecast = core.openflow_flow_tracker.get_flow_utilization_forecast(edge[0], output_port, self.flow_cookie)
+                if flow_forecast is None:
+                    # No forecast for this flow on the link, fall back to its current utilization (normalized by capacity,
+                    # so that it can be subtracted from the normalized link forecast)
+                    link_util_mcast_flow = min(1, core.openflow_flow_tracker.get_flow_utilization_mbps(edge[0], output_port,
+                            self.flow_cookie) / link_capacity)
+                else:
+                    link_util_mcast_flow = min(1, flow_forecast[forecast_index] / link_capacity)
+                
+                # Forecasts already account for trend and variability, so the flow's predicted load is not doubled
+                link_util = max(0, raw_link_util - link_util_mcast_flow)
+                if link_util + current_util > 1:
+                    link_util = 1
             
             link_weight = 1
             
@@ -327,6 +369,7 @@ class MulticastPath(object):
             connection = core.openflow.getConnection(router_dpid)
             if connection is not None:
                 connection.send(outgoing_rules[router_dpid])
+                self.groupflow_manager.num_flow_mods_sent += 1
                 if not outgoing_rules[router_dpid].command == of.OFPFC_DELETE:
                     self.installed_node_list.append(router_dpid)
                 else:
@@ -342,6 +385,11 @@ class MulticastPath(object):
         
         if not groupflow_trace_event is None:
             groupflow_trace_event.set_flow_installation_end_time()
+            # Archiving of the trace event is deferred until all routers confirm that the new rules have been applied
+            for router_dpid in outgoing_rules:
+                connection = core.openflow.getConnection(router_dpid)
+                if connection is not None:
+                    core.groupflow_event_tracer.send_flow_barrier(groupflow_trace_event, connection)
             core.groupflow_event_tracer.archive_trace_event(groupflow_trace_event)
 
                 
@@ -361,6 +409,7 @@ class MulticastPath(object):
             connection = core.openflow.getConnection(router_dpid)
             if connection is not None:
                 connection.send(msg)
+                self.groupflow_manager.num_flow_mods_sent += 1
             else:
                 log.warn('Could not get connection for router: ' + dpid_to_str(router_dpid))
         self.installed_node_list = []
@@ -381,7 +430,8 @@ class GroupFlowManager(EventMixin):
     """The GroupFlowManager implements multicast routing for OpenFlow networks."""
     _core_name = "openflow_groupflow"
     
-    def __init__(self, link_weight_type, static_link_weight, util_link_weight, flow_replacement_mode, flow_replacement_interval):
+    def __init__(self, link_weight_type, static_link_weight, util_link_weight, flow_replacement_mode, flow_replacement_interval,
+            util_estimate = CURRENT_UTIL_ESTIMATE):
         # Listen to dependencies
         def startup():
             core.openflow.addListeners(self, priority = 99)
@@ -398,6 +448,8 @@ class GroupFlowManager(EventMixin):
         self.flow_replacement_mode = flow_replacement_mode
         self.flow_replacement_interval = flow_replacement_interval
         log.info('Set FlowReplacementMode:' + str(flow_replacement_mode) + ' FlowReplacementInterval:' + str(flow_replacement_interval) + ' seconds')
+        self.util_estimate = util_estimate
+        log.info('Set UtilEstimate:' + str(util_estimate))
         
         self.adjacency = defaultdict(lambda : defaultdict(lambda : None))
         self.topology_graph = []
@@ -406,6 +458,12 @@ class GroupFlowManager(EventMixin):
         self.multicast_paths_by_flow_cookie = {} # Stores references to the same objects as self.multicast_paths, except this map is keyed by flow_cookie
         self._next_mcast_group_cookie = 54345;  # Arbitrary, not set to 1 to avoid conflicts with other modules
         
+        # Counters reported on termination
+        self.num_cong_events_handled = 0
+        self.num_cong_flow_replacements = 0
+        self.num_tree_calculations = 0
+        self.num_flow_mods_sent = 0
+        
         # Desired reception state as delivered by the IGMP manager, keyed by the dpid of the router for which
         # the reception state applies
         self.desired_reception_state = defaultdict(lambda : None)
@@ -528,32 +586,24 @@ class GroupFlowManager(EventMixin):
     def _handle_MulticastGroupEvent(self, event):
         """Processes MulticastGroupEvents (generated by the IGMPManager module) and adjusts routing as neccesary to fulfill desired reception state"""
         log.debug(event.debug_str())
-        # Save a copy of the old reception state to account for members which left a group
-        old_reception_state = None
-        if event.router_dpid in self.desired_reception_state:
-            old_reception_state = self.desired_reception_state[event.router_dpid]
         
-        # Set the new reception state
+        # Set the new reception state. The IGMP module maintains this map incrementally, so only the groups listed in the
+        # event's added, removed and modified reception entries need to be examined. The stored map is the router's live
+        # map (see MulticastGroupEvent), which is only modified immediately before the event describing the change is
+        # raised, so it never differs from the state delivered by the events processed here.
         self.desired_reception_state[event.router_dpid] = event.desired_reception
         log.info('Set new reception state for router: ' + dpid_to_str(event.router_dpid))
         
         # Build a list of all multicast groups that may be impacted by this change
         mcast_addr_list = []
         removed_mcast_addr_list = []
-        for multicast_addr in self.desired_reception_state[event.router_dpid]:
-            mcast_addr_list.append(multicast_addr)
-            
-        if not old_reception_state is None:
-            for multicast_addr in old_reception_state:
+        for multicast_addr in event.get_changed_groups():
+            if multicast_addr in event.desired_reception:
+                mcast_addr_list.append(multicast_addr)
+            else:
                 # Capture groups which were removed in this event
-                if not multicast_addr in mcast_addr_list:
-                    log.info('Multicast group ' + str(multicast_addr) + ' no longer requires reception')
-                    removed_mcast_addr_list.append(multicast_addr)
-                elif multicast_addr in self.desired_reception_state[event.router_dpid] \
-                        and set(old_reception_state[multicast_addr]) == set(self.desired_reception_state[event.router_dpid][multicast_addr]):
-                    # Prevent processing of groups that did not change
-                    mcast_addr_list.remove(multicast_addr)
-                    log.debug('Prevented redundant processing of group: ' + str(multicast_addr))
+                log.info('Multicast group ' + str(multicast_addr) + ' no longer requires reception')
+                removed_mcast_addr_list.append(multicast_addr)
         
         # Rebuild multicast trees for relevant multicast groups
         log.debug('Recalculating paths due to new reception state change')
@@ -606,10 +656,34 @@ class GroupFlowManager(EventMixin):
                         pass
                     self.multicast_paths[multicast_addr][source].update_flow_placement(groupflow_trace_event)
     
+    def termination_handler(self, signal, frame):
+        """Method called when a SIGINT signal is received, which reports congestion event handling statistics.
+
+        This function is typically called by the BenchmarkTerminator module.
+        """
+        log.info('Congestion events handled: ' + str(self.num_cong_events_handled) + ' Flow replacements triggered: '
+                + str(self.num_cong_flow_replacements))
+
     def _handle_LinkUtilizationEvent(self, event):
         """Processes LinkUtilizationEvents (generated by the FlowTracker module), and replaces flows that traverse the specified link"""
+        self.num_cong_events_handled += 1
+        self._replace_congested_link_flows(event, time.time())
+
+    def _handle_NetworkCongestionEvent(self, event):
+        """Processes NetworkCongestionEvents (generated by the FlowTracker module), and replaces flows on each congested link.
+
+        Links are processed in order of decreasing utilization. Flows replaced while processing one link will not be replaced
+        again for any other link in the same event (as they will not have reached the flow replacement interval).
+        """
+        self.num_cong_events_handled += 1
+        replacement_time = time.time()
+        for link_event in sorted(event.link_events, key = lambda link_event: link_event.link_utilization, reverse = True):
+            self._replace_congested_link_flows(link_event, replacement_time)
+
+    def _replace_congested_link_flows(self, event, replacement_time):
+        """Replaces flows that traverse the link specified by a LinkUtilizationEvent, if congestion threshold based flow replacement is enabled"""
         
-        if event.link_utilization >= core.openflow_flow_tracker.link_max_bw:
+        if event.link_utilization >= core.openflow_flow_tracker.get_link_capacity(event.router_dpid, event.output_port):
             log.debug('Link Fully Utilized! Switch:' + dpid_to_str(event.router_dpid) + ' Port:' + str(event.output_port))
         
         # Ignore the event if congestion threshold based flow replacement is not enabled
@@ -617,8 +691,6 @@ class GroupFlowManager(EventMixin):
             return
             
         log.debug('Got LinkUtilEvent - Switch: ' + dpid_to_str(event.router_dpid) + ' Port: ' + str(event.output_port) + '\n\tUtil: ' + str(event.link_utilization))
-            
-        replacement_time = time.time()
         
         # 1) Determine the amount of utilization that should be replaced to bring the link back under the congestion threshold
         replacement_utilization = event.link_utilization - event.cong_threshold
@@ -647,6 +719,7 @@ class GroupFlowManager(EventMixin):
                     replacement_time - self.multicast_paths_by_flow_cookie[flow[0]]._last_flow_replacement_time >= self.flow_replacement_interval):
                 log.debug('Replacing multicast flow with cookie: ' + str(flow[0]) + ' Bitrate: ' + str(flow[1]) + ' Mbps')
                 self.multicast_paths_by_flow_cookie[flow[0]].update_flow_placement()
+                self.num_cong_flow_replacements += 1
             
                 replaced_utilization += flow[1]
                 # Note: This causes the replacement to stop after replacing a single flow (may help prevent thrashing)
@@ -664,7 +737,7 @@ class GroupFlowManager(EventMixin):
 
 
 def launch(link_weight_type = 'linear', static_link_weight = STATIC_LINK_WEIGHT, util_link_weight = UTILIZATION_LINK_WEIGHT, 
-        flow_replacement_mode = 'none', flow_replacement_interval = FLOW_REPLACEMENT_INTERVAL_SECONDS):
+        flow_replacement_mode = 'none', flow_replacement_interval = FLOW_REPLACEMENT_INTERVAL_SECONDS, util_estimate = 'current'):
     # Method called by the POX core when launching the module
     link_weight_type_enum = LINK_WEIGHT_LINEAR   # Default
     if 'linear' in str(link_weight_type):
@@ -678,6 +751,12 @@ def launch(link_weight_type = 'linear', static_link_weight = STATIC_LINK_WEIGHT,
     if 'cong_threshold' in str(flow_replacement_mode):
         flow_replacement_mode_int = CONG_THRESHOLD_FLOW_REPLACEMENT
     
+    util_estimate_int = CURRENT_UTIL_ESTIMATE
+    if 'forecast' in str(util_estimate):
+        util_estimate_int = FORECAST_UTIL_ESTIMATE
+    elif 'upper' in str(util_estimate):
+        util_estimate_int = UPPER_BOUND_UTIL_ESTIMATE
+    
     groupflow_manager = GroupFlowManager(link_weight_type_enum, float(static_link_weight), float(util_link_weight), flow_replacement_mode_int,
-        float(flow_replacement_interval))
+        float(flow_replacement_interval), util_estimate_int)
     core.register('openflow_groupflow', groupflow_manager)
\ No newline at end of file
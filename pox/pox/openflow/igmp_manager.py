@@ -18,8 +18,36 @@
 """
 A POX module implementation providing IGMP v3 Multicast Router functionality.
 
-This module does not support any command line arguments. All IGMP parameters are set to RFC
-recommended defaults (see RFC 3376).
+All IGMP parameters are set to RFC recommended defaults (see RFC 3376). The following command line arguments are supported:
+
+* report_coalesce_window: The length of time (in seconds) for which reception state changes on each router are
+  coalesced before a MulticastGroupEvent is generated. Reports received by a router during this window are merged into
+  a single MulticastGroupEvent, reducing the number of multicast tree recalculations triggered by bursts of reports
+  (such as responses to general queries) at the cost of added join/leave latency. Setting this to 0 generates an event
+  immediately after each report is processed.
+  Default: 0
+
+* snapshot_file: Path of a file to which the group membership state of all routers (including remaining timer values) is
+  periodically saved. If the file exists when the module is launched, the saved state is restored as each router connects,
+  so that multicast trees can be rebuilt immediately rather than after the next general query cycle. The host state
+  tracked by the 'explicit' and 'fast' leave modes is saved with the group records. If restored state does not include
+  host state (i.e. it was saved with leave_mode 'query'), last member queries are always sent for one query interval
+  after the restore, while hosts re-report in response to general queries. If not specified, membership state is not
+  saved.
+  Default: None
+
+* snapshot_interval: The interval (in seconds) at which membership snapshots are written to snapshot_file.
+  Default: 10
+
+* leave_mode: Determines how reports which may remove the last listener of a group or source are processed.
+  'query' - Last member queries are always sent, as specified by RFC 3376.
+  'explicit' - The filter state (INCLUDE or EXCLUDE, and source list) of each host reporting membership on each port is
+  explicitly tracked, and last member queries are not sent for groups or sources which other hosts are known to still
+  want to receive.
+  'fast' - As 'explicit', but if no other members are known the affected group or source timers are expired immediately
+  instead of sending last member queries. This reduces leave latency from seconds to milliseconds, but may briefly
+  interrupt reception for members which have not reported since the controller started.
+  Default: 'query'
 
 Depends on openflow.discovery, misc.groupflow_event_tracer (optional)
 
@@ -29,6 +57,11 @@ Author: Alexander Craig - alexcraig1@gmail.com
 """
 
 from collections import defaultdict
+import heapq
+import struct
+import json
+import os
+import logging
 
 # POX dependencies
 from pox.openflow.discovery import Discovery
@@ -39,6 +72,7 @@ from pox.lib.util import dpid_to_str
 import pox.lib.packet as pkt
 from pox.lib.packet.igmpv3 import *   # Required for various IGMP variable constants
 from pox.lib.packet.ethernet import *
+from pox.lib.packet.packet_utils import checksum
 import pox.openflow.libopenflow_01 as of
 from pox.lib.addresses import IPAddr, EthAddr
 from pox.lib.recoco import Timer
@@ -46,6 +80,14 @@ import time
 
 log = core.getLogger()
 
+# Leave processing modes (see leave_mode in the module docstring)
+LEAVE_MODE_QUERY = 0
+LEAVE_MODE_EXPLICIT = 1
+LEAVE_MODE_FAST = 2
+
+# Priority of the per-port IGMP punt/drop flows, which must override the switch wide IGMP punt flow
+IGMP_PORT_FLOW_PRIORITY = of.OFP_DEFAULT_PRIORITY + 1
+
 def int_to_filter_mode_str(filter_mode):
     """Converts an IGMP integer filter mode into the associated string constant."""
     if filter_mode == MODE_IS_INCLUDE:
@@ -64,21 +106,39 @@ def int_to_filter_mode_str(filter_mode):
 
 class MulticastGroupEvent(Event):
 
-    """Event which represents the desired reception state for all interfaces/multicast groups on a single router.
+    """Event which represents a change in the desired reception state of the interfaces/multicast groups on a single router.
     
     This class contains the following public attributes:
     
-    * desired_reception - Records the desired reception state of the router with DPID router_dpid, and
-      is formatted as a two dimensional map of lists:
+    * desired_reception - Records the complete desired reception state of the router with DPID router_dpid (after the
+      changes described by this event have been applied), and is formatted as a two dimensional map of lists:
     
     ::
         
         desired_reception[multicast_address][port_index] = [list of desired source addresses]
     
     An empty list in any map entry specifies that reception is desired from all available sources.
+    
+    This map is not a copy: it is the router's own desired reception map, which the IGMP module maintains incrementally
+    (so that events do not need to copy the complete reception state of the router). Event handlers must treat it as
+    read-only. Handlers may keep a reference to it, with the following contract: the map is only modified by
+    IGMPv3Router.update_desired_reception_state(), which raises the MulticastGroupEvent describing the modification
+    immediately after applying it (in the same iteration of the POX event loop). A retained reference therefore always
+    holds the router's latest reception state, and never holds changes for which the corresponding event has not yet
+    been delivered to all handlers. Entries are replaced rather than modified in place, so the source lists of retained
+    entries (including those in added_reception, removed_reception and modified_reception) never change. Handlers which
+    require the state as of a particular event (e.g. to defer processing) must copy the map.
+    
+    * added_reception - List of (multicast_address, port_index, [list of desired source addresses]) tuples for
+      entries which were added to desired_reception by this change
+    * removed_reception - List of (multicast_address, port_index, [list of previously desired source addresses]) tuples
+      for entries which were removed from desired_reception by this change
+    * modified_reception - List of (multicast_address, port_index, [list of desired source addresses]) tuples for
+      entries whose desired sources were modified by this change
     """
     
-    def __init__ (self, router_dpid, desired_reception, igmp_trace_event = None):
+    def __init__ (self, router_dpid, desired_reception, igmp_trace_event = None, added_reception = None,
+            removed_reception = None, modified_reception = None):
         Event.__init__(self)
         self.router_dpid = router_dpid
         self.igmp_trace_event = igmp_trace_event
@@ -87,17 +147,29 @@ class MulticastGroupEvent(Event):
         # An empty list indicates reception from all sources is desired
         self.desired_reception = desired_reception
         
+        self.added_reception = added_reception if added_reception is not None else []
+        self.removed_reception = removed_reception if removed_reception is not None else []
+        self.modified_reception = modified_reception if modified_reception is not None else []
+    
+    def get_changed_groups(self):
+        """Returns the set of multicast addresses with at least one added, removed or modified reception entry."""
+        changed_groups = set()
+        for reception_list in (self.added_reception, self.removed_reception, self.modified_reception):
+            for entry in reception_list:
+                changed_groups.add(entry[0])
+        return changed_groups
+        
     def debug_str(self):
         debug_str = '\n===== MulticastGroupEvent: Router: ' + dpid_to_str(self.router_dpid)
-        for mcast_address in self.desired_reception:
-            debug_str += '\nMulticast Group: ' + str(mcast_address)
-            for port_index in self.desired_reception[mcast_address]:
-                debug_str += '\nPort: ' + str(port_index)
-                if len(self.desired_reception[mcast_address][port_index]) == 0:
+        for change_str, reception_list in (('Added', self.added_reception), ('Removed', self.removed_reception),
+                ('Modified', self.modified_reception)):
+            for mcast_address, port_index, sources in reception_list:
+                debug_str += '\n' + change_str + ' - Multicast Group: ' + str(mcast_address) + ' Port: ' + str(port_index)
+                if len(sources) == 0:
                     debug_str += ' - Reception from all sources requested.'
                     continue
                     
-                for address in self.desired_reception[mcast_address][port_index]:
+                for address in sources:
                     debug_str += '\nDesired Source: ' + str(address)
         return debug_str + '\n===== MulticastGroupEvent'
         
@@ -141,7 +213,7 @@ class MulticastTopoEvent(Event):
         return debug_str + '\n===== MulticastTopoEvent'
     
     
-class MulticastMembershipRecord:
+class MulticastMembershipRecord(object):
     """Class representing the group record state maintained by an IGMPv3 multicast router
 
     Multicast routers implementing IGMPv3 keep state per group per attached network.  This group state consists of a
@@ -159,55 +231,122 @@ class MulticastMembershipRecord:
         
         (source address, source timer)
     
+    Timers are stored as absolute expiry times (as returned by time.time()), so that they do not need to be periodically
+    decremented. The group_timer property provides the remaining group timer in seconds.
+    
+    Source records in the X set are stored in a map of source timer expiry times keyed by source address. Source records in
+    the Y set always have a zero source timer, and are stored as a set of source addresses. This allows membership tests
+    and timer updates in constant time, and allows the RFC 3376 set operations to be performed with native set algebra.
     """
     
+    __slots__ = ['multicast_address', 'group_expiry', 'filter_mode', 'x_source_records', 'y_source_records',
+            'scheduled_expiry']
+    
     def __init__(self, mcast_address, timer_value):
         self.multicast_address = mcast_address
-        self.group_timer = timer_value
+        self.group_expiry = time.time() + timer_value
         self.filter_mode = MODE_IS_INCLUDE  # TODO: Re-examine this as the default
-        self.x_source_records = [] # Source records are stored as a list of the source address and the source timer
-        self.y_source_records = [] # Source records with a zero source timer are stored separately
+        self.x_source_records = {}  # Source timer expiry times, keyed by source address
+        self.y_source_records = set()   # Source addresses with a zero source timer are stored separately
+        self.scheduled_expiry = None  # The expiry time at which this record is currently scheduled in the IGMPManager timer heap
+    
+    def _get_group_timer(self):
+        return max(0, self.group_expiry - time.time())
+    
+    def _set_group_timer(self, timer_value):
+        self.group_expiry = time.time() + timer_value
+    
+    group_timer = property(_get_group_timer, _set_group_timer, doc = 'The remaining group timer (in seconds)')
     
     def get_curr_source_timer(self, ip_addr):
         """Returns the current source timer for the specified IP address, or 0 if the specified IP is not known by this group record."""
-        for record in self.x_source_records:
-            if record[0] == ip_addr:
-                return record[1]
-         
-        return 0
+        return max(0, self.get_source_expiry(ip_addr) - time.time())
+    
+    def get_source_expiry(self, ip_addr):
+        """Returns the source timer expiry time for the specified IP address, or 0 if the specified IP is not known by this group record."""
+        return self.x_source_records.get(ip_addr, 0)
+    
+    def set_source_expiry(self, addresses, expiry_time):
+        """Sets the source timer expiry time of each of the specified addresses, moving any addresses in the Y set to the X set."""
+        for address in addresses:
+            self.x_source_records[address] = expiry_time
+        self.y_source_records.difference_update(addresses)
+    
+    def get_next_expiry(self):
+        """Returns the earliest time at which a timer expiry will modify this record, or None if no timer is running.
+        
+        In INCLUDE mode this is the earliest source timer expiry. In EXCLUDE mode this is the earliest of the group timer
+        expiry and the source timer expiries of the X set.
+        """
+        next_expiry = None
+        if self.x_source_records:
+            next_expiry = min(self.x_source_records.itervalues())
+        if self.filter_mode == MODE_IS_EXCLUDE and (next_expiry is None or self.group_expiry < next_expiry):
+            next_expiry = self.group_expiry
+        return next_expiry
+    
+    def process_timer_expiry(self, curr_time):
+        """Applies all timer expirations which have occurred at or before curr_time to this record (see RFC 3376 section 6.3).
+        
+        In INCLUDE mode, sources with expired timers are deleted. In EXCLUDE mode, sources with expired timers are moved
+        to the Y set, and if the group timer has expired the record transitions to INCLUDE mode and the Y set is deleted.
+        Returns True if the record was modified.
+        """
+        modified = False
+        expired_addresses = [address for address, expiry in self.x_source_records.iteritems() if expiry <= curr_time]
+        if expired_addresses:
+            for address in expired_addresses:
+                del self.x_source_records[address]
+            if self.filter_mode == MODE_IS_EXCLUDE:
+                self.y_source_records.update(expired_addresses)
+            modified = True
+        
+        if self.filter_mode == MODE_IS_EXCLUDE and self.group_expiry <= curr_time:
+            log.debug('Group Timer expired')
+            # Switch the group record back to INCLUDE mode
+            self.filter_mode = MODE_IS_INCLUDE
+            self.y_source_records = set()
+            modified = True
+        return modified
         
     def get_x_addr_set(self):
         """Returns the set of addresses in the X set of source records (see RFC 3376)
         
         Note: When in INCLUDE mode, all sources are stored in the X set.
         """
-        
-        return_set = set()
-        for record in self.x_source_records:
-            return_set.add(record[0])
-        return return_set
+        return set(self.x_source_records)
     
     def get_y_addr_set(self):
         """Returns the set of addresses in the Y set of source records (see RFC 3376)
         
         Note: When in INCLUDE mode, his set should always be empty.
         """
-        return_set = set()
-        for record in self.y_source_records:
-            return_set.add(record[0])
-        return return_set
+        return set(self.y_source_records)
     
     def remove_source_record(self, ip_addr):
         """Removes the source record with the specified IP address from the group record"""
-        for record in self.x_source_records:
-            if record[0] == ip_addr:
-                self.x_source_records.remove(record)
-                return
-        
-        for record in self.y_source_records:
-            if record[0] == ip_addr:
-                self.y_source_records.remove(record)
-                return
+        if ip_addr in self.x_source_records:
+            del self.x_source_records[ip_addr]
+        else:
+            self.y_source_records.discard(ip_addr)
+    
+    def get_snapshot(self, curr_time):
+        """Returns the state of the record as a list of JSON serializable values, with timers stored as remaining times (in seconds)."""
+        return [str(self.multicast_address), self.filter_mode, max(0, self.group_expiry - curr_time),
+                [[str(address), max(0, expiry - curr_time)] for address, expiry in self.x_source_records.iteritems()],
+                [str(address) for address in self.y_source_records]]
+    
+    @classmethod
+    def from_snapshot(cls, snapshot, elapsed_time):
+        """Creates a record from the output of get_snapshot(), with all timers reduced by elapsed_time (in seconds)."""
+        mcast_address, filter_mode, group_timer, x_sources, y_sources = snapshot[:5]
+        curr_time = time.time()
+        record = cls(IPAddr(mcast_address), max(0, group_timer - elapsed_time))
+        record.filter_mode = filter_mode
+        for address, source_timer in x_sources:
+            record.x_source_records[IPAddr(address)] = curr_time + max(0, source_timer - elapsed_time)
+        record.y_source_records.update(IPAddr(address) for address in y_sources)
+        return record
 
 
 
@@ -221,11 +360,32 @@ class IGMPv3Router(EventMixin):
         
         # self.multicast_records[igmp_port_index][multicast_address]
         self.multicast_records = defaultdict(lambda : defaultdict(lambda : None))
+        # Explicit host tracking state (only maintained if the leave mode is not LEAVE_MODE_QUERY):
+        # self.reporting_hosts[(port_index, multicast_address)][host_ip] = (filter_mode, frozenset of sources, expiry time)
+        self.reporting_hosts = {}
+        # Time before which last member queries are always sent, because the explicit host tracking state is incomplete
+        # (set when group records are restored from a snapshot which did not include host state)
+        self._host_tracking_start_time = 0
         self.dpid = None
         self.igmp_manager = manager
         self._listeners = None
         self._connected_at = None
-        self.prev_desired_reception = None
+        # Per-port IGMP flows currently installed on the switch:  [port_index] -> True if IGMP is punted to the
+        # controller, False if IGMP is dropped
+        self._igmp_port_flows = {}
+        
+        # self.desired_reception[multicast_address][port_index] = [list of desired sources], maintained incrementally as
+        # group records are modified
+        self.desired_reception = {}
+        # Set of (port_index, multicast_address) pairs whose group records were modified since the last call to
+        # update_desired_reception_state()
+        self._changed_reception_entries = set()
+        self._raised_first_group_event = False
+        
+        # Report coalescing state
+        self._coalesce_timer = None
+        self._coalesced_trace_events = []
+        self._num_coalesced_window_reports = 0  # Number of reports received during the current coalescing window
 
     def __repr__(self):
         return dpid_to_str(self.dpid)
@@ -236,6 +396,7 @@ class IGMPv3Router(EventMixin):
             self.connection.removeListeners(self._listeners)
             self.connection = None
             self._listeners = None
+            self._igmp_port_flows = {}
 
     def listen_on_connection(self, connection):
         if self.dpid is None:
@@ -262,11 +423,50 @@ class IGMPv3Router(EventMixin):
         msg.idle_timeout = 0
         msg.actions.append(of.ofp_action_output(port = of.OFPP_CONTROLLER))
         connection.send(msg)
+        
+        self._igmp_port_flows = {}
+        self.sync_igmp_port_flows()
+    
+    def sync_igmp_port_flows(self):
+        """Installs per-port IGMP flows which punt IGMP from host facing ports and drop IGMP on inter-switch ports.
+        
+        IGMP packets received from neighbouring routers are dropped in the switch, rather than generating a PacketIn
+        for each packet (such as the general queries flooded by this controller). Only ports whose status changed since the
+        last call are updated, so this can be called whenever igmp_ports is modified.
+        """
+        if self.connection is None or self.ports is None:
+            return
+        
+        for port in self.ports:
+            if port.port_no == of.OFPP_CONTROLLER or port.port_no == of.OFPP_LOCAL:
+                continue
+            punt = port.port_no in self.igmp_ports
+            if self._igmp_port_flows.get(port.port_no) == punt:
+                continue
+            
+            # Flows with an identical match and priority are replaced by ofp_flow_mod adds
+            msg = of.ofp_flow_mod()
+            msg.priority = IGMP_PORT_FLOW_PRIORITY
+            msg.match.in_port = port.port_no
+            msg.match.dl_type = 0x0800 # IPv4
+            msg.match.nw_proto = IGMP_PROTOCOL # IGMP
+            msg.hard_timeout = 0
+            msg.idle_timeout = 0
+            if punt:
+                msg.actions.append(of.ofp_action_output(port = of.OFPP_CONTROLLER))
+            # No actions = drop packet
+            self.connection.send(msg)
+            self._igmp_port_flows[port.port_no] = punt
+            log.debug('Router ' + str(self) + ':' + str(port.port_no) + '| Installed flow to ' 
+                    + ('punt' if punt else 'drop') + ' IGMP packets')
 
     def _handle_ConnectionDown(self, event):
         self.ignore_connection()
         
     def debug_print_group_records(self):
+        if not log.isEnabledFor(logging.DEBUG):
+            # Avoid walking the complete membership state when the output would be discarded
+            return
         log.debug(' ')
         log.debug('== Router ' + str(self) + ' Group Membership State ==')
         for port in self.multicast_records:
@@ -283,51 +483,180 @@ class IGMPv3Router(EventMixin):
                 else:
                     log.debug(str(group_record.multicast_address) + ' - ' 
                             + int_to_filter_mode_str(group_record.filter_mode))
-                for source_record in group_record.x_source_records:
-                    log.debug('X: ' + str(source_record[0]) + ' - Timer: ' + str(source_record[1]))
-                for source_record in group_record.y_source_records:
-                    log.debug('Y: ' + str(source_record[0]) + ' - Timer: ' + str(source_record[1]))
+                for source_address in group_record.x_source_records:
+                    log.debug('X: ' + str(source_address) + ' - Timer: ' + str(group_record.get_curr_source_timer(source_address)))
+                for source_address in group_record.y_source_records:
+                    log.debug('Y: ' + str(source_address) + ' - Timer: 0')
         log.debug('=====================================================')
         log.debug(' ')
     
-    def update_desired_reception_state(self, igmp_trace_event = None):
-        """Updates the object's cached map of desired reception state, and generates a MulticastGroupEvent if state changed."""
-        desired_reception = defaultdict(lambda : defaultdict(lambda : None))
-        
-        for port_index in self.multicast_records:
-            for mcast_address in self.multicast_records[port_index]:
-                group_record = self.multicast_records[port_index][mcast_address]
-                if group_record.filter_mode == MODE_IS_INCLUDE:
-                    for source_record in group_record.x_source_records:
-                        if desired_reception[mcast_address][port_index] == None:
-                            desired_reception[mcast_address][port_index] = []
-                        desired_reception[mcast_address][port_index].append(source_record[0])
-                
-                if group_record.filter_mode == MODE_IS_EXCLUDE:
-                    if len(group_record.x_source_records) == 0:
-                        desired_reception[mcast_address][port_index] = []
-                        continue
-                        
-                    for source_record in group_record.x_source_records:
-                        if desired_reception[mcast_address][port_index] == None:
-                            desired_reception[mcast_address][port_index] = []
-                        desired_reception[mcast_address][port_index].append(source_record[0])
+    def get_membership_snapshot(self, curr_time):
+        """Returns the group membership state of the router as a map of lists of record snapshots, keyed by port.
+        
+        If explicit host tracking is active, the snapshot of each record is followed by the tracked host states of its
+        group, as a list of [host, filter_mode, [sources], remaining membership time] lists.
+        """
+        track_hosts = self.igmp_manager.leave_mode != LEAVE_MODE_QUERY and curr_time >= self._host_tracking_start_time
+        snapshot = {}
+        for port in self.multicast_records:
+            port_snapshot = []
+            for group_record in self.multicast_records[port].itervalues():
+                if group_record is None:
+                    continue
+                record_snapshot = group_record.get_snapshot(curr_time)
+                if track_hosts:
+                    hosts = self.reporting_hosts.get((port, group_record.multicast_address), {})
+                    record_snapshot.append([[str(host), filter_mode, [str(address) for address in sources],
+                            max(0, expiry - curr_time)] for host, (filter_mode, sources, expiry) in hosts.iteritems()])
+                port_snapshot.append(record_snapshot)
+            if port_snapshot:
+                snapshot[str(port)] = port_snapshot
+        return snapshot
+    
+    def restore_membership_snapshot(self, snapshot, elapsed_time):
+        """Restores group membership state from the output of get_membership_snapshot(), and generates a MulticastGroupEvent
+        for the restored state. All timers are reduced by elapsed_time (the age of the snapshot in seconds).
         
+        If explicit host tracking is active and the snapshot does not include host state, last member queries are always
+        sent for one query interval, by which time all members should have re-reported in response to a general query.
+        """
+        num_restored_records = 0
+        missing_host_state = False
+        curr_time = time.time()
+        for port, port_snapshot in snapshot.iteritems():
+            port = int(port)
+            for record_snapshot in port_snapshot:
+                group_record = MulticastMembershipRecord.from_snapshot(record_snapshot, elapsed_time)
+                self.multicast_records[port][group_record.multicast_address] = group_record
+                self.mark_reception_changed(port, group_record.multicast_address)
+                self.igmp_manager.schedule_record_expiry(self.dpid, port, group_record)
+                num_restored_records += 1
+                if len(record_snapshot) <= 5:
+                    missing_host_state = True
+                    continue
+                hosts = dict((IPAddr(host), (filter_mode, frozenset(IPAddr(address) for address in sources),
+                        curr_time + host_timer - elapsed_time))
+                        for host, filter_mode, sources, host_timer in record_snapshot[5] if host_timer > elapsed_time)
+                if hosts:
+                    self.reporting_hosts[(port, group_record.multicast_address)] = hosts
+        log.info('Router ' + str(self) + ' restored ' + str(num_restored_records) + ' group records from snapshot (age: '
+                + str(elapsed_time) + ' seconds)')
+        if missing_host_state and self.igmp_manager.leave_mode != LEAVE_MODE_QUERY:
+            self._host_tracking_start_time = curr_time + self.igmp_manager.igmp_query_interval
+            log.info('Router ' + str(self) + ' restored records without host state, sending last member queries for '
+                    + str(self.igmp_manager.igmp_query_interval) + ' seconds')
+        # Expired timers are handled by the next call to process_expired_timers()
+        self.update_desired_reception_state()
+    
+    def mark_reception_changed(self, port_index, mcast_address):
+        """Flags the desired reception state of the specified port and multicast group for update on the next call to
+        update_desired_reception_state(). This should be called whenever a group record is created, modified or removed."""
+        self._changed_reception_entries.add((port_index, mcast_address))
+    
+    def get_desired_sources(self, port_index, mcast_address):
+        """Returns the list of desired sources for the specified port and multicast group (an empty list if reception
+        from all sources is desired), or None if reception is not desired."""
+        if port_index not in self.multicast_records:
+            return None
+        group_record = self.multicast_records[port_index].get(mcast_address)
+        if group_record is None:
+            return None
+        if group_record.filter_mode == MODE_IS_EXCLUDE:
+            return list(group_record.x_source_records)
+        if group_record.x_source_records:
+            return list(group_record.x_source_records)
+        return None
+    
+    def request_reception_update(self, igmp_trace_event = None, from_report = False):
+        """Requests an update of the router's desired reception state after group records have been modified.
+        
+        If the IGMP manager's report_coalesce_window is 0, the update is performed immediately. Otherwise, the update is
+        deferred until the end of the router's current coalescing window (which is started if no window is active), so that
+        changes from all reports received during the window are delivered in a single MulticastGroupEvent.
+        
+        * from_report: True if the group records were modified by a membership report (rather than a timer expiry)
+        """
+        if self.igmp_manager.report_coalesce_window <= 0:
+            self.update_desired_reception_state(igmp_trace_event)
+            return
+        
+        if from_report:
+            self._num_coalesced_window_reports += 1
         if not igmp_trace_event is None:
+            igmp_trace_event.set_igmp_batch_start_time()
+            self._coalesced_trace_events.append(igmp_trace_event)
+        if self._coalesce_timer is None:
+            self._coalesce_timer = Timer(self.igmp_manager.report_coalesce_window, self.flush_coalesced_reception_update,
+                    recurring = False)
+    
+    def flush_coalesced_reception_update(self):
+        """Ends the router's current coalescing window, and updates the desired reception state with all coalesced changes."""
+        self._coalesce_timer = None
+        coalesced_trace_events = self._coalesced_trace_events
+        self._coalesced_trace_events = []
+        for igmp_trace_event in coalesced_trace_events:
+            igmp_trace_event.set_igmp_batch_end_time()
+        num_window_reports = self._num_coalesced_window_reports
+        self._num_coalesced_window_reports = 0
+        self.igmp_manager.num_coalesced_reports += max(0, num_window_reports - 1)
+        log.debug('Router ' + str(self) + ' coalesced ' + str(num_window_reports) + ' reports (total merged: '
+                + str(self.igmp_manager.num_coalesced_reports) + ')')
+
+        if coalesced_trace_events:
+            self.update_desired_reception_state(coalesced_trace_events[0], coalesced_trace_events[1:])
+        else:
+            self.update_desired_reception_state()
+    
+    def update_desired_reception_state(self, igmp_trace_event = None, coalesced_trace_events = None):
+        """Updates the object's cached map of desired reception state, and generates a MulticastGroupEvent if state changed.
+        
+        Only the (port, multicast group) entries flagged through mark_reception_changed() are recalculated, and the
+        generated event lists only the entries which were added, removed or modified. If coalesced_trace_events is
+        provided, each listed trace event is completed and archived along with igmp_trace_event (which is the trace
+        event delivered with the generated MulticastGroupEvent).
+        """
+        added_reception = []
+        removed_reception = []
+        modified_reception = []
+        
+        for port_index, mcast_address in self._changed_reception_entries:
+            new_sources = self.get_desired_sources(port_index, mcast_address)
+            old_sources = None
+            if mcast_address in self.desired_reception:
+                old_sources = self.desired_reception[mcast_address].get(port_index)
+            
+            if new_sources is None:
+                if old_sources is not None:
+                    del self.desired_reception[mcast_address][port_index]
+                    if not self.desired_reception[mcast_address]:
+                        del self.desired_reception[mcast_address]
+                    removed_reception.append((mcast_address, port_index, old_sources))
+            elif old_sources is None:
+                self.desired_reception.setdefault(mcast_address, {})[port_index] = new_sources
+                added_reception.append((mcast_address, port_index, new_sources))
+            elif set(old_sources) != set(new_sources):
+                self.desired_reception[mcast_address][port_index] = new_sources
+                modified_reception.append((mcast_address, port_index, new_sources))
+        self._changed_reception_entries = set()
+        
+        if not igmp_trace_event is None:
+                if not coalesced_trace_events is None:
+                    # Coalesced reports are delivered with igmp_trace_event, so their join traces continue through it
+                    igmp_trace_event.coalesced_trace_events = coalesced_trace_events
                 igmp_trace_event.set_igmp_end_time()
                 core.groupflow_event_tracer.archive_trace_event(igmp_trace_event)
+        if not coalesced_trace_events is None:
+            for coalesced_trace_event in coalesced_trace_events:
+                coalesced_trace_event.set_igmp_end_time()
+                core.groupflow_event_tracer.archive_trace_event(coalesced_trace_event)
         
-        if self.prev_desired_reception == None:
-            event = MulticastGroupEvent(self.dpid, desired_reception, igmp_trace_event)
+        if not self._raised_first_group_event or added_reception or removed_reception or modified_reception:
+            self._raised_first_group_event = True
+            event = MulticastGroupEvent(self.dpid, self.desired_reception, igmp_trace_event, added_reception,
+                    removed_reception, modified_reception)
             self.igmp_manager.raiseEvent(event)
         else:
-            if desired_reception == self.prev_desired_reception:
-                log.debug('No change in reception state.')
-            else:
-                event = MulticastGroupEvent(self.dpid, desired_reception, igmp_trace_event)
-                self.igmp_manager.raiseEvent(event)
-            
-        self.prev_desired_reception = desired_reception
+            log.debug('No change in reception state.')
     
     def create_group_record(self, event, igmp_group_record, group_timer):
         """Creates a group record from the specific PacketIn event and associated igmp_group_record read from the packet.
@@ -343,6 +672,119 @@ class IGMPv3Router(EventMixin):
         
         return self.multicast_records[event.port][igmp_group_record.multicast_address]
     
+    def track_reporting_host(self, event, igmp_group_record):
+        """Updates the explicit host tracking state with the group record reported in the PacketIn event, and returns the
+        IP address of the reporting host (or None if explicit tracking is disabled).
+        
+        The filter state of each host is tracked per group (the router's group record is the merge of these states, see
+        RFC 3376 section 3.2). Current state and filter mode change records replace the host's state, ALLOW_NEW_SOURCES and
+        BLOCK_OLD_SOURCES records add and remove sources from it, and a host is removed once its state is an empty INCLUDE
+        (i.e. a leave). Every record other than BLOCK_OLD_SOURCES refreshes the host's membership for one group membership
+        interval, as blocking sources does not show continued interest in the group.
+        """
+        if self.igmp_manager.leave_mode == LEAVE_MODE_QUERY:
+            return None
+        
+        host = event.parsed.find(pkt.ipv4).srcip
+        key = (event.port, igmp_group_record.multicast_address)
+        record_type = igmp_group_record.record_type
+        sources = frozenset(igmp_group_record.get_addr_set())
+        expiry = time.time() + self.igmp_manager.igmp_group_membership_interval
+        hosts = self.reporting_hosts.get(key, {})
+        host_state = hosts.get(host)
+        
+        if record_type == MODE_IS_INCLUDE or record_type == CHANGE_TO_INCLUDE_MODE:
+            host_state = (MODE_IS_INCLUDE, sources, expiry)
+        elif record_type == MODE_IS_EXCLUDE or record_type == CHANGE_TO_EXCLUDE_MODE:
+            host_state = (MODE_IS_EXCLUDE, sources, expiry)
+        elif record_type == ALLOW_NEW_SOURCES:
+            if host_state is None:
+                host_state = (MODE_IS_INCLUDE, sources, expiry)
+            elif host_state[0] == MODE_IS_INCLUDE:
+                host_state = (MODE_IS_INCLUDE, host_state[1] | sources, expiry)
+            else:
+                host_state = (MODE_IS_EXCLUDE, host_state[1] - sources, expiry)
+        elif record_type == BLOCK_OLD_SOURCES:
+            if host_state is None:
+                return host
+            if host_state[0] == MODE_IS_INCLUDE:
+                host_state = (MODE_IS_INCLUDE, host_state[1] - sources, host_state[2])
+            else:
+                host_state = (MODE_IS_EXCLUDE, host_state[1] | sources, host_state[2])
+        
+        if host_state[0] == MODE_IS_INCLUDE and not host_state[1]:
+            hosts.pop(host, None)
+        else:
+            hosts[host] = host_state
+        if hosts:
+            self.reporting_hosts[key] = hosts
+        else:
+            self.reporting_hosts.pop(key, None)
+        return host
+    
+    def get_other_member_states(self, port, multicast_address, host):
+        """Returns a list of the (filter_mode, sources) states of the tracked hosts other than the specified host which are
+        members of the group on the specified port. Hosts whose membership has expired are pruned."""
+        key = (port, multicast_address)
+        if key not in self.reporting_hosts:
+            return []
+        curr_time = time.time()
+        members = self.reporting_hosts[key]
+        for expired_host in [member for member, host_state in members.iteritems() if host_state[2] <= curr_time]:
+            del members[expired_host]
+        if not members:
+            del self.reporting_hosts[key]
+            return []
+        return [(filter_mode, sources) for member, (filter_mode, sources, expiry) in members.iteritems() if member != host]
+    
+    def send_last_member_query(self, event, group_record, host, sources = None):
+        """Sends the last member queries triggered by a state change report from the specified host, according to the leave mode.
+        
+        If sources is None a group specific query is sent, otherwise a group and source specific query is sent for the
+        specified sources. With explicit tracking, sources which other tracked hosts still want to receive are removed
+        from a group and source specific query, and a group specific query (which only affects sources not explicitly
+        included by any host) is skipped if any other host is in EXCLUDE mode. Queries left with nothing to query are
+        skipped. With fast leave, the timers which would have been lowered to LMQT by the remaining queries are expired
+        immediately.
+        """
+        manager = self.igmp_manager
+        if manager.leave_mode != LEAVE_MODE_QUERY and time.time() >= self._host_tracking_start_time:
+            if sources is not None and not sources:
+                return
+            other_states = self.get_other_member_states(event.port, group_record.multicast_address, host)
+            if sources is None:
+                suppress_query = any(filter_mode == MODE_IS_EXCLUDE for filter_mode, host_sources in other_states)
+            else:
+                wanted_sources = set()
+                for filter_mode, host_sources in other_states:
+                    if filter_mode == MODE_IS_INCLUDE:
+                        wanted_sources.update(host_sources.intersection(sources))
+                    else:
+                        wanted_sources.update(set(sources) - host_sources)
+                sources = set(sources) - wanted_sources
+                suppress_query = not sources
+            if suppress_query:
+                manager.num_suppressed_queries += 1
+                log.debug(str(self) + ':' + str(event.port) + '|' + str(group_record.multicast_address) + ' Skipped last member query, '
+                        + str(len(other_states)) + ' other members still want the queried sources')
+                return
+            if manager.leave_mode == LEAVE_MODE_FAST:
+                curr_time = time.time()
+                if sources is None:
+                    if group_record.filter_mode == MODE_IS_EXCLUDE:
+                        group_record.group_expiry = curr_time
+                else:
+                    group_record.set_source_expiry(sources, curr_time)
+                group_record.process_timer_expiry(curr_time)
+                manager.num_fast_leaves += 1
+                log.info(str(self) + ':' + str(event.port) + '|' + str(group_record.multicast_address) + ' Fast leave, no other members known')
+                return
+        
+        if sources is None:
+            self.send_group_specific_query(event.port, group_record.multicast_address, group_record)
+        else:
+            self.send_group_and_source_specific_query(event.port, group_record.multicast_address, group_record, sources)
+    
     def send_group_specific_query(self, port, multicast_address, group_record, retransmissions = -1):
         """Generates a group specific query, and sends a PacketOut message to deliver it to the specified port"""
         if self.connection is None:
@@ -352,25 +794,14 @@ class IGMPv3Router(EventMixin):
         if retransmissions == -1:
             retransmissions = self.igmp_manager.igmp_last_member_query_count - 1
             
-        # Build the IGMP payload for the message
-        igmp_pkt = pkt.igmpv3()
-        igmp_pkt.ver_and_type = MEMBERSHIP_QUERY
-        igmp_pkt.max_response_time = self.igmp_manager.igmp_query_response_interval
-        igmp_pkt.address = multicast_address
-        igmp_pkt.qrv = self.igmp_manager.igmp_robustness
-        igmp_pkt.qqic = self.igmp_manager.igmp_query_interval
-        igmp_pkt.dlen = 12  # TODO: This should be determined by the IGMP packet class somehow
-        if group_record.group_timer > self.igmp_manager.igmp_last_member_query_time / 10:
-            igmp_pkt.suppress_router_processing = True
-        else:
-            igmp_pkt.suppress_router_processing = False
-        eth_pkt = self.igmp_manager.encapsulate_igmp_packet(igmp_pkt)
+        # Fetch the pre-packed query for this group
+        suppress_router_processing = group_record.group_timer > self.igmp_manager.igmp_last_member_query_time / 10
         output = of.ofp_packet_out(action = of.ofp_action_output(port=port))
-        output.data = eth_pkt.pack()
-        output.pack()
+        output.data = self.igmp_manager.get_query_packet_data(multicast_address, suppress_router_processing)
         self.connection.send(output)
         log.info('Router ' + str(self) + ':' + str(port) + '| Sent group specific query for group: ' + str(multicast_address))
         group_record.group_timer = self.igmp_manager.igmp_last_member_query_time / 10
+        self.igmp_manager.schedule_record_expiry(self.dpid, port, group_record)
         
         if retransmissions > 0:
             log.debug('Retransmissions remaininig: ' + str(retransmissions))
@@ -433,16 +864,10 @@ class IGMPv3Router(EventMixin):
             log.info('Router ' + str(self) + ':' + str(port) + '| Sent group/source specific query without router suppression for group: ' + str(multicast_address))
             
             # Update timers for all querried source records to LMQT
-            for source_record in group_record.x_source_records:
-                if source_record[0] in igmp_pkt.source_addresses:
-                    source_record[1] = self.igmp_manager.igmp_last_member_query_time / 10
-            source_records_to_move = []
-            for source_record in group_record.y_source_records:
-                if source_record[0] in igmp_pkt.source_addresses:
-                    source_records_to_move.append(source_record)
-            for source_record in source_records_to_move:
-                group_record.y_source_records.remove(source_record)
-                group_record.x_source_records.append([source_record[0], self.igmp_manager.igmp_last_member_query_time / 10])
+            group_record.set_source_expiry(igmp_pkt.source_addresses,
+                    time.time() + (self.igmp_manager.igmp_last_member_query_time / 10))
+            self.mark_reception_changed(port, multicast_address)
+            self.igmp_manager.schedule_record_expiry(self.dpid, port, group_record)
             
             # Debug print
             for source in igmp_pkt.source_addresses:
@@ -469,6 +894,7 @@ class IGMPv3Router(EventMixin):
             
         if not self.multicast_records[port][multicast_address] is None:
             del self.multicast_records[port][multicast_address]
+            self.reporting_hosts.pop((port, multicast_address), None)
             if not self.multicast_records[port]:
                 # No group records are being stored for this interface
                 del self.multicast_records[port]
@@ -507,159 +933,99 @@ class IGMPv3Router(EventMixin):
         |              |              |                   |   Send Q(G)           |
         +--------------+--------------+-------------------+-----------------------+
 
-        Note: When the group is in INCLUDE mode, the set of addresses is stored in the same list as the X set when
+        Note: When the group is in INCLUDE mode, the set of addresses is stored in the same map as the X set when
         in EXCLUDE mode
 
         """
         router_group_record = self.create_group_record(event, igmp_group_record,
                     self.igmp_manager.igmp_group_membership_interval)
-        new_x_source_records = []
-        new_y_source_records = []
+        self.mark_reception_changed(event.port, igmp_group_record.multicast_address)
+        reporting_host = self.track_reporting_host(event, igmp_group_record)
         igmp_record_addresses = igmp_group_record.get_addr_set()
+        gmi_expiry = time.time() + self.igmp_manager.igmp_group_membership_interval
+        x_records = router_group_record.x_source_records
+        y_set = router_group_record.y_source_records
         
         if router_group_record.filter_mode == MODE_IS_INCLUDE:
             if igmp_group_record.record_type == ALLOW_NEW_SOURCES:
                 log.info(str(self) + ':' + str(event.port) + '|' + str(igmp_group_record.multicast_address) + ' is INCLUDE, Received ALLOW_NEW_SOURCES')
-                new_x_set = router_group_record.get_x_addr_set() | igmp_record_addresses
-                for address in new_x_set:
-                    if address in igmp_record_addresses:
-                        new_x_source_records.append([address, self.igmp_manager.igmp_group_membership_interval])
-                    else:
-                        new_x_source_records.append([address, router_group_record.get_curr_source_timer(address)])
-                        
-                router_group_record.x_source_records = new_x_source_records
-                router_group_record.y_source_records = new_y_source_records
+                router_group_record.set_source_expiry(igmp_record_addresses, gmi_expiry)
             
             elif igmp_group_record.record_type == BLOCK_OLD_SOURCES:
                 log.info(str(self) + ':' + str(event.port) + '|' + str(igmp_group_record.multicast_address) + ' is INCLUDE, Received BLOCK_OLD_SOURCES')
                 
-                query_addr_set = router_group_record.get_x_addr_set() & igmp_record_addresses
+                query_addr_set = igmp_record_addresses.intersection(x_records)
                 
                 # Send: Q(G, A*B)
-                self.send_group_and_source_specific_query(event.port, igmp_group_record.multicast_address, router_group_record, query_addr_set)
+                self.send_last_member_query(event, router_group_record, reporting_host, query_addr_set)
                 
             elif igmp_group_record.record_type == CHANGE_TO_EXCLUDE_MODE:
                 log.info(str(self) + ':' + str(event.port) + '|' + str(igmp_group_record.multicast_address) + ' is INCLUDE, Received CHANGE_TO_EXCLUDE_MODE')
                 router_group_record.filter_mode = MODE_IS_EXCLUDE
                 
-                new_x_set = router_group_record.get_x_addr_set() & igmp_record_addresses
-                new_y_set = igmp_record_addresses - router_group_record.get_x_addr_set()
-                for address in new_x_set:
-                    new_x_source_records.append([address, router_group_record.get_curr_source_timer(address)])
-                for address in new_y_set:
-                    new_y_source_records.append([address, 0])
-                
-                router_group_record.x_source_records = new_x_source_records
-                router_group_record.y_source_records = new_y_source_records
+                new_x_set = igmp_record_addresses.intersection(x_records)
+                router_group_record.y_source_records = igmp_record_addresses.difference(x_records)
+                router_group_record.x_source_records = dict((address, x_records[address]) for address in new_x_set)
                 router_group_record.group_timer = self.igmp_manager.igmp_group_membership_interval
                 
                 # Send: Q(G, A*B)
-                self.send_group_and_source_specific_query(event.port, igmp_group_record.multicast_address, router_group_record, new_x_set)
+                self.send_last_member_query(event, router_group_record, reporting_host, new_x_set)
                 
             elif igmp_group_record.record_type == CHANGE_TO_INCLUDE_MODE:
                 log.info(str(self) + ':' + str(event.port) + '|' + str(igmp_group_record.multicast_address) + ' is INCLUDE, Received CHANGE_TO_INCLUDE_MODE')
                 
-                new_x_set = router_group_record.get_x_addr_set() | igmp_record_addresses
-                for address in new_x_set:
-                    if address in igmp_record_addresses:
-                        new_x_source_records.append([address, self.igmp_manager.igmp_group_membership_interval])
-                    else:
-                        new_x_source_records.append([address, router_group_record.get_curr_source_timer(address)])
-                
-                query_addr_set = router_group_record.get_x_addr_set() - igmp_record_addresses
-                
-                router_group_record.x_source_records = new_x_source_records
-                router_group_record.y_source_records = new_y_source_records
+                query_addr_set = set(x_records) - igmp_record_addresses
+                router_group_record.set_source_expiry(igmp_record_addresses, gmi_expiry)
                     
                 # Send Q(G,A-B)
-                self.send_group_and_source_specific_query(event.port, igmp_group_record.multicast_address, router_group_record, query_addr_set)
+                self.send_last_member_query(event, router_group_record, reporting_host, query_addr_set)
 
         elif router_group_record.filter_mode == MODE_IS_EXCLUDE:
             if igmp_group_record.record_type == ALLOW_NEW_SOURCES:
                 log.info(str(self) + ':' + str(event.port) + '|' + str(igmp_group_record.multicast_address) + ' is EXCLUDE, Received ALLOW_NEW_SOURCES')
-                new_x_set = router_group_record.get_x_addr_set() | igmp_record_addresses
-                new_y_set = router_group_record.get_y_addr_set() - igmp_record_addresses
-                
-                for address in new_x_set:
-                    if address in igmp_record_addresses:
-                        new_x_source_records.append([address, self.igmp_manager.igmp_group_membership_interval])
-                    else:
-                        new_x_source_records.append([address, router_group_record.get_curr_source_timer(address)])
-                for address in new_y_set:
-                    new_y_source_records.append([address, 0])
-                
-                router_group_record.x_source_records = new_x_source_records
-                router_group_record.y_source_records = new_y_source_records
+                router_group_record.set_source_expiry(igmp_record_addresses, gmi_expiry)
                 
             elif igmp_group_record.record_type == BLOCK_OLD_SOURCES:
                 log.info(str(self) + ':' + str(event.port) + '|' + str(igmp_group_record.multicast_address) + ' is EXCLUDE, Received BLOCK_OLD_SOURCES')
-                new_x_set = router_group_record.get_x_addr_set() | (igmp_record_addresses - router_group_record.get_y_addr_set())
-                new_y_set = router_group_record.get_y_addr_set()
-                group_timer_set = (igmp_record_addresses - router_group_record.get_x_addr_set()) - router_group_record.get_y_addr_set()
-                query_addr_set = igmp_record_addresses - router_group_record.get_y_addr_set()
-                
-                for address in new_x_set:
-                    if address in group_timer_set:
-                        new_x_source_records.append([address, router_group_record.group_timer])
-                    else:
-                        new_x_source_records.append([address, router_group_record.get_curr_source_timer(address)])
-                for address in new_y_set:
-                    new_y_source_records.append([address, 0])
+                query_addr_set = igmp_record_addresses - y_set
+                group_timer_set = query_addr_set.difference(x_records)
                 
-                router_group_record.x_source_records = new_x_source_records
-                router_group_record.y_source_records = new_y_source_records
+                for address in group_timer_set:
+                    x_records[address] = router_group_record.group_expiry
                 
                 # Send Q(G, A-Y)
-                self.send_group_and_source_specific_query(event.port, igmp_group_record.multicast_address, router_group_record, query_addr_set)
+                self.send_last_member_query(event, router_group_record, reporting_host, query_addr_set)
                 
             elif igmp_group_record.record_type == CHANGE_TO_EXCLUDE_MODE:
                 log.info(str(self) + ':' + str(event.port) + '|' + str(igmp_group_record.multicast_address) + ' is EXCLUDE, Received CHANGE_TO_EXCLUDE_MODE')
                 
-                new_x_set = igmp_record_addresses - router_group_record.get_y_addr_set()
-                new_y_set = router_group_record.get_y_addr_set() & igmp_record_addresses
-                group_timer_set = (igmp_record_addresses - router_group_record.get_x_addr_set()) - router_group_record.get_y_addr_set()
-                
+                new_x_set = igmp_record_addresses - y_set
+                new_x_records = {}
                 for address in new_x_set:
-                    if address in group_timer_set:
-                        new_x_source_records.append([address, router_group_record.group_timer])
-                    else:
-                        new_x_source_records.append([address, router_group_record.get_curr_source_timer(address)])
+                    new_x_records[address] = x_records.get(address, router_group_record.group_expiry)
                 
-                for address in new_y_set:
-                    new_y_source_records.append([address, 0])
-
                 router_group_record.group_timer = self.igmp_manager.igmp_group_membership_interval
-                router_group_record.x_source_records = new_x_source_records
-                router_group_record.y_source_records = new_y_source_records
+                router_group_record.x_source_records = new_x_records
+                router_group_record.y_source_records = y_set & igmp_record_addresses
                 
-                self.send_group_and_source_specific_query(event.port, igmp_group_record.multicast_address, router_group_record, new_x_set)
+                self.send_last_member_query(event, router_group_record, reporting_host, new_x_set)
                     
             elif igmp_group_record.record_type == CHANGE_TO_INCLUDE_MODE:
                 log.info(str(self) + ':' + str(event.port) + '|' + str(igmp_group_record.multicast_address) + ' is EXCLUDE, Received CHANGE_TO_INCLUDE_MODE')
                 
-                new_x_set = router_group_record.get_x_addr_set() | igmp_record_addresses
-                new_y_set = router_group_record.get_y_addr_set() - igmp_record_addresses
-                query_addr_set = router_group_record.get_x_addr_set() - igmp_record_addresses
-                
-                for address in new_x_set:
-                    if address in igmp_record_addresses:
-                        new_x_source_records.append([address, self.igmp_manager.igmp_group_membership_interval])
-                    else:
-                        new_x_source_records.append([address, router_group_record.get_curr_source_timer(address)])
-                for address in new_y_set:
-                    new_y_source_records.append([address, 0])
-                
-                router_group_record.x_source_records = new_x_source_records
-                router_group_record.y_source_records = new_y_source_records
+                query_addr_set = set(x_records) - igmp_record_addresses
+                router_group_record.set_source_expiry(igmp_record_addresses, gmi_expiry)
                 
                 # Send Q(G, X-A)
-                self.send_group_and_source_specific_query(event.port, igmp_group_record.multicast_address, router_group_record, query_addr_set)
+                self.send_last_member_query(event, router_group_record, reporting_host, query_addr_set)
                 # Send Q(G)
-                self.send_group_specific_query(event.port, igmp_group_record.multicast_address, router_group_record)
+                self.send_last_member_query(event, router_group_record, reporting_host)
                     
                     
-        if router_group_record.filter_mode == MODE_IS_INCLUDE and len(new_x_source_records) == 0:
+        if router_group_record.filter_mode == MODE_IS_INCLUDE and not router_group_record.x_source_records:
             self.remove_group_record(event.port, igmp_group_record.multicast_address)
+        else:
+            self.igmp_manager.schedule_record_expiry(self.dpid, event.port, router_group_record)
     
     def process_current_state_record(self, event, igmp_group_record):
         """Processes current state IGMP membership reports according to the following table (See RFC 3376):
@@ -682,78 +1048,54 @@ class IGMPv3Router(EventMixin):
         +--------------+--------------+--------------------+----------------------+
 
         Note: When the group is in INCLUDE mode, the set of addresses is stored in
-        the same list as the X set when in EXCLUDE mode
+        the same map as the X set when in EXCLUDE mode
 
         """
         
         router_group_record = self.create_group_record(event, igmp_group_record,
                     self.igmp_manager.igmp_group_membership_interval)
-        new_x_source_records = []
-        new_y_source_records = []
+        self.mark_reception_changed(event.port, igmp_group_record.multicast_address)
+        self.track_reporting_host(event, igmp_group_record)
         igmp_record_addresses = igmp_group_record.get_addr_set()
+        gmi_expiry = time.time() + self.igmp_manager.igmp_group_membership_interval
+        x_records = router_group_record.x_source_records
+        y_set = router_group_record.y_source_records
         
         if router_group_record.filter_mode == MODE_IS_INCLUDE:
             if igmp_group_record.record_type == MODE_IS_INCLUDE:
                 log.info(str(self) + ':' + str(event.port) + '|' + str(igmp_group_record.multicast_address) + ' is INCLUDE, Received MODE_IS_INCLUDE')
-                
-                new_x_set = router_group_record.get_x_addr_set() | igmp_record_addresses
-                for address in new_x_set:
-                    if address in igmp_record_addresses:
-                        new_x_source_records.append([address, self.igmp_manager.igmp_group_membership_interval])
-                    else:
-                        new_x_source_records.append([address, router_group_record.get_curr_source_timer(address)])
+                router_group_record.set_source_expiry(igmp_record_addresses, gmi_expiry)
                 
             elif igmp_group_record.record_type == MODE_IS_EXCLUDE:
                 log.info(str(self) + ':' + str(event.port) + '|' + str(igmp_group_record.multicast_address) + ' is INCLUDE, Received MODE_IS_EXCLUDE')
                 router_group_record.filter_mode = MODE_IS_EXCLUDE
                 
-                new_x_set = router_group_record.get_x_addr_set() & igmp_record_addresses
-                new_y_set = igmp_record_addresses - router_group_record.get_x_addr_set()
-                for address in new_x_set:
-                    new_x_source_records.append([address, router_group_record.get_curr_source_timer(address)])
-                for address in new_y_set:
-                    new_y_source_records.append([address, 0])
+                router_group_record.x_source_records = dict((address, x_records[address])
+                        for address in igmp_record_addresses.intersection(x_records))
+                router_group_record.y_source_records = igmp_record_addresses.difference(x_records)
                 router_group_record.group_timer = self.igmp_manager.igmp_group_membership_interval
                 
         elif router_group_record.filter_mode == MODE_IS_EXCLUDE:
             if igmp_group_record.record_type == MODE_IS_INCLUDE:
                 log.info(str(self) + ':' + str(event.port) + '|' + str(igmp_group_record.multicast_address) + ' is EXCLUDE, Received MODE_IS_INCLUDE')
-                new_x_set = router_group_record.get_x_addr_set() | igmp_record_addresses
-                new_y_set = router_group_record.get_y_addr_set() - igmp_record_addresses
-                
-                for address in new_x_set:
-                    if address in igmp_record_addresses:
-                        new_x_source_records.append([address, self.igmp_manager.igmp_group_membership_interval])
-                    else:
-                        new_x_source_records.append([address, router_group_record.get_curr_source_timer(address)])
-                for address in new_y_set:
-                    new_y_source_records.append([address, 0])
-                    
+                router_group_record.set_source_expiry(igmp_record_addresses, gmi_expiry)
                             
             elif igmp_group_record.record_type == MODE_IS_EXCLUDE:
                 log.info(str(self) + ':' + str(event.port) + '|' + str(igmp_group_record.multicast_address) + ' is EXCLUDE, Received MODE_IS_EXCLUDE')
                 
-                new_x_set = igmp_record_addresses - router_group_record.get_y_addr_set()
-                new_y_set = router_group_record.get_y_addr_set() & igmp_record_addresses
-                gmi_set = (igmp_record_addresses - router_group_record.get_x_addr_set()) - router_group_record.get_y_addr_set()
-                
-                for address in new_x_set:
-                    if address in gmi_set:
-                        new_x_source_records.append([address, self.igmp_manager.igmp_group_membership_interval])
-                    else:
-                        new_x_source_records.append([address, router_group_record.get_curr_source_timer(address)])
-                
-                for address in new_y_set:
-                    new_y_source_records.append([address, 0])
+                new_x_records = {}
+                for address in igmp_record_addresses - y_set:
+                    new_x_records[address] = x_records.get(address, gmi_expiry)
                 
+                router_group_record.x_source_records = new_x_records
+                router_group_record.y_source_records = y_set & igmp_record_addresses
                 router_group_record.group_timer = self.igmp_manager.igmp_group_membership_interval
 
         # Prune any INCLUDE_MODE records which do not specify any sources
-        if router_group_record.filter_mode == MODE_IS_INCLUDE and len(new_x_source_records) == 0:
+        if router_group_record.filter_mode == MODE_IS_INCLUDE and not router_group_record.x_source_records:
             self.remove_group_record(event.port, igmp_group_record.multicast_address)
         else:
-            router_group_record.x_source_records = new_x_source_records
-            router_group_record.y_source_records = new_y_source_records
+            self.igmp_manager.schedule_record_expiry(self.dpid, event.port, router_group_record)
     
     def process_igmp_event(self, event, igmp_trace_event = None):
         """Processes any IGMP event received by the router."""
@@ -778,34 +1120,31 @@ class IGMPv3Router(EventMixin):
             # Debug - Print a listing of the current group membership state after
             # all group records are processed
             self.debug_print_group_records()
-            self.update_desired_reception_state(igmp_trace_event)
+            self.request_reception_update(igmp_trace_event, from_report = True)
                 
-        elif igmp_pkt.msg_type == MEMBERSHIP_QUERY_V3 and igmp_pkt.self.suppress_router_processing == False \
+        elif igmp_pkt.msg_type == MEMBERSHIP_QUERY_V3 and not igmp_pkt.suppress_router_processing \
                 and igmp_pkt.address != IPAddr("0.0.0.0"):
-            router_group_record = self.group_records[event.port][igmp_pkt.address]
-            if router_group_record == None:
+            # Query from another querier (see RFC 3376 section 6.6.1)
+            if event.port not in self.multicast_records:
+                return
+            router_group_record = self.multicast_records[event.port].get(igmp_pkt.address)
+            if router_group_record is None:
                 return
 
-            # Reset timers:
-            # For a group specific query, reset the group timer for the group to LMQT
+            # Lower timers to LMQT (timers which are already lower are not modified)
+            lmqt_expiry = time.time() + (self.igmp_manager.igmp_last_member_query_time / 10)
+            # For a group specific query, lower the group timer for the group to LMQT
             if igmp_pkt.num_sources == 0:
-                log.debug(str(self) + ':' + str(event.port) + '| Got group specific query for ' + str(igmp_group_record.multicast_address))
-                router_group_record.group_timer = self.igmp_manager.igmp_last_member_query_time
-            # For a group and source specific query, reset the source timer for each included
-            # source to LMQT
+                log.debug(str(self) + ':' + str(event.port) + '| Got group specific query for ' + str(igmp_pkt.address))
+                if router_group_record.filter_mode == MODE_IS_EXCLUDE and router_group_record.group_expiry > lmqt_expiry:
+                    router_group_record.group_expiry = lmqt_expiry
+            # For a group and source specific query, lower the source timer of each queried source in the X set to LMQT
             else:
-                log.debug(str(self) + ':' + str(event.port) + '| Got group and source specific query for ' + str(igmp_group_record.multicast_address))
-                for source_record in router_group_record.x_source_records:
-                    if source_record[0] in igmp_pkt.source_addresses:
-                        source_record[1] = self.igmp_manager.igmp_last_member_query_time / 10
-                source_records_to_move = []
-                for source_record in router_group_record.y_source_records:
-                    if source_record[0] in igmp_pkt.source_addresses:
-                        source_records_to_move.append(source_record)
-                for source_record in source_records_to_move:
-                    router_group_record.y_source_records.remove(source_record)
-                    router_group_record.x_source_records.append([source_record[0], 
-                            self.igmp_manager.igmp_last_member_query_time / 10])
+                log.debug(str(self) + ':' + str(event.port) + '| Got group and source specific query for ' + str(igmp_pkt.address))
+                for address in igmp_pkt.source_addresses:
+                    if router_group_record.get_source_expiry(address) > lmqt_expiry:
+                        router_group_record.x_source_records[address] = lmqt_expiry
+            self.igmp_manager.schedule_record_expiry(self.dpid, event.port, router_group_record)
         
         
 
@@ -821,7 +1160,7 @@ class IGMPManager(EventMixin):
     
     _core_name = "openflow_igmp_manager"
 
-    def __init__(self):
+    def __init__(self, report_coalesce_window = 0, snapshot_file = None, snapshot_interval = 10, leave_mode = LEAVE_MODE_QUERY):
         # Listen to dependencies
         def startup():
             core.openflow.addListeners(self, priority=100)
@@ -846,6 +1185,27 @@ class IGMPManager(EventMixin):
         self.igmp_last_member_query_time = self.igmp_last_member_query_interval \
                 * self.igmp_last_member_query_count                     # Tenths of a second
         self.igmp_unsolicited_report_interval = 1       # Seconds (not used in router implementation)
+        
+        self.report_coalesce_window = float(report_coalesce_window)   # Seconds
+        self.num_igmp_packets = 0       # Number of IGMP packets received from host facing ports
+        self.num_coalesced_reports = 0  # Number of reports whose reception state changes were merged into an earlier report's event
+        log.info('Set ReportCoalesceWindow:' + str(self.report_coalesce_window) + ' seconds')
+        
+        self.leave_mode = leave_mode
+        self.num_suppressed_queries = 0 # Number of last member queries skipped because other members were known
+        self.num_fast_leaves = 0        # Number of last member queries replaced by immediate timer expiry
+        log.info('Set LeaveMode:' + str(self.leave_mode))
+        
+        # Membership snapshot state
+        self.snapshot_file = snapshot_file
+        self.snapshot_interval = float(snapshot_interval)   # Seconds
+        self.snapshot_timer = None
+        # Snapshotted membership state not yet restored:  [router_dpid] -> router snapshot
+        self._pending_restore = {}
+        self._pending_restore_time = 0
+        if self.snapshot_file is not None:
+            log.info('Set SnapshotFile:' + str(self.snapshot_file) + ' SnapshotInterval:' + str(self.snapshot_interval) + ' seconds')
+            self.load_membership_snapshot()
 
         # Setup topology discovery state
         self.got_first_connection_up = False
@@ -855,67 +1215,129 @@ class IGMPManager(EventMixin):
         # Adjacency map:  [router_dpid_1][router_dpid_2] -> port from router1 to router2
         self.adjacency = defaultdict(lambda : defaultdict(lambda : \
                 None))
+        
+        # Heap of pending group record timer expirations, stored as tuples of:
+        # (expiry_time, sequence_number, router_dpid, port, multicast_address)
+        # Entries are lazily invalidated: an entry is only processed if its expiry time matches the scheduled_expiry of the
+        # group record it refers to.
+        self._timer_heap = []
+        self._timer_heap_seq = 0
+        
+        # Cache of packed query frames:  [(multicast_address, suppress_router_processing)] -> ethernet frame bytes
+        # All query fields other than the group address are fixed by the IGMP settings above, so queries only need to be
+        # built and serialized once per group.
+        self._query_template_cache = {}
 
         # Setup listeners
         core.call_when_ready(startup, ('openflow', 'openflow_discovery'))
     
-    def decrement_all_timers(self):
-        """Decrements the source and group timers for all group_records in the network, and transitions any state as necessary.
+    def schedule_record_expiry(self, router_dpid, port, group_record):
+        """Schedules processing of the next timer expiry of the specified group record.
 
-        As long as this is always called from a recoco Timer, mutual exclusion should not be an issue.
+        This should be called whenever the timers of a group record are modified. A new heap entry is only added if the
+        record's next expiry is earlier than its currently scheduled expiry. If timers were extended instead, the existing
+        entry will be processed first and the record rescheduled at that time.
         """
-        for router_dpid in self.routers:
-            router = self.routers[router_dpid]
-            records_modified = False
-            ports_to_delete = []
-            for port in router.multicast_records:
-                mcast_addresses_to_delete = []
-                
-                for mcast_address in router.multicast_records[port]:
-                    group_record = router.multicast_records[port][mcast_address]
-                    
-                    if group_record is None:        # Protects against mutual exclusion issues
-                        continue
-                    
-                    source_records_to_move = []
-                    for source_record in group_record.x_source_records:
-                        if source_record[1] > 0:
-                            source_record[1] -= 1
-                        
-                        if group_record.filter_mode == MODE_IS_EXCLUDE and source_record[1] == 0:
-                            source_records_to_move.append(source_records)
-                            records_modified = True
-                            
-                    for source_record in source_records_to_move:
-                        group_record.x_source_records.remove(source_record)
-                        group_record.y_source_records.append(source_record)
-                    
-                    if group_record.filter_mode == MODE_IS_EXCLUDE:
-                        if group_record.group_timer > 0:
-                            group_record.group_timer -= 1
-                            
-                        if group_record.group_timer == 0:
-                            log.debug('Group Timer expired')
-                            # Switch the group record back to INCLUDE mode
-                            group_record.filter_mode = MODE_IS_INCLUDE
-                            group_record.y_source_records = []
-                            if not group_record.x_source_records:
-                                mcast_addresses_to_delete.append(mcast_address)
-                                records_modified = True
-                
-                for mcast_address in mcast_addresses_to_delete:
-                    del router.multicast_records[port][mcast_address]
-                    
-                if not router.multicast_records[port]:
-                    ports_to_delete.append(port)
-             
-            for port in ports_to_delete:
-                del router.multicast_records[port]
+        next_expiry = group_record.get_next_expiry()
+        if next_expiry is None:
+            return
+        if group_record.scheduled_expiry is not None and group_record.scheduled_expiry <= next_expiry:
+            return
+        group_record.scheduled_expiry = next_expiry
+        self._timer_heap_seq += 1
+        heapq.heappush(self._timer_heap, (next_expiry, self._timer_heap_seq, router_dpid, port,
+                group_record.multicast_address))
+    
+    def process_expired_timers(self):
+        """Processes all group and source timers which have expired, and transitions any state as necessary.
+
+        Only group records with expired timers are visited, so the cost of each call is proportional to the number of
+        timer expirations rather than the total membership state. As long as this is always called from a recoco Timer,
+        mutual exclusion should not be an issue.
+        """
+        curr_time = time.time()
+        modified_routers = set()
+        while self._timer_heap and self._timer_heap[0][0] <= curr_time:
+            expiry_time, seq, router_dpid, port, mcast_address = heapq.heappop(self._timer_heap)
+            router = self.routers.get(router_dpid)
+            if router is None or port not in router.multicast_records:
+                continue
+            group_record = router.multicast_records[port].get(mcast_address)
+            if group_record is None or group_record.scheduled_expiry != expiry_time:
+                # Record was removed or rescheduled since this entry was added
+                continue
+            
+            group_record.scheduled_expiry = None
+            if group_record.process_timer_expiry(curr_time):
+                router.mark_reception_changed(port, mcast_address)
+                modified_routers.add(router)
             
-            if records_modified:
-                router.update_desired_reception_state()
+            if group_record.filter_mode == MODE_IS_INCLUDE and not group_record.x_source_records:
+                router.remove_group_record(port, mcast_address)
+            else:
+                self.schedule_record_expiry(router_dpid, port, group_record)
+        
+        for router in modified_routers:
+            router.request_reception_update()
 
         
+    def write_membership_snapshot(self):
+        """Writes the group membership state of all routers to snapshot_file.
+        
+        The snapshot is written to a temporary file which is then renamed, so that a crash during writing never leaves a
+        partially written snapshot. Snapshotted state of routers which have not yet reconnected is carried forward.
+        """
+        curr_time = time.time()
+        routers_snapshot = {}
+        for router_dpid, router_snapshot in self._pending_restore.iteritems():
+            # Rebase the timers of unrestored state on the current time
+            routers_snapshot[str(router_dpid)] = self._age_router_snapshot(router_snapshot, curr_time - self._pending_restore_time)
+        for router_dpid in self.routers:
+            routers_snapshot[str(router_dpid)] = self.routers[router_dpid].get_membership_snapshot(curr_time)
+        
+        temp_file = self.snapshot_file + '.tmp'
+        try:
+            with open(temp_file, 'w') as f:
+                json.dump({'time': curr_time, 'routers': routers_snapshot}, f, separators = (',', ':'))
+            os.rename(temp_file, self.snapshot_file)
+        except (IOError, OSError) as e:
+            log.warn('Unable to write membership snapshot to ' + str(self.snapshot_file) + ': ' + str(e))
+            return
+        log.debug('Wrote membership snapshot for ' + str(len(routers_snapshot)) + ' routers')
+    
+    def _age_router_snapshot(self, router_snapshot, elapsed_time):
+        """Returns a copy of the router snapshot with all timers (including those of any tracked hosts) reduced by
+        elapsed_time (in seconds)."""
+        aged_snapshot = {}
+        for port, port_snapshot in router_snapshot.iteritems():
+            aged_snapshot[port] = []
+            for record_snapshot in port_snapshot:
+                mcast_address, filter_mode, group_timer, x_sources, y_sources = record_snapshot[:5]
+                aged_record_snapshot = [mcast_address, filter_mode, max(0, group_timer - elapsed_time),
+                        [[address, max(0, source_timer - elapsed_time)] for address, source_timer in x_sources], y_sources]
+                if len(record_snapshot) > 5:
+                    aged_record_snapshot.append([[host, host_filter_mode, host_sources, max(0, host_timer - elapsed_time)]
+                            for host, host_filter_mode, host_sources, host_timer in record_snapshot[5]])
+                aged_snapshot[port].append(aged_record_snapshot)
+        return aged_snapshot
+    
+    def load_membership_snapshot(self):
+        """Loads the membership snapshot stored in snapshot_file (if any). State is restored as each router connects."""
+        if not os.path.exists(self.snapshot_file):
+            log.info('No membership snapshot found at ' + str(self.snapshot_file) + ', starting with empty membership state')
+            return
+        try:
+            with open(self.snapshot_file) as f:
+                snapshot = json.load(f)
+        except (IOError, OSError, ValueError) as e:
+            log.warn('Unable to read membership snapshot from ' + str(self.snapshot_file) + ': ' + str(e))
+            return
+        self._pending_restore_time = snapshot['time']
+        self._pending_restore = dict((int(router_dpid), router_snapshot)
+                for router_dpid, router_snapshot in snapshot['routers'].iteritems())
+        log.info('Loaded membership snapshot for ' + str(len(self._pending_restore)) + ' routers (age: '
+                + str(time.time() - self._pending_restore_time) + ' seconds)')
+    
     def encapsulate_igmp_packet(self, igmp_pkt):
         """Encapsulates the provided IGMP packet into IP and Ethernet packets, and returns the encapsulating ethernet packet"""
         
@@ -935,39 +1357,72 @@ class IGMPManager(EventMixin):
         
         return eth_pkt
      
-    def send_igmp_query_to_all_networks(self, igmp_pkt):
-        """Encapsulates the provided IGMP packet into IP and Ethernet packets, and sends the packet to all attached network on all routers."""
-        # Build the encapsulating IP/ethernet packet
-        eth_pkt = self.encapsulate_igmp_packet(igmp_pkt)
+    def get_query_packet_data(self, multicast_address = IPAddr('0.0.0.0'), suppress_router_processing = False):
+        """Returns the packed ethernet frame of an IGMP query for the specified group (or a general query if no group is specified).
+        
+        A base query is built through the normal packet library path once for each value of suppress_router_processing.
+        Queries for other groups are derived from the base frame by patching the 4 byte group address field and recomputing
+        the IGMP checksum, and all frames are cached so that repeated queries do not rebuild or reserialize any packets.
+        Note that the IP identification field is fixed in cached frames, which is acceptable as IGMP queries are never
+        fragmented.
+        """
+        multicast_address = IPAddr(multicast_address)
+        key = (multicast_address, suppress_router_processing)
+        if key in self._query_template_cache:
+            return self._query_template_cache[key]
         
-        # Send out the packet
+        base_key = (IPAddr('0.0.0.0'), suppress_router_processing)
+        if base_key not in self._query_template_cache:
+            igmp_pkt = pkt.igmpv3()
+            igmp_pkt.ver_and_type = MEMBERSHIP_QUERY
+            igmp_pkt.max_response_time = self.igmp_query_response_interval
+            igmp_pkt.address = IPAddr('0.0.0.0')
+            igmp_pkt.qrv = self.igmp_robustness
+            igmp_pkt.qqic = self.igmp_query_interval
+            igmp_pkt.dlen = 12  # TODO: This should be determined by the IGMP packet class somehow
+            igmp_pkt.suppress_router_processing = suppress_router_processing
+            self._query_template_cache[base_key] = self.encapsulate_igmp_packet(igmp_pkt).pack()
+            log.debug('Built IGMP query template with router suppression: ' + str(suppress_router_processing))
+        
+        if key == base_key:
+            return self._query_template_cache[base_key]
+        
+        # Patch the group address of the base frame, and recompute the IGMP checksum
+        # The IP header does not cover the IGMP payload, so its checksum remains valid
+        frame = bytearray(self._query_template_cache[base_key])
+        igmp_offset = 14 + (frame[14] & 0x0f) * 4   # Ethernet header length + IP header length
+        frame[igmp_offset + 4:igmp_offset + 8] = multicast_address.toRaw()
+        frame[igmp_offset + 2:igmp_offset + 4] = '\x00\x00'
+        csum = checksum(str(frame[igmp_offset:]))
+        frame[igmp_offset + 2:igmp_offset + 4] = struct.pack('!H', csum)
+        self._query_template_cache[key] = str(frame)
+        return self._query_template_cache[key]
+     
+    def send_igmp_query_to_all_networks(self, packet_data):
+        """Sends the provided packed IGMP query frame to all attached networks on all routers.
+        
+        A single PacketOut with one output action per IGMP port is sent to each router, rather than one PacketOut per port.
+        """
         for router_dpid in self.routers:
             sending_router = self.routers[router_dpid]
             if sending_router.connection is None:
                 log.warn('Unable to access connection with switch: ' + dpid_to_str(router_dpid))
                 continue
-                
+            
+            if len(sending_router.igmp_ports) == 0:
+                continue
+            
+            output = of.ofp_packet_out()
             for port_num in sending_router.igmp_ports:
-                output = of.ofp_packet_out(action = of.ofp_action_output(port=port_num))
-                output.data = eth_pkt.pack()
-                output.pack()
-                sending_router.connection.send(output)
-                # log.debug('Router ' + str(sending_router) + ' sending IGMP query on port: ' + str(port_num))
+                output.actions.append(of.ofp_action_output(port=port_num))
+            output.data = packet_data
+            sending_router.connection.send(output)
+            # log.debug('Router ' + str(sending_router) + ' sending IGMP query on ports: ' + str(sending_router.igmp_ports))
         
     def launch_igmp_general_query(self):
         """Generates an IGMP general query, broadcasts it from all ports on all routers."""
         log.debug('Launching IGMP general query from all routers')
-        
-        # Build the IGMP payload for the message
-        igmp_pkt = pkt.igmpv3()
-        igmp_pkt.ver_and_type = MEMBERSHIP_QUERY
-        igmp_pkt.max_response_time = self.igmp_query_response_interval
-        igmp_pkt.address = IPAddr("0.0.0.0")
-        igmp_pkt.qrv = self.igmp_robustness
-        igmp_pkt.qqic = self.igmp_query_interval
-        igmp_pkt.dlen = 12  # TODO: This should be determined by the IGMP packet class somehow
-        
-        self.send_igmp_query_to_all_networks(igmp_pkt)
+        self.send_igmp_query_to_all_networks(self.get_query_packet_data())
         
         
     def drop_packet(self, packet_in_event):
@@ -988,14 +1443,20 @@ class IGMPManager(EventMixin):
             self.routers[router_dpid] = router
             log.info('Learned new router: ' + dpid_to_str(router.dpid))
             router.listen_on_connection(connection)
+            if router_dpid in self._pending_restore:
+                router.restore_membership_snapshot(self._pending_restore.pop(router_dpid),
+                        time.time() - self._pending_restore_time)
         
         if not self.got_first_connection_up:
             self.got_first_connection_up = True
             # Setup the Timer to send periodic general queries
             self.general_query_timer = Timer(self.igmp_query_interval, self.launch_igmp_general_query, recurring = True)
             log.debug('Launching IGMP general query timer with interval ' + str(self.igmp_query_interval) + ' seconds')
-            # Setup the timer to handle group and source timers
-            self.timer_decrementing_timer = Timer(1, self.decrement_all_timers, recurring = True)
+            # Setup the timer to handle group and source timer expirations
+            self.timer_expiry_timer = Timer(1, self.process_expired_timers, recurring = True)
+            if self.snapshot_file is not None:
+                # Setup the timer to periodically save membership state
+                self.snapshot_timer = Timer(self.snapshot_interval, self.write_membership_snapshot, recurring = True)
 
     def _handle_LinkEvent(self, event):
         """Handler for LinkEvents from the discovery module, which are used to learn the network topology."""
@@ -1087,8 +1548,10 @@ class IGMPManager(EventMixin):
                              + str(l.port2))
                              
                     self.raiseEvent(MulticastTopoEvent(MulticastTopoEvent.LINK_UP, link_changes, self.adjacency))
-                    
-                    
+        
+        # Update the IGMP punt/drop flows of both routers to reflect any changes to their IGMP ports
+        router1.sync_igmp_port_flows()
+        router2.sync_igmp_port_flows()
 
     def _handle_ConnectionUp(self, event):
         """Handler for ConnectionUp from the discovery module, which represents a new router joining the network.
@@ -1145,24 +1608,17 @@ class IGMPManager(EventMixin):
             ipv4_pkt = event.parsed.find(pkt.ipv4)
             log.debug(str(receiving_router) + ':' + str(event.port) + '| ' + str(igmp_pkt) + ' from Host: ' + str(ipv4_pkt.srcip))
             
-            # Check to see if this IGMP message was received from a neighbouring router, and if so
-            # add a rule to drop additional IGMP packets on this port
+            # Check to see if this IGMP message was received from a neighbouring router, and if so drop it
+            # Drop flows for these ports are installed by sync_igmp_port_flows(), so this should only occur for packets
+            # received before the flows were installed
             for neighbour in self.adjacency[router_dpid]:
                 if self.adjacency[router_dpid][neighbour] == event.port:
                     log.debug(str(receiving_router) + ':' + str(event.port) + '| IGMP packet received from neighbouring router.')
-                    
-                    # TODO: This doesn't appear to actually be working with mininet, just drop individual IGMP packets without installing a flow for now
-                    # msg = of.ofp_flow_mod()
-                    # msg.match.dl_type = ipv4_pkt.protocol
-                    # msg.match.nw_dst = ipv4_pkt.dstip
-                    # msg.match.in_port = event.port
-                    # msg.action = []     # No actions = drop packet
-                    # event.connection.send(msg)
-                    # log.info(str(receiving_router) + ':' + str(event.port) + '| Installed flow to drop all IGMP packets on port: ' + str(event.port))
-                    
                     self.drop_packet(event)
                     return
             
+            self.num_igmp_packets += 1
+            
             # Create a new trace event for benchmarking purposes
             igmp_trace_event = None
             try:
@@ -1178,6 +1634,12 @@ class IGMPManager(EventMixin):
             return
 
 
-def launch():
+def launch(report_coalesce_window = 0, snapshot_file = None, snapshot_interval = 10, leave_mode = 'query'):
     # Method called by the POX core when launching the module
-    core.registerNew(IGMPManager)
\ No newline at end of file
+    leave_mode_int = LEAVE_MODE_QUERY
+    if 'explicit' in str(leave_mode):
+        leave_mode_int = LEAVE_MODE_EXPLICIT
+    elif 'fast' in str(leave_mode):
+        leave_mode_int = LEAVE_MODE_FAST
+    
+    core.registerNew(IGMPManager, float(report_coalesce_window), snapshot_file, float(snapshot_interval), leave_mode_int)
\ No newline at end of file